@@ -1,13 +1,7 @@
 import sqlite3
-import secrets
-import hashlib
 import os
-
-def create_password_hash(password):
-    """Create a simple password hash using SHA-256."""
-    salt = secrets.token_hex(8)
-    hash_obj = hashlib.sha256((password + salt).encode())
-    return f"sha256${salt}${hash_obj.hexdigest()}"
+from auth import hash_password
+from migrations import migrate
 
 def add_admin_user(username, password, email):
     """Add a new admin user to the database."""
@@ -18,22 +12,12 @@ def add_admin_user(username, password, email):
         print(f"Error: Database file not found at {db_path}")
         return False
     
+    # Make sure the admin table (and the rest of the schema) exists
+    migrate(db_path)
+    
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
     
-    # Check if admin table exists
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='admin'")
-    if not cursor.fetchone():
-        print("Creating admin table...")
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS admin (
-            id INTEGER PRIMARY KEY,
-            username TEXT NOT NULL UNIQUE,
-            password_hash TEXT NOT NULL,
-            email TEXT NOT NULL
-        )
-        ''')
-    
     # Check if username already exists
     cursor.execute("SELECT id FROM admin WHERE username = ?", (username,))
     if cursor.fetchone():
@@ -42,7 +26,7 @@ def add_admin_user(username, password, email):
         return False
     
     # Create password hash
-    password_hash = create_password_hash(password)
+    password_hash = hash_password(password)
     
     try:
         # Insert new admin user
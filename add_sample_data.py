@@ -1,6 +1,8 @@
 import sqlite3
 import os
 
+from import_data import recompute_occupancy
+
 DB_PATH = os.path.join(os.path.dirname(__file__), 'simple_hostel.db')
 
 def add_sample_data():
@@ -50,20 +52,12 @@ def add_sample_data():
     member_count = cursor.fetchone()[0]
     
     if member_count == 0:
-        for name, email, phone, room_id, emergency_contact in sample_members:
-            # Update room occupancy
-            cursor.execute("SELECT current_occupancy FROM room WHERE id = ?", (room_id,))
-            current_occupancy = cursor.fetchone()[0]
-            
-            cursor.execute(
-                "INSERT INTO member (name, email, phone, room_id, emergency_contact) VALUES (?, ?, ?, ?, ?)",
-                (name, email, phone, room_id, emergency_contact)
-            )
-            
-            cursor.execute(
-                "UPDATE room SET current_occupancy = ? WHERE id = ?",
-                (current_occupancy + 1, room_id)
-            )
+        cursor.executemany(
+            "INSERT INTO member (name, email, phone, room_id, emergency_contact) VALUES (?, ?, ?, ?, ?)",
+            sample_members
+        )
+        # Occupancy for all rooms in one aggregate UPDATE
+        recompute_occupancy(conn)
         
         print(f"Added {len(sample_members)} sample members to the database.")
     else:
@@ -0,0 +1,241 @@
+"""Room allocation for check-ins.
+
+A bed is claimed with a single conditional UPDATE
+(``current_occupancy < capacity``) inside ``BEGIN IMMEDIATE``, so two
+concurrent check-ins can never both take the last bed and the write lock is
+held for one short transaction. ``SQLITE_BUSY`` is retried with jittered
+exponential backoff.
+
+For auto-assignment, ``FreeCapacityIndex`` keeps an in-memory view of rooms
+with free beds grouped by room type and ordered by price. It is only a hint:
+the conditional UPDATE is the source of truth, and a room the index thought
+was free but turns out full is dropped and the next candidate is tried.
+The index is only updated once the check-in's transaction has committed
+(``after_commit``), so a rolled back or retried write cannot skew it.
+"""
+import bisect
+import contextlib
+import logging
+import random
+import sqlite3
+import threading
+import time
+from functools import partial
+
+BUSY_RETRIES = 6
+BUSY_BASE_DELAY = 0.005
+INDEX_TTL = 30.0
+
+logger = logging.getLogger('hostel.allocation')
+_hooks = threading.local()
+
+
+class AllocationError(Exception):
+    """A check-in that cannot be completed, reported to the client as a 400."""
+
+
+def is_busy(error):
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+
+def after_commit(callback):
+    """Run ``callback()`` once the enclosing write transaction commits.
+
+    Inside ``run_write`` or a write-queue batch the callback waits for the
+    commit and is dropped if the transaction rolls back; a busy retry runs
+    the work, and registers it, again. Outside one it runs at once.
+    """
+    pending = getattr(_hooks, 'pending', None)
+    if pending is None:
+        callback()
+    else:
+        pending.append(callback)
+
+
+@contextlib.contextmanager
+def commit_hooks():
+    """Collect the ``after_commit`` callbacks registered on this thread in the block."""
+    outer = getattr(_hooks, 'pending', None)
+    _hooks.pending = pending = []
+    try:
+        yield pending
+    finally:
+        _hooks.pending = outer
+
+
+def run_commit_hooks(pending):
+    for callback in pending:
+        try:
+            callback()
+        except Exception:
+            logger.exception("after_commit callback failed")
+
+
+def run_write(conn, work, retries=BUSY_RETRIES, base_delay=BUSY_BASE_DELAY):
+    """Run ``work(conn)`` in a BEGIN IMMEDIATE transaction and commit it.
+
+    The whole transaction is retried when SQLite reports the database as
+    busy or locked. Any other error rolls back and propagates.
+
+    If ``conn`` is already in a transaction (the write queue's group commit)
+    the work runs in a savepoint instead and the owner of the transaction
+    commits it; an error then undoes only this work.
+    """
+    if conn.in_transaction:
+        conn.execute('SAVEPOINT run_write')
+        try:
+            result = work(conn)
+        except BaseException:
+            conn.execute('ROLLBACK TO run_write')
+            conn.execute('RELEASE run_write')
+            raise
+        conn.execute('RELEASE run_write')
+        return result
+    for attempt in range(retries + 1):
+        try:
+            with commit_hooks() as pending:
+                conn.execute('BEGIN IMMEDIATE')
+                result = work(conn)
+                conn.commit()
+            run_commit_hooks(pending)
+            return result
+        except sqlite3.OperationalError as e:
+            if conn.in_transaction:
+                conn.rollback()
+            if not is_busy(e) or attempt == retries:
+                raise
+            time.sleep(base_delay * (2 ** attempt) * (0.5 + random.random()))
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+
+
+def claim_bed(conn, room_id):
+    """Take one bed in ``room_id``. Returns False if the room is full or missing."""
+    cursor = conn.execute(
+        "UPDATE room SET current_occupancy = current_occupancy + 1 WHERE id = ? AND current_occupancy < capacity",
+        (room_id,)
+    )
+    return cursor.rowcount == 1
+
+
+class FreeCapacityIndex:
+    """Rooms with free beds, per room type, ordered by (price, free beds, id).
+
+    Cheapest rooms are offered first; among equally priced rooms the one with
+    the fewest free beds is filled first so whole rooms stay available.
+    """
+
+    def __init__(self, ttl=INDEX_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._by_type = {}
+        self._entries = {}
+        self._loaded_at = None
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def _load(self, conn):
+        rows = conn.execute(
+            "SELECT id, room_type, price_per_month, capacity - current_occupancy AS free FROM room WHERE current_occupancy < capacity"
+        ).fetchall()
+        self._by_type = {}
+        self._entries = {}
+        for row in rows:
+            entry = (row['price_per_month'], row['free'], row['id'])
+            self._by_type.setdefault(row['room_type'], []).append(entry)
+            self._entries[row['id']] = (row['room_type'], entry)
+        for entries in self._by_type.values():
+            entries.sort()
+        self._loaded_at = time.monotonic()
+
+    def _discard(self, room_id):
+        room_type, entry = self._entries.pop(room_id)
+        entries = self._by_type[room_type]
+        entries.pop(bisect.bisect_left(entries, entry))
+
+    def candidates(self, conn, room_type=None, max_price=None, limit=5):
+        """Return up to ``limit`` room ids to try, best first."""
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl:
+                self._load(conn)
+            if room_type is not None:
+                pools = [self._by_type.get(room_type, [])]
+            else:
+                pools = list(self._by_type.values())
+            merged = sorted(entry for entries in pools for entry in entries[:limit])
+            if max_price is not None:
+                merged = [entry for entry in merged if entry[0] <= max_price]
+            return [entry[2] for entry in merged[:limit]]
+
+    def taken(self, room_id):
+        """Record that one bed in ``room_id`` was claimed."""
+        with self._lock:
+            if room_id not in self._entries:
+                return
+            room_type, (price, free, _) = self._entries[room_id]
+            self._discard(room_id)
+            if free > 1:
+                entry = (price, free - 1, room_id)
+                bisect.insort(self._by_type[room_type], entry)
+                self._entries[room_id] = (room_type, entry)
+
+    def full(self, room_id):
+        """Drop a room the database reported as full."""
+        with self._lock:
+            if room_id in self._entries:
+                self._discard(room_id)
+
+
+free_rooms = FreeCapacityIndex()
+
+
+def check_in(conn, member, room_id=None, room_type=None, max_price=None):
+    """Insert ``member`` and claim a bed for them atomically.
+
+    ``member`` is a ``(name, email, phone, emergency_contact)`` tuple. With a
+    ``room_id`` that room is used; otherwise the best free room matching
+    ``room_type`` / ``max_price`` is picked. Returns ``(member_id, room_id)``.
+    """
+    def work(conn):
+        if room_id is not None:
+            if not claim_bed(conn, room_id):
+                if conn.execute("SELECT 1 FROM room WHERE id = ?", (room_id,)).fetchone():
+                    raise AllocationError('Room is full')
+                raise AllocationError('Room not found')
+            chosen = room_id
+        else:
+            chosen = None
+            tried = set()
+            for _ in range(3):
+                candidates = [candidate for candidate in
+                              free_rooms.candidates(conn, room_type, max_price, limit=len(tried) + 5)
+                              if candidate not in tried]
+                if not candidates:
+                    break
+                for candidate in candidates:
+                    if claim_bed(conn, candidate):
+                        chosen = candidate
+                        break
+                    tried.add(candidate)
+                    # Full as this transaction sees it; a hint until it commits
+                    after_commit(partial(free_rooms.full, candidate))
+                if chosen is not None:
+                    break
+            if chosen is None:
+                raise AllocationError('No room with free capacity matches the request')
+
+        name, email, phone, emergency_contact = member
+        cursor = conn.execute(
+            "INSERT INTO member (name, email, phone, room_id, emergency_contact) VALUES (?, ?, ?, ?, ?)",
+            (name, email, phone, chosen, emergency_contact)
+        )
+        return cursor.lastrowid, chosen
+
+    member_id, chosen = run_write(conn, work)
+    after_commit(partial(free_rooms.taken, chosen))
+    return member_id, chosen
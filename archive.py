@@ -0,0 +1,200 @@
+"""Move departed members and settled payments out of the hot tables.
+
+Usage:
+    python archive.py                                  (defaults below)
+    python archive.py --member-days 365 --payment-days 730 --dry-run
+
+``member`` and ``payment`` only ever grow, so list pages, report scans and
+their indexes keep paying for years of history nobody looks at. This moves
+
+* payments with status ``completed`` and a ``payment_date`` older than
+  ``HOSTEL_ARCHIVE_PAYMENT_DAYS`` (default 730) days, and
+* members with status ``left`` whose ``leave_date`` is older than
+  ``HOSTEL_ARCHIVE_MEMBER_DAYS`` (default 365) days and who have no
+  payments left in the hot table,
+
+into ``payment_archive`` / ``member_archive`` (migration 7), ``batch_size``
+rows per short write transaction with a pause in between, so the API's own
+writes are never held up for long. Unpaid payments stay hot however old they
+are, and a member stays hot while any of their payments does, so hot
+payments always join to a hot member.
+
+Archived rows keep their ids and still count in the dashboard totals. The
+list endpoints and the payments report read them only when asked with
+``include_archived=1`` (see ``source``). In the change feed an archived row
+has op ``archive`` rather than ``delete``: it leaves the hot lists, but it
+still exists, and backup.py's exports keep it.
+"""
+import argparse
+import os
+import sqlite3
+import time
+from datetime import date, timedelta
+
+from allocation import run_write
+from serialize import dumps, tuple_cursor
+
+MEMBER_DAYS = int(os.environ.get('HOSTEL_ARCHIVE_MEMBER_DAYS', 365))
+PAYMENT_DAYS = int(os.environ.get('HOSTEL_ARCHIVE_PAYMENT_DAYS', 730))
+BATCH_SIZE = 1000
+# Seconds between batches, so queued API writes get the lock
+PAUSE = 0.02
+
+MEMBER_STATUS = 'left'
+PAYMENT_STATUS = 'completed'
+
+COLUMNS = {
+    'member': ('id', 'name', 'email', 'phone', 'room_id', 'join_date', 'leave_date', 'status', 'emergency_contact'),
+    'payment': ('id', 'member_id', 'amount', 'payment_type', 'payment_date', 'due_date', 'status', 'description',
+                'billing_period'),
+}
+ARCHIVES = {'member': 'member_archive', 'payment': 'payment_archive'}
+
+
+def requested(args):
+    """True if the request arguments ask for archived rows too."""
+    return args.get('include_archived', '').lower() in ('1', 'true', 'yes')
+
+
+def source(table, include_archived=False):
+    """``table`` itself, or a subquery over the hot and archived rows.
+
+    Use it where the table name goes in a FROM clause, with an alias:
+    ``f"FROM {source('payment', True)} AS p"``.
+    """
+    if not include_archived:
+        return table
+    columns = ', '.join(COLUMNS[table])
+    return f'(SELECT {columns} FROM {table} UNION ALL SELECT {columns} FROM {ARCHIVES[table]})'
+
+
+def _move(conn, table, ids):
+    columns = ', '.join(COLUMNS[table])
+    batch = dumps(ids)
+    conn.execute(
+        f"INSERT INTO {ARCHIVES[table]} ({columns}) "
+        f"SELECT {columns} FROM {table} WHERE id IN (SELECT value FROM json_each(?))",
+        (batch,),
+    )
+    cursor = tuple_cursor(conn)
+    head = cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'").fetchone()
+    cursor.execute(f"DELETE FROM {table} WHERE id IN (SELECT value FROM json_each(?))", (batch,))
+    # The delete trigger logged the move as deletes; mark them as archive moves
+    cursor.execute(
+        "UPDATE change_log SET op = 'archive' WHERE seq > ? AND table_name = ? AND op = 'delete'",
+        (head[0] if head else 0, table),
+    )
+
+
+def _run_batches(conn, next_batch, batch_size, pause, dry_run):
+    """Call ``next_batch`` until the candidates run out; returns (moved, batches)."""
+    moved = batches = 0
+    cursor = None
+    while True:
+        def work(conn):
+            return next_batch(conn, cursor, batch_size, dry_run)
+        if dry_run:
+            eligible, cursor, done = work(conn)
+        else:
+            eligible, cursor, done = run_write(conn, work)
+        moved += eligible
+        batches += 1
+        if done:
+            return moved, batches
+        if pause and not dry_run:
+            time.sleep(pause)
+
+
+def _payment_batch(before):
+    def next_batch(conn, cursor, batch_size, dry_run):
+        # Walk idx_payment_payment_date with a (payment_date, id) cursor, so
+        # old unpaid payments are stepped over once rather than every batch
+        after = cursor or ('', 0)
+        rows = tuple_cursor(conn).execute(
+            "SELECT payment_date, id, status FROM payment "
+            "WHERE payment_date < ? AND (payment_date, id) > (?, ?) "
+            "ORDER BY payment_date, id LIMIT ?",
+            (before, after[0], after[1], batch_size),
+        ).fetchall()
+        ids = [row[1] for row in rows if row[2] == PAYMENT_STATUS]
+        if ids and not dry_run:
+            _move(conn, 'payment', ids)
+        last = (rows[-1][0], rows[-1][1]) if rows else after
+        return len(ids), last, len(rows) < batch_size
+    return next_batch
+
+
+def _member_batch(before):
+    def next_batch(conn, cursor, batch_size, dry_run):
+        after = cursor or 0
+        # status = ? AND id > ? ORDER BY id walks idx_member_status in order
+        rows = tuple_cursor(conn).execute(
+            "SELECT m.id, m.leave_date < ? AND NOT EXISTS (SELECT 1 FROM payment p WHERE p.member_id = m.id) "
+            "FROM member m WHERE m.status = ? AND m.id > ? ORDER BY m.id LIMIT ?",
+            (before, MEMBER_STATUS, after, batch_size),
+        ).fetchall()
+        ids = [row[0] for row in rows if row[1]]
+        if ids and not dry_run:
+            _move(conn, 'member', ids)
+        return len(ids), rows[-1][0] if rows else after, len(rows) < batch_size
+    return next_batch
+
+
+def archive(conn, member_days=MEMBER_DAYS, payment_days=PAYMENT_DAYS, batch_size=BATCH_SIZE,
+            pause=PAUSE, dry_run=False, today=None):
+    """Archive eligible payments, then members. Returns counts and timings.
+
+    ``conn`` must not be in a transaction. With ``dry_run`` nothing is
+    moved; the member count then ignores payments the run would archive.
+    """
+    today = today or date.today()
+    report = {'dry_run': dry_run}
+    for table, days, make_batch in (('payment', payment_days, _payment_batch),
+                                    ('member', member_days, _member_batch)):
+        before = (today - timedelta(days=days)).isoformat()
+        start = time.perf_counter()
+        moved, batches = _run_batches(conn, make_batch(before), batch_size, pause, dry_run)
+        report[table] = {
+            'before': before,
+            'archived': moved,
+            'batches': batches,
+            'seconds': round(time.perf_counter() - start, 3),
+        }
+    return report
+
+
+def main():
+    from migrations import migrate
+
+    parser = argparse.ArgumentParser(description='Move departed members and settled payments to the archive tables.')
+    parser.add_argument('--db', default=os.environ.get(
+        'HOSTEL_DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'simple_hostel.db')))
+    parser.add_argument('--member-days', type=int, default=MEMBER_DAYS,
+                        help='Archive members who left more than this many days ago')
+    parser.add_argument('--payment-days', type=int, default=PAYMENT_DAYS,
+                        help='Archive completed payments older than this many days')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--pause', type=float, default=PAUSE, help='Seconds to wait between batches')
+    parser.add_argument('--dry-run', action='store_true', help='Only count what would be archived')
+    args = parser.parse_args()
+
+    migrate(args.db)
+    conn = sqlite3.connect(args.db, timeout=30)
+    # Same durability as the API's pooled connections (WAL, fsync at checkpoints)
+    conn.execute('PRAGMA synchronous = NORMAL')
+    try:
+        report = archive(conn, args.member_days, args.payment_days, args.batch_size, args.pause, args.dry_run)
+        if not args.dry_run:
+            # Refresh planner statistics for the shrunken tables
+            conn.execute('PRAGMA optimize')
+    finally:
+        conn.close()
+    verb = 'Would archive' if args.dry_run else 'Archived'
+    for table in ('payment', 'member'):
+        item = report[table]
+        print(f"{verb} {item['archived']} {table} rows dated before {item['before']} "
+              f"({item['batches']} batches, {item['seconds']}s)")
+
+
+if __name__ == '__main__':
+    main()
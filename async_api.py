@@ -0,0 +1,508 @@
+"""Asyncio serving mode for the hostel API.
+
+A plain ASGI application exposing the same read and write endpoints as
+auth_api.py (rooms, members, payments, reports and stats) for deployments
+with many slow or idle clients:
+
+    python async_api.py                      (uvicorn, single process)
+    uvicorn async_api:app --port 5001
+
+The event loop only parses requests and writes responses; it never touches
+SQLite. Reads run on a bounded thread pool (``HOSTEL_ASYNC_READERS``
+threads, each using a pooled WAL connection) and every write goes through
+the single writer thread of write_queue.py, which commits the writes queued
+together in one transaction instead of contending for SQLite's write lock.
+A client that sends its request slowly or reads the response slowly
+therefore costs a coroutine, not a worker thread.
+
+Query building, validation and report SQL are shared with the WSGI app
+(listing.py, bulk.py, allocation.py, reports.py). Streamed exports
+(``?stream=1`` / NDJSON), the server-sent change stream and the Prometheus
+metrics stay on the WSGI app; ``/api/changes`` long-polls here for the
+price of a coroutine per waiting client.
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import format_datetime, parsedate_to_datetime
+from functools import partial
+from urllib.parse import parse_qsl
+
+import allocation
+import archive
+import auth
+import billing
+import bulk
+import changes
+import instrumentation
+import reports
+import search
+from cache import ReadCache, table_versions, validators
+from db_pool import ConnectionPool
+from listing import MEMBERS, PAYMENTS, ROOMS, ListingError, build_list_query
+from migrations import migrate
+from serialize import dict_factory, dumps, rows_to_dicts, tuple_cursor
+from write_queue import WriteQueue
+
+instrumentation.setup_logging()
+logger = logging.getLogger('hostel.async')
+
+DB_PATH = os.environ.get('HOSTEL_DB_PATH', os.path.join(os.path.dirname(__file__), 'simple_hostel.db'))
+READERS = int(os.environ.get('HOSTEL_ASYNC_READERS', 8))
+AUTH_REQUIRED = os.environ.get('HOSTEL_AUTH_REQUIRED', '0') == '1'
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+
+class Database:
+    """Runs blocking SQLite work off the event loop.
+
+    ``read`` uses a pool of ``readers`` threads. ``write`` hands the work to
+    a ``WriteQueue``, whose single writer thread group-commits it with the
+    other writes queued at the time. The connection pool holds one
+    connection per reader thread, so a checkout never waits.
+    """
+
+    def __init__(self, db_path, readers=READERS):
+        self.pool = ConnectionPool(db_path, max_size=readers, row_factory=dict_factory)
+        self._readers = ThreadPoolExecutor(readers, thread_name_prefix='hostel-read')
+        self.writes = WriteQueue(db_path, row_factory=dict_factory)
+
+    def _run(self, work, args):
+        with self.pool.connection() as conn:
+            return work(conn, *args)
+
+    async def call(self, fn, *args):
+        """Run a blocking ``fn(*args)`` on a reader thread."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._readers, fn, *args)
+
+    async def read(self, work, *args):
+        return await self.call(self._run, work, args)
+
+    async def write(self, work, *args):
+        return await asyncio.wrap_future(self.writes.submit(work, *args))
+
+    def stats(self):
+        stats = self.pool.stats()
+        stats['reader_threads'] = self._readers._max_workers
+        stats['queued_reads'] = self._readers._work_queue.qsize()
+        stats['writes'] = self.writes.stats()
+        return stats
+
+    def close(self):
+        self._readers.shutdown(wait=True)
+        self.writes.close()
+        self.pool.close_all()
+
+
+migrate(DB_PATH)
+db = Database(DB_PATH)
+
+
+def cache_versions(tables):
+    # Blocking: dispatch calls read_cache.generation through db.call
+    with db.pool.connection() as conn:
+        return table_versions(conn, tables)
+
+
+# Generations are the trigger-maintained table versions, as in the WSGI
+# app, so writes from any process are seen at once
+read_cache = ReadCache(
+    max_entries=int(os.environ.get('HOSTEL_CACHE_SIZE', 512)),
+    ttl=float(os.environ.get('HOSTEL_CACHE_TTL', 5)),
+    versions=cache_versions,
+)
+change_notifier = changes.ChangeNotifier(DB_PATH)
+sessions = auth.SessionStore(
+    os.environ.get('HOSTEL_JWT_SECRET') or os.urandom(32).hex(),
+    ttl=int(os.environ.get('HOSTEL_TOKEN_TTL', auth.DEFAULT_TOKEN_TTL)),
+)
+
+
+class Request:
+    def __init__(self, scope, body):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.headers = {name.decode('latin-1').lower(): value.decode('latin-1')
+                        for name, value in scope['headers']}
+        self.query = parse_qsl(scope['query_string'].decode('latin-1'), keep_blank_values=True)
+        # First value wins, as with Flask's request.args.get
+        self.args = {}
+        for name, value in self.query:
+            self.args.setdefault(name, value)
+        self.body = body
+
+    def json(self):
+        try:
+            return json.loads(self.body) if self.body else None
+        except ValueError:
+            return None
+
+
+class Response:
+    def __init__(self, body, status=200, content_type='application/json', headers=None):
+        self.body = body if isinstance(body, bytes) else body.encode()
+        self.status = status
+        self.content_type = content_type
+        self.headers = headers or {}
+
+
+def json_response(value, status=200):
+    return Response(dumps(value) + '\n', status)
+
+
+def error(message, status=400):
+    return json_response({'message': message}, status)
+
+
+# Blocking work, run on the executor threads
+
+def fetch_list(conn, query):
+    cursor = tuple_cursor(conn)
+    query.check_cursor(cursor)
+    cursor.execute(query.sql, query.params)
+    rows = cursor.fetchall()
+    return dumps(query.payload(rows_to_dicts(cursor, rows))) + '\n'
+
+
+def create_room(conn, data):
+    result = bulk.insert_rooms(conn, [data])[0]
+    if result['status'] != 'created':
+        return result
+    allocation.free_rooms.invalidate()
+    result['room'] = conn.execute("SELECT * FROM room WHERE id = ?", (result['id'],)).fetchone()
+    return result
+
+
+def create_payment(conn, data):
+    result = bulk.insert_payments(conn, [data])[0]
+    if result['status'] == 'created':
+        result['payment'] = conn.execute("SELECT * FROM payment WHERE id = ?", (result['id'],)).fetchone()
+    return result
+
+
+def create_member(conn, data):
+    room_id = data.get('room_id')
+    max_price = data.get('max_price')
+    return allocation.check_in(
+        conn,
+        (data['name'], data['email'], data['phone'], data.get('emergency_contact', '')),
+        room_id=int(room_id) if room_id not in (None, '') else None,
+        room_type=data.get('room_type'),
+        max_price=float(max_price) if max_price not in (None, '') else None,
+    )
+
+
+# Handlers
+
+def list_handler(spec):
+    async def handler(request):
+        try:
+            query = build_list_query(spec, request.args)
+            return Response(await db.read(fetch_list, query))
+        except ListingError as e:
+            return error(str(e))
+    return handler
+
+
+async def search_handler(request):
+    try:
+        results = await db.read(search.search_members, request.args.get('q'),
+                                request.args.get('limit', search.DEFAULT_LIMIT))
+    except search.SearchError as e:
+        return error(str(e))
+    return json_response(results)
+
+
+async def occupancy_handler(request):
+    return json_response(await db.read(reports.occupancy_report))
+
+
+async def payments_report_handler(request):
+    try:
+        report = await db.read(
+            reports.payments_report,
+            request.args.get('start_date'),
+            request.args.get('end_date'),
+            request.args.get('group_by', 'month'),
+            request.args.get('limit', reports.DEFAULT_RECENT_LIMIT),
+            None,
+            archive.requested(request.args),
+        )
+    except (reports.ReportError, ValueError) as e:
+        return error(str(e))
+    return json_response(report)
+
+
+async def stats_handler(request):
+    return json_response(await db.read(reports.dashboard_stats))
+
+
+async def changes_handler(request):
+    try:
+        tables = changes.parse_tables(request.args.get('tables'))
+        limit = changes.parse_int(request.args.get('limit'), 'limit', changes.DEFAULT_LIMIT,
+                                  minimum=1, maximum=changes.MAX_LIMIT)
+        wait = changes.parse_int(request.args.get('wait'), 'wait', 0, maximum=int(changes.MAX_WAIT))
+        since = changes.parse_int(request.args.get('since'), 'since', None)
+    except changes.ChangeFeedError as e:
+        return error(str(e))
+    if since is None:
+        return json_response({'changes': [], 'next_since': await db.read(changes.head), 'has_more': False})
+    try:
+        batch = await db.read(changes.changes_since, since, limit, tables)
+        if not batch['changes'] and wait and await change_notifier.wait_async(batch['next_since'], wait):
+            batch = await db.read(changes.changes_since, batch['next_since'], limit, tables)
+    except changes.ResyncRequired as e:
+        return json_response({'message': str(e), 'resync': True}, 410)
+    return json_response(batch)
+
+
+async def billing_handler(request):
+    try:
+        kwargs = billing.options(request.json())
+        # Driven from a reader thread, which only reads; each chunk is
+        # written by the writer thread, between other queued writes
+        report = await db.read(partial(billing.run_billing, write=db.writes.run, **kwargs))
+    except billing.BillingError as e:
+        return error(str(e))
+    except sqlite3.Error as e:
+        logger.error("Database error in billing run: %s", e)
+        return error(f'Database error: {str(e)}', 500)
+    return json_response(report)
+
+
+async def pool_handler(request):
+    return json_response(db.stats())
+
+
+async def login_handler(request):
+    data = request.json() or {}
+    username = data.get('username')
+    password = data.get('password')
+    # Hash checks can be slow (werkzeug's pbkdf2), so they run off the loop too
+    admin = await db.read(auth.authenticate, username, password) if username and password else None
+    if admin is None and not AUTH_REQUIRED and username == 'svce' and password == '1234':
+        admin = (1, username)
+    if admin is None:
+        return error('Invalid username or password', 401)
+    admin_id, username = admin
+    return json_response({
+        'token': sessions.issue(admin_id, username),
+        'message': 'Authentication successful',
+        'user': {'username': username, 'role': 'admin'},
+    })
+
+
+async def logout_handler(request):
+    sessions.revoke(auth.bearer_token(request.headers.get('authorization')))
+    return json_response({'message': 'Logged out'})
+
+
+def single_insert_handler(work, key, message):
+    async def handler(request):
+        data = request.json()
+        if not isinstance(data, dict):
+            return error('Expected a JSON object')
+        try:
+            result = await db.write(work, data)
+        except sqlite3.Error as e:
+            logger.error("Database error: %s", e)
+            return error(f'Database error: {str(e)}', 500)
+        if result['status'] != 'created':
+            return error(result['message'])
+        return json_response({'message': message, key: result[key]}, 201)
+    return handler
+
+
+async def create_member_handler(request):
+    data = request.json()
+    if not isinstance(data, dict):
+        return error('Expected a JSON object')
+    try:
+        member_id, room_id = await db.write(create_member, data)
+    except allocation.AllocationError as e:
+        return error(str(e))
+    except Exception as e:
+        return error(f'Error: {str(e)}')
+    return json_response({'message': 'Member added successfully', 'id': member_id, 'room_id': room_id}, 201)
+
+
+def bulk_handler(validate, write, invalidate_rooms=False):
+    async def handler(request):
+        try:
+            # Row checks on the event loop; the writer only does the inserts
+            results, candidates = validate(json.loads(request.body or b'null'))
+            results = await db.write(write, results, candidates)
+        except (bulk.BulkError, ValueError) as e:
+            return error(str(e))
+        except sqlite3.Error as e:
+            logger.error("Database error in bulk insert: %s", e)
+            return error(f'Database error: {str(e)}', 500)
+        if invalidate_rooms:
+            allocation.free_rooms.invalidate()
+        created = sum(1 for result in results if result['status'] == 'created')
+        failed = len(results) - created
+        status = 201 if not failed else (207 if created else 400)
+        return json_response({'created': created, 'failed': failed, 'results': results}, status)
+    return handler
+
+
+# (method, path) -> (handler, tables read or written)
+ROUTES = {
+    ('POST', '/api/login'): (login_handler, ()),
+    ('POST', '/api/logout'): (logout_handler, ()),
+    ('GET', '/api/rooms'): (list_handler(ROOMS), ('room',)),
+    ('POST', '/api/rooms'): (single_insert_handler(create_room, 'room', 'Room created successfully'), ('room',)),
+    ('POST', '/api/rooms/bulk'): (bulk_handler(bulk.validate_rooms, bulk.write_rooms, invalidate_rooms=True), ('room',)),
+    ('GET', '/api/members'): (list_handler(MEMBERS), ('member', 'room')),
+    ('GET', '/api/members/search'): (search_handler, ('member', 'room')),
+    ('POST', '/api/members'): (create_member_handler, ('member', 'room')),
+    ('POST', '/api/members/bulk'): (bulk_handler(bulk.validate_members, bulk.write_members, invalidate_rooms=True), ('member', 'room')),
+    ('GET', '/api/payments'): (list_handler(PAYMENTS), ('payment',)),
+    ('POST', '/api/payments'): (single_insert_handler(create_payment, 'payment', 'Payment recorded successfully'), ('payment',)),
+    ('POST', '/api/payments/bulk'): (bulk_handler(bulk.validate_payments, bulk.write_payments), ('payment',)),
+    ('POST', '/api/billing/run'): (billing_handler, ('payment',)),
+    ('GET', '/api/reports/occupancy'): (occupancy_handler, ('room',)),
+    ('GET', '/api/reports/payments'): (payments_report_handler, ('payment', 'member')),
+    ('GET', '/api/stats'): (stats_handler, ('room', 'member', 'payment')),
+    ('GET', '/api/changes'): (changes_handler, ()),
+    ('GET', '/api/_pool'): (pool_handler, ()),
+}
+
+CORS_HEADERS = {
+    'access-control-allow-origin': '*',
+    'access-control-allow-methods': 'GET, POST, OPTIONS',
+    'access-control-allow-headers': 'Authorization, Content-Type',
+}
+
+
+async def dispatch(request):
+    if request.method == 'OPTIONS':
+        return Response(b'', 204, headers=dict(CORS_HEADERS))
+    route = ROUTES.get((request.method, request.path))
+    if route is None:
+        methods = [method for method, path in ROUTES if path == request.path]
+        return error('Method not allowed', 405) if methods else error('Not found', 404)
+    handler, tables = route
+
+    if AUTH_REQUIRED and handler is not login_handler:
+        if sessions.validate(auth.bearer_token(request.headers.get('authorization'))) is None:
+            return error('Token is missing, invalid or expired', 401)
+
+    if request.method != 'GET':
+        response = await handler(request)
+        if tables and response.status < 400:
+            read_cache.bump(*tables)
+        return response
+
+    if not tables:
+        return await handler(request)
+
+    # Same cache key, table versions and validators as the WSGI app
+    key = (request.path, tuple(sorted(request.query)))
+    generation = await db.call(read_cache.generation, tables)
+    etag, last_modified = validators(key, generation)
+    headers = {'etag': f'"{etag}"', 'cache-control': 'no-cache'}
+    if last_modified is not None:
+        headers['last-modified'] = format_datetime(last_modified, usegmt=True)
+    if _not_modified(request, etag, last_modified):
+        read_cache.record_not_modified()
+        headers['x-cache'] = 'NOT-MODIFIED'
+        return Response(b'', 304, headers=headers)
+
+    entry = read_cache.get(key, generation)
+    if entry is not None:
+        _, _, body, content_type, _, _ = entry
+        headers['x-cache'] = 'HIT'
+    else:
+        response = await handler(request)
+        if response.status != 200:
+            return response
+        body, content_type = response.body, response.content_type
+        read_cache.put(key, generation, body, content_type, etag)
+        headers['x-cache'] = 'MISS'
+    return Response(body, 200, content_type, headers)
+
+
+def _not_modified(request, etag, last_modified):
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match:
+        return if_none_match.strip() == '*' or f'"{etag}"' in if_none_match
+    since = request.headers.get('if-modified-since')
+    if last_modified is None or not since:
+        return False
+    try:
+        return last_modified <= parsedate_to_datetime(since)
+    except (TypeError, ValueError):
+        return False
+
+
+async def _read_body(receive):
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            return None
+        chunks.append(chunk)
+        if not message.get('more_body', False):
+            return b''.join(chunks)
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await asyncio.get_running_loop().run_in_executor(None, db.pool.warm)
+            logger.info("Async API ready (%d reader threads, 1 writer thread)", READERS)
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            db.close()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    """The ASGI application."""
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    body = await _read_body(receive)
+    if body is None:
+        return
+    request = Request(scope, body)
+    try:
+        response = await dispatch(request)
+    except Exception:
+        logger.exception("Unhandled error for %s %s", request.method, request.path)
+        response = error('Internal server error', 500)
+
+    headers = [(b'content-type', response.content_type.encode()),
+               (b'content-length', str(len(response.body)).encode())]
+    if request.path.startswith('/api/'):
+        response.headers.update(CORS_HEADERS)
+    headers.extend((name.encode(), value.encode()) for name, value in response.headers.items())
+    await send({'type': 'http.response.start', 'status': response.status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': response.body})
+
+
+if __name__ == '__main__':
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("uvicorn is not installed. Run: pip install uvicorn")
+    host, _, port = os.environ.get('HOSTEL_BIND', '0.0.0.0:5001').rpartition(':')
+    logger.info("Starting async Hostel Management System API on %s:%s", host or '0.0.0.0', port)
+    uvicorn.run(app, host=host or '0.0.0.0', port=int(port),
+                log_level=os.environ.get('HOSTEL_LOG_LEVEL', 'info').lower())
@@ -0,0 +1,165 @@
+"""Admin authentication: password checks, signed session tokens, revocation.
+
+The password hash is verified once, at login (``authenticate``). Login
+issues an HS256 JWT carrying the admin id and username, so a request can be
+authenticated without touching the database. ``SessionStore`` also
+remembers tokens it has already verified, which turns the per-request check
+into a dictionary lookup. Revoked token ids (logout) are kept in memory
+until the token would have expired anyway.
+
+Like the read cache, the validated-token and revocation caches are per
+process: with several workers, a logout is only seen by the worker that
+handled it. Keep ``HOSTEL_TOKEN_TTL`` short if that matters.
+"""
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+
+import jwt
+from werkzeug.security import check_password_hash, generate_password_hash
+
+ALGORITHM = 'HS256'
+DEFAULT_TOKEN_TTL = 8 * 3600
+MAX_CACHED_TOKENS = 10000
+
+
+def hash_password(password):
+    """Hash a new password with werkzeug's salted key derivation; used by add_admin.py."""
+    return generate_password_hash(password)
+
+
+def verify_password(stored, password):
+    """Check ``password`` against a werkzeug hash or a legacy ``sha256$salt$digest`` one.
+
+    The single-round ``sha256$`` format is only accepted so that admins
+    created by older versions of add_admin.py can still log in.
+    """
+    if not stored or password is None:
+        return False
+    if stored.startswith('sha256$'):
+        _, salt, digest = stored.split('$', 2)
+        candidate = hashlib.sha256((password + salt).encode()).hexdigest()
+        return hmac.compare_digest(candidate, digest)
+    try:
+        return check_password_hash(stored, password)
+    except (TypeError, ValueError):
+        return False
+
+
+def authenticate(conn, username, password):
+    """Return ``(id, username)`` for a valid admin login, otherwise None."""
+    row = conn.execute(
+        "SELECT id, username, password_hash FROM admin WHERE username = ?", (username,)
+    ).fetchone()
+    if row is None or not verify_password(row['password_hash'], password):
+        return None
+    return row['id'], row['username']
+
+
+def bearer_token(header):
+    """Extract the token from an ``Authorization: Bearer ...`` header value."""
+    if not header:
+        return None
+    scheme, _, token = header.partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        return None
+    return token.strip()
+
+
+class Principal:
+    """The admin a validated token belongs to."""
+
+    __slots__ = ('id', 'username', 'token_id', 'expires')
+
+    def __init__(self, id, username, token_id, expires):
+        self.id = id
+        self.username = username
+        self.token_id = token_id
+        self.expires = expires
+
+
+class SessionStore:
+    """Issues and validates session tokens and tracks revoked ones."""
+
+    def __init__(self, secret, ttl=DEFAULT_TOKEN_TTL, max_cached=MAX_CACHED_TOKENS):
+        self.secret = secret
+        self.ttl = ttl
+        self.max_cached = max_cached
+        self._lock = threading.Lock()
+        self._validated = {}
+        self._revoked = {}
+        self.issued = 0
+        self.decoded = 0
+        self.rejected = 0
+
+    def issue(self, admin_id, username):
+        now = int(time.time())
+        claims = {
+            'sub': str(admin_id),
+            'username': username,
+            'jti': secrets.token_hex(16),
+            'iat': now,
+            'exp': now + int(self.ttl),
+        }
+        with self._lock:
+            self.issued += 1
+        return jwt.encode(claims, self.secret, algorithm=ALGORITHM)
+
+    def _decode(self, token):
+        try:
+            claims = jwt.decode(token, self.secret, algorithms=[ALGORITHM],
+                                options={'require': ['exp', 'jti', 'sub']})
+        except jwt.InvalidTokenError:
+            return None
+        principal = Principal(int(claims['sub']), claims.get('username'), claims['jti'], claims['exp'])
+        with self._lock:
+            self.decoded += 1
+            if len(self._validated) >= self.max_cached:
+                self._purge(time.time())
+                if len(self._validated) >= self.max_cached:
+                    self._validated.clear()
+            self._validated[token] = principal
+        return principal
+
+    def validate(self, token):
+        """Return the Principal for a valid, unrevoked token, otherwise None."""
+        if not token:
+            return None
+        principal = self._validated.get(token) or self._decode(token)
+        if principal is None or principal.expires <= time.time() or principal.token_id in self._revoked:
+            with self._lock:
+                self.rejected += 1
+            return None
+        return principal
+
+    def revoke(self, token):
+        """Revoke ``token`` until it expires. Returns False if it was not valid."""
+        principal = self.validate(token)
+        if principal is None:
+            return False
+        with self._lock:
+            self._revoked[principal.token_id] = principal.expires
+            self._validated.pop(token, None)
+            self._purge(time.time())
+        return True
+
+    def _purge(self, now):
+        for token, principal in list(self._validated.items()):
+            if principal.expires <= now:
+                del self._validated[token]
+        for token_id, expires in list(self._revoked.items()):
+            if expires <= now:
+                del self._revoked[token_id]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'ttl_seconds': self.ttl,
+                'cached_tokens': len(self._validated),
+                'revoked_tokens': len(self._revoked),
+                'issued': self.issued,
+                'decoded': self.decoded,
+                'rejected': self.rejected,
+            }
@@ -1,86 +1,244 @@
-from flask import Flask, request, jsonify, render_template_string
+from flask import Flask, request, jsonify, render_template_string, g, Response, stream_with_context
 from flask_cors import CORS  # Import CORS
 import os
 import sqlite3
+import logging
 from datetime import datetime, timedelta
 import secrets
 from werkzeug.security import generate_password_hash, check_password_hash
 from functools import wraps
+from db_pool import ConnectionPool
+from migrations import migrate
+import auth
+import archive
+import billing
+import reports
+import search
+import changes
+import bulk
+import allocation
+from cache import ReadCache, cached, invalidates, table_versions
+import compression
+from serialize import dict_factory, dumps, json_array_sql, rows_to_dicts, tuple_cursor
+import instrumentation
+from instrumentation import InstrumentedConnection, Metrics, render_prometheus, serializing
+from listing import ROOMS, MEMBERS, PAYMENTS, ListingError, build_list_query
+from streaming import NDJSON_MIMETYPE, iter_json_array, iter_ndjson, wants_ndjson, wants_stream
+from write_queue import WriteQueue
+
+# Leveled logging, written by a background thread off the request path
+instrumentation.setup_logging()
+logger = logging.getLogger('hostel.api')
 
 # Create Flask app
 app = Flask(__name__)
 # Add CORS support
 CORS(app, resources={r"/api/*": {"origins": "*"}})
 app.config['SECRET_KEY'] = secrets.token_hex(16)
-app.config['JWT_SECRET_KEY'] = secrets.token_hex(32)
+# Set HOSTEL_JWT_SECRET so tokens survive restarts and work across workers
+app.config['JWT_SECRET_KEY'] = os.environ.get('HOSTEL_JWT_SECRET') or secrets.token_hex(32)
+# Check session tokens on every route; off by default for development
+app.config['AUTH_REQUIRED'] = os.environ.get('HOSTEL_AUTH_REQUIRED', '0') == '1'
+# Build full list responses with json_group_array inside SQLite
+app.config['SQL_JSON'] = os.environ.get('HOSTEL_SQL_JSON', '0') == '1'
 
 # Database setup
-DB_PATH = os.path.join(os.path.dirname(__file__), 'simple_hostel.db')
+DB_PATH = os.environ.get('HOSTEL_DB_PATH', os.path.join(os.path.dirname(__file__), 'simple_hostel.db'))
+
+# Bring the schema (tables and indexes) up to date once, before serving
+migrate(DB_PATH)
+
+# Shared connection pool. Each request checks out one connection on first use
+# and hands it back when the app context is torn down.
+pool = ConnectionPool(
+    DB_PATH,
+    max_size=int(os.environ.get('HOSTEL_DB_POOL_SIZE', 8)),
+    row_factory=dict_factory,
+    factory=InstrumentedConnection,
+)
+
+# Single-row writes go to one writer thread per process, which commits them
+# in groups (HOSTEL_WRITE_BATCH, HOSTEL_WRITE_DELAY_MS) instead of every
+# request thread contending for the write lock
+write_queue = WriteQueue(DB_PATH, row_factory=dict_factory)
+
+# Per-route timing, SQL and payload metrics, served at /api/_metrics
+metrics = Metrics()
+instrumentation.init_app(app, metrics, logger)
+
+# Read cache and ETag / Last-Modified validators for GET endpoints, keyed
+# on the table change counters kept by triggers in the database
+read_cache = ReadCache(
+    max_entries=int(os.environ.get('HOSTEL_CACHE_SIZE', 512)),
+    ttl=float(os.environ.get('HOSTEL_CACHE_TTL', 5)),
+    versions=lambda tables: table_versions(get_db(), tables),
+)
+
+# gzip / brotli for responses above HOSTEL_COMPRESS_MIN_BYTES
+compression.init_app(app)
 
-def dict_factory(cursor, row):
-    d = {}
-    for idx, col in enumerate(cursor.description):
-        d[col[0]] = row[idx]
-    return d
+# Signed session tokens, validated without a database round trip
+sessions = auth.SessionStore(
+    app.config['JWT_SECRET_KEY'],
+    ttl=int(os.environ.get('HOSTEL_TOKEN_TTL', auth.DEFAULT_TOKEN_TTL)),
+)
+# Wakes long-poll and server-sent-event clients of /api/changes
+change_notifier = changes.ChangeNotifier(DB_PATH)
+# Streams end after this long so gunicorn threads are not held forever
+SSE_MAX_SECONDS = float(os.environ.get('HOSTEL_SSE_MAX_SECONDS', 300))
+
+if app.config['AUTH_REQUIRED'] and not os.environ.get('HOSTEL_JWT_SECRET'):
+    logger.warning("HOSTEL_JWT_SECRET is not set; tokens will not survive a restart or work across workers")
+
+def get_db():
+    """Return the pooled connection bound to the current request."""
+    if 'db' not in g:
+        g.db = pool.acquire()
+    return g.db
+
+@app.teardown_appcontext
+def release_db(exception):
+    conn = g.pop('db', None)
+    if conn is not None:
+        pool.release(conn)
+
+def json_response(body, status=200):
+    """Wrap an already encoded JSON string in a response."""
+    return app.response_class(body + '\n', status=status, mimetype='application/json')
+
+def list_response(spec):
+    """Run a list query for ``spec`` built from the request arguments."""
+    try:
+        query = build_list_query(spec, request.args)
+    except ListingError as e:
+        return jsonify({'message': str(e)}), 400
+
+    # Rows are read as plain tuples; column names are resolved once per query
+    conn = get_db()
+    cursor = tuple_cursor(conn)
+    try:
+        query.check_cursor(cursor)
+    except ListingError as e:
+        return jsonify({'message': str(e)}), 400
+
+    if wants_stream(request):
+        cursor.execute(query.sql, query.params)
+        # Rows are encoded batch by batch while the cursor is still open;
+        # stream_with_context keeps the pooled connection checked out until
+        # the generator is exhausted.
+        limit = query.limit if query.paginated else None
+        if wants_ndjson(request):
+            body = iter_ndjson(cursor, limit)
+            mimetype = NDJSON_MIMETYPE
+        else:
+            body = iter_json_array(cursor, limit)
+            mimetype = 'application/json'
+        return Response(stream_with_context(body), mimetype=mimetype)
+
+    if app.config['SQL_JSON'] and not query.paginated:
+        # Let SQLite build the JSON array; Python only passes the string on
+        cursor.execute(json_array_sql(query.sql, query.columns), query.params)
+        return json_response(cursor.fetchone()[0])
+
+    cursor.execute(query.sql, query.params)
+    rows = cursor.fetchall()
+    with serializing():
+        body = dumps(query.payload(rows_to_dicts(cursor, rows)))
+    return json_response(body)
+
+def bulk_response(validate, write):
+    """Run a bulk insert over the request body and report per-row results.
+
+    The per-row checks run here, on the request thread; only the lookups and
+    inserts are queued for the writer thread.
+    """
+    try:
+        results, candidates = validate(request.get_json())
+        results = write_queue.run(write, results, candidates)
+    except bulk.BulkError as e:
+        return jsonify({'message': str(e)}), 400
+    except sqlite3.Error as e:
+        logger.error("Database error in bulk insert: %s", e)
+        return jsonify({'message': f'Database error: {str(e)}'}), 500
+
+    created = sum(1 for result in results if result['status'] == 'created')
+    failed = len(results) - created
+    # 201 when everything was created, 207 for partial success, 400 for none
+    status = 201 if not failed else (207 if created else 400)
+    return jsonify({'created': created, 'failed': failed, 'results': results}), status
+
+# Stand-in admin used while authentication is disabled for development
+class DummyAdmin:
+    id = 1
+    username = "admin"
+
+DUMMY_ADMIN = DummyAdmin()
 
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        # For development environment, skip token check completely
-        # Create a dummy admin object for compatibility
-        class DummyAdmin:
-            id = 1
-            username = "admin"
+        if not app.config['AUTH_REQUIRED']:
+            # For development environment, skip token check completely
+            return f(DUMMY_ADMIN, *args, **kwargs)
         
-        # Pass the dummy admin to the wrapped function
-        return f(DummyAdmin(), *args, **kwargs)
+        current_admin = sessions.validate(auth.bearer_token(request.headers.get('Authorization')))
+        if current_admin is None:
+            return jsonify({'message': 'Token is missing, invalid or expired'}), 401
+        return f(current_admin, *args, **kwargs)
     return decorated
 
 @app.route('/api/login', methods=['POST'])
 def login():
-    data = request.get_json()
-    print(f"Login attempt with username: {data.get('username')}")
+    data = request.get_json(silent=True) or {}
+    username = data.get('username')
+    password = data.get('password')
+    logger.info("Login attempt with username: %s", username)
     
-    # Check for the specific admin credentials
-    if data.get('username') == 'svce' and data.get('password') == '1234':
-        token = secrets.token_hex(16)  # Generate a random token
-        return jsonify({
-            'token': token, 
-            'message': 'Authentication successful',
-            'user': {
-                'username': 'svce',
-                'role': 'admin'
-            }
-        })
-    else:
-        print(f"Login failed: Invalid credentials")
+    # The password hash is checked here once; later requests only carry the token
+    admin = auth.authenticate(get_db(), username, password) if username and password else None
+    if admin is None and not app.config['AUTH_REQUIRED'] and username == 'svce' and password == '1234':
+        # Built-in development login
+        admin = (DUMMY_ADMIN.id, username)
+    
+    if admin is None:
+        logger.warning("Login failed: invalid credentials")
         return jsonify({'message': 'Invalid username or password'}), 401
+    
+    admin_id, username = admin
+    return jsonify({
+        'token': sessions.issue(admin_id, username),
+        'message': 'Authentication successful',
+        'user': {
+            'username': username,
+            'role': 'admin'
+        }
+    })
+
+@app.route('/api/logout', methods=['POST'])
+@token_required
+def logout(current_admin):
+    sessions.revoke(auth.bearer_token(request.headers.get('Authorization')))
+    return jsonify({'message': 'Logged out'})
 
 # Room routes
 @app.route('/api/rooms', methods=['GET'])
 @token_required
+@cached(read_cache, 'room')
 def get_rooms(current_admin):
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = dict_factory
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT * FROM room")
-    rooms = cursor.fetchall()
-    
-    conn.close()
-    return jsonify(rooms)
+    return list_response(ROOMS)
 
 @app.route('/api/rooms', methods=['POST'])
 @token_required
+@invalidates(read_cache, 'room')
 def create_room(current_admin):
     data = request.get_json()
-    print(f"Received room creation data: {data}")
+    logger.debug("Received room creation data: %s", data)
     
     # Validate the data
     required_fields = ['room_number', 'capacity', 'room_type', 'price_per_month']
     for field in required_fields:
         if field not in data:
-            print(f"Missing required field: {field}")
+            logger.debug("Missing required field: %s", field)
             return jsonify({'message': f'Missing required field: {field}'}), 400
     
     try:
@@ -94,167 +252,150 @@ def create_room(current_admin):
         if price <= 0:
             return jsonify({'message': 'Price must be greater than 0'}), 400
         
-        # Check if room number already exists
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = dict_factory
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT id FROM room WHERE room_number = ?", (data['room_number'],))
-        existing_room = cursor.fetchone()
-        if existing_room:
-            conn.close()
-            return jsonify({'message': 'Room number already exists'}), 400
-        
-        print(f"Inserting new room: {data['room_number']}, capacity: {capacity}, type: {data['room_type']}, price: {price}")
-        
-        cursor.execute(
-            "INSERT INTO room (room_number, capacity, current_occupancy, room_type, price_per_month, status) VALUES (?, ?, ?, ?, ?, ?)",
-            (data['room_number'], capacity, 0, data['room_type'], price, 'available')
-        )
+        logger.debug("Inserting new room: %s, capacity: %s, type: %s, price: %s", data['room_number'], capacity, data['room_type'], price)
         
-        room_id = cursor.lastrowid
-        conn.commit()
+        def insert_room(conn):
+            # Check if room number already exists
+            cursor = conn.cursor()
+            cursor.execute("SELECT id FROM room WHERE room_number = ?", (data['room_number'],))
+            if cursor.fetchone():
+                return None
+            cursor.execute(
+                "INSERT INTO room (room_number, capacity, current_occupancy, room_type, price_per_month, status) VALUES (?, ?, ?, ?, ?, ?)",
+                (data['room_number'], capacity, 0, data['room_type'], price, 'available')
+            )
+            # Return the created room
+            cursor.execute("SELECT * FROM room WHERE id = ?", (cursor.lastrowid,))
+            return cursor.fetchone()
         
-        # Return the created room
-        cursor.execute("SELECT * FROM room WHERE id = ?", (room_id,))
-        created_room = cursor.fetchone()
+        created_room = write_queue.run(insert_room)
+        if created_room is None:
+            return jsonify({'message': 'Room number already exists'}), 400
+        allocation.free_rooms.invalidate()
         
-        conn.close()
-        print(f"Room created successfully: {created_room}")
+        logger.info("Room created: %s", created_room['room_number'])
         return jsonify({'message': 'Room created successfully', 'room': created_room}), 201
     except ValueError as e:
-        print(f"Value error: {str(e)}")
+        logger.debug("Value error: %s", e)
         return jsonify({'message': f'Invalid numeric value: {str(e)}'}), 400
     except sqlite3.Error as e:
-        print(f"Database error: {str(e)}")
+        logger.error("Database error: %s", e)
         return jsonify({'message': f'Database error: {str(e)}'}), 500
     except Exception as e:
-        print(f"Error creating room: {str(e)}")
+        logger.exception("Error creating room")
         return jsonify({'message': f'Error: {str(e)}'}), 500
 
+@app.route('/api/rooms/bulk', methods=['POST'])
+@token_required
+@invalidates(read_cache, 'room')
+def create_rooms_bulk(current_admin):
+    response = bulk_response(bulk.validate_rooms, bulk.write_rooms)
+    allocation.free_rooms.invalidate()
+    return response
+
 # Member routes
 @app.route('/api/members', methods=['GET'])
 @token_required
+@cached(read_cache, 'member', 'room')
 def get_members(current_admin):
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = dict_factory
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-    SELECT m.*, r.room_number 
-    FROM member m
-    LEFT JOIN room r ON m.room_id = r.id
-    """)
-    members = cursor.fetchall()
-    
-    conn.close()
-    return jsonify(members)
+    return list_response(MEMBERS)
+
+@app.route('/api/members/search', methods=['GET'])
+@token_required
+@cached(read_cache, 'member', 'room')
+def search_members(current_admin):
+    try:
+        results = search.search_members(
+            get_db(),
+            request.args.get('q'),
+            limit=request.args.get('limit', search.DEFAULT_LIMIT),
+        )
+    except search.SearchError as e:
+        return jsonify({'message': str(e)}), 400
+    return jsonify(results)
 
 @app.route('/api/members', methods=['POST'])
 @token_required
+@invalidates(read_cache, 'member', 'room')
 def create_member(current_admin):
     data = request.get_json()
     try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = dict_factory
-        cursor = conn.cursor()
-        
-        # Check if room is full
-        cursor.execute("SELECT current_occupancy, capacity FROM room WHERE id = ?", (data['room_id'],))
-        room = cursor.fetchone()
-        if room['current_occupancy'] >= room['capacity']:
-            conn.close()
-            return jsonify({'message': 'Room is full'}), 400
-        
-        cursor.execute(
-            "INSERT INTO member (name, email, phone, room_id, emergency_contact) VALUES (?, ?, ?, ?, ?)",
-            (data['name'], data['email'], data['phone'], data['room_id'], data.get('emergency_contact', ''))
-        )
+        member = (data['name'], data['email'], data['phone'], data.get('emergency_contact', ''))
         
-        # Update room occupancy
-        cursor.execute(
-            "UPDATE room SET current_occupancy = ? WHERE id = ?",
-            (room['current_occupancy'] + 1, data['room_id'])
+        # Without a room_id the best free room is picked, optionally limited
+        # by room_type and max_price
+        room_id = data.get('room_id')
+        max_price = data.get('max_price')
+        member_id, room_id = write_queue.run(
+            allocation.check_in,
+            member,
+            room_id=int(room_id) if room_id not in (None, '') else None,
+            room_type=data.get('room_type'),
+            max_price=float(max_price) if max_price not in (None, '') else None,
         )
-        
-        conn.commit()
-        conn.close()
-        return jsonify({'message': 'Member added successfully'}), 201
+        return jsonify({'message': 'Member added successfully', 'id': member_id, 'room_id': room_id}), 201
+    except allocation.AllocationError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'Error: {str(e)}'}), 400
 
+@app.route('/api/members/bulk', methods=['POST'])
+@token_required
+@invalidates(read_cache, 'member', 'room')
+def create_members_bulk(current_admin):
+    response = bulk_response(bulk.validate_members, bulk.write_members)
+    allocation.free_rooms.invalidate()
+    return response
+
 # Reports
 @app.route('/api/reports/occupancy', methods=['GET'])
 @token_required
+@cached(read_cache, 'room')
 def occupancy_report(current_admin):
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = dict_factory
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT room_number, capacity, current_occupancy FROM room")
-    rooms = cursor.fetchall()
-    
-    # Calculate occupancy rate for each room
-    for room in rooms:
-        room['occupancy_rate'] = (room['current_occupancy'] / room['capacity']) * 100 if room['capacity'] > 0 else 0
-    
-    conn.close()
-    return jsonify(rooms)
+    return jsonify(reports.occupancy_report(get_db()))
 
 @app.route('/api/reports/payments', methods=['GET'])
 @token_required
+@cached(read_cache, 'payment', 'member')
 def payments_report(current_admin):
-    # Just return dummy data for now since we don't have a payments table
-    return jsonify({
-        'payments': [],
-        'total_amount': 0
-    })
+    try:
+        report = reports.payments_report(
+            get_db(),
+            start_date=request.args.get('start_date'),
+            end_date=request.args.get('end_date'),
+            group_by=request.args.get('group_by', 'month'),
+            limit=request.args.get('limit', reports.DEFAULT_RECENT_LIMIT),
+            include_archived=archive.requested(request.args),
+        )
+    except (reports.ReportError, ValueError) as e:
+        return jsonify({'message': str(e)}), 400
+    return jsonify(report)
 
 # Payments routes
 @app.route('/api/payments', methods=['GET'])
 @token_required
+@cached(read_cache, 'payment')
 def get_payments(current_admin):
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = dict_factory
-    cursor = conn.cursor()
-    
-    # Check if the payments table exists, create it if it doesn't
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='payment'")
-    if not cursor.fetchone():
-        cursor.execute('''
-        CREATE TABLE payment (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            member_id INTEGER,
-            amount REAL,
-            payment_type TEXT,
-            payment_date TEXT,
-            due_date TEXT,
-            status TEXT,
-            description TEXT,
-            FOREIGN KEY (member_id) REFERENCES member (id)
-        )
-        ''')
-        conn.commit()
-        conn.close()
-        return jsonify([])
-    
-    cursor.execute("SELECT * FROM payment ORDER BY payment_date DESC")
-    payments = cursor.fetchall()
-    
-    conn.close()
-    return jsonify(payments)
+    return list_response(PAYMENTS)
+
+@app.route('/api/payments/bulk', methods=['POST'])
+@token_required
+@invalidates(read_cache, 'payment')
+def create_payments_bulk(current_admin):
+    return bulk_response(bulk.validate_payments, bulk.write_payments)
 
 @app.route('/api/payments', methods=['POST'])
 @token_required
+@invalidates(read_cache, 'payment')
 def create_payment(current_admin):
     data = request.get_json()
-    print(f"Received payment data: {data}")
+    logger.debug("Received payment data: %s", data)
     
     # Validate the data
     required_fields = ['member_id', 'amount', 'payment_type']
     for field in required_fields:
         if field not in data:
-            print(f"Missing required field: {field}")
+            logger.debug("Missing required field: %s", field)
             return jsonify({'message': f'Missing required field: {field}'}), 400
     
     try:
@@ -263,96 +404,223 @@ def create_payment(current_admin):
         if amount <= 0:
             return jsonify({'message': 'Amount must be greater than 0'}), 400
         
-        # Check if member exists
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = dict_factory
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT id FROM member WHERE id = ?", (data['member_id'],))
-        member = cursor.fetchone()
-        if not member:
-            conn.close()
-            return jsonify({'message': 'Member not found'}), 400
-        
         # Set payment date to current date if not provided
         payment_date = data.get('payment_date', datetime.now().strftime('%Y-%m-%d'))
         
         # Set default status to 'completed'
         status = data.get('status', 'completed')
         
-        print(f"Creating payment: {amount} for member {data['member_id']}, type: {data['payment_type']}")
+        logger.debug("Creating payment: %s for member %s, type: %s", amount, data['member_id'], data['payment_type'])
         
-        # Check if payments table exists
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='payment'")
-        if not cursor.fetchone():
-            cursor.execute('''
-            CREATE TABLE payment (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                member_id INTEGER,
-                amount REAL,
-                payment_type TEXT,
-                payment_date TEXT,
-                due_date TEXT,
-                status TEXT,
-                description TEXT,
-                FOREIGN KEY (member_id) REFERENCES member (id)
+        def insert_payment(conn):
+            # Check if member exists
+            cursor = conn.cursor()
+            cursor.execute("SELECT id FROM member WHERE id = ?", (data['member_id'],))
+            if not cursor.fetchone():
+                return None
+            cursor.execute(
+                "INSERT INTO payment (member_id, amount, payment_type, payment_date, due_date, status, description) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    data['member_id'], 
+                    amount,
+                    data['payment_type'],
+                    payment_date,
+                    data.get('due_date', None),
+                    status,
+                    data.get('description', '')
+                )
             )
-            ''')
+            # Return the created payment
+            cursor.execute("SELECT * FROM payment WHERE id = ?", (cursor.lastrowid,))
+            return cursor.fetchone()
         
-        cursor.execute(
-            "INSERT INTO payment (member_id, amount, payment_type, payment_date, due_date, status, description) VALUES (?, ?, ?, ?, ?, ?, ?)",
-            (
-                data['member_id'], 
-                amount,
-                data['payment_type'],
-                payment_date,
-                data.get('due_date', None),
-                status,
-                data.get('description', '')
-            )
-        )
-        
-        payment_id = cursor.lastrowid
-        conn.commit()
-        
-        # Return the created payment
-        cursor.execute("SELECT * FROM payment WHERE id = ?", (payment_id,))
-        created_payment = cursor.fetchone()
+        created_payment = write_queue.run(insert_payment)
+        if created_payment is None:
+            return jsonify({'message': 'Member not found'}), 400
         
-        conn.close()
-        print(f"Payment created successfully: {created_payment}")
+        logger.info("Payment %s recorded for member %s", created_payment['id'], data['member_id'])
         return jsonify({'message': 'Payment recorded successfully', 'payment': created_payment}), 201
     except ValueError as e:
-        print(f"Value error: {str(e)}")
+        logger.debug("Value error: %s", e)
         return jsonify({'message': f'Invalid numeric value: {str(e)}'}), 400
     except sqlite3.Error as e:
-        print(f"Database error: {str(e)}")
+        logger.error("Database error: %s", e)
         return jsonify({'message': f'Database error: {str(e)}'}), 500
     except Exception as e:
-        print(f"Error creating payment: {str(e)}")
+        logger.exception("Error creating payment")
         return jsonify({'message': f'Error: {str(e)}'}), 500
 
+# Monthly billing: one set-based run instead of a POST per resident
+@app.route('/api/billing/run', methods=['POST'])
+@token_required
+@invalidates(read_cache, 'payment')
+def run_billing(current_admin):
+    try:
+        # Chunks are written by the writer thread, between other queued writes
+        report = billing.run_billing(get_db(), write=write_queue.run,
+                                     **billing.options(request.get_json(silent=True)))
+    except billing.BillingError as e:
+        return jsonify({'message': str(e)}), 400
+    except sqlite3.Error as e:
+        logger.error("Database error in billing run: %s", e)
+        return jsonify({'message': f'Database error: {str(e)}'}), 500
+    logger.info("Billing run for %s by %s: %s charges in %ss",
+                report['period'], current_admin.username, report['billed'], report['seconds'])
+    return jsonify(report)
+
+# Dashboard summary, read from the aggregate tables kept current by triggers
+@app.route('/api/stats', methods=['GET'])
+@token_required
+@cached(read_cache, 'room', 'member', 'payment')
+def get_stats(current_admin):
+    return jsonify(reports.dashboard_stats(get_db()))
+
+# Incremental sync. These routes check out a pooled connection only while
+# reading a batch, never while waiting, so idle clients cannot drain the pool.
+@app.route('/api/changes', methods=['GET'])
+@token_required
+def get_changes(current_admin):
+    try:
+        tables = changes.parse_tables(request.args.get('tables'))
+        limit = changes.parse_int(request.args.get('limit'), 'limit', changes.DEFAULT_LIMIT,
+                                  minimum=1, maximum=changes.MAX_LIMIT)
+        wait = changes.parse_int(request.args.get('wait'), 'wait', 0, maximum=int(changes.MAX_WAIT))
+        since = changes.parse_int(request.args.get('since'), 'since', None)
+    except changes.ChangeFeedError as e:
+        return jsonify({'message': str(e)}), 400
+
+    if since is None:
+        # Take the cursor before the initial full load so nothing is missed
+        with pool.connection() as conn:
+            return jsonify({'changes': [], 'next_since': changes.head(conn), 'has_more': False})
+
+    try:
+        with pool.connection() as conn:
+            batch = changes.changes_since(conn, since, limit, tables)
+        if not batch['changes'] and wait and change_notifier.wait(batch['next_since'], wait):
+            with pool.connection() as conn:
+                batch = changes.changes_since(conn, batch['next_since'], limit, tables)
+    except changes.ResyncRequired as e:
+        return jsonify({'message': str(e), 'resync': True}), 410
+    response = jsonify(batch)
+    response.cache_control.no_store = True
+    return response
+
+@app.route('/api/changes/stream', methods=['GET'])
+@token_required
+def stream_changes(current_admin):
+    try:
+        tables = changes.parse_tables(request.args.get('tables'))
+        limit = changes.parse_int(request.args.get('limit'), 'limit', changes.DEFAULT_LIMIT,
+                                  minimum=1, maximum=changes.MAX_LIMIT)
+        # EventSource sends the last event id back when it reconnects
+        since = changes.parse_int(request.headers.get('Last-Event-ID') or request.args.get('since'),
+                                  'since', None)
+    except changes.ChangeFeedError as e:
+        return jsonify({'message': str(e)}), 400
+    if since is None:
+        with pool.connection() as conn:
+            since = changes.head(conn)
+
+    events = changes.iter_events(pool, change_notifier, since, limit, tables, max_seconds=SSE_MAX_SECONDS)
+    response = Response(events, mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Tell nginx-style proxies not to buffer the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# Diagnostics
+@app.route('/api/_pool', methods=['GET'])
+@token_required
+def pool_stats(current_admin):
+    return jsonify(pool.stats())
+
+@app.route('/api/_sessions', methods=['GET'])
+@token_required
+def session_stats(current_admin):
+    return jsonify(sessions.stats())
+
+@app.route('/api/_changes', methods=['GET'])
+@token_required
+def change_stats(current_admin):
+    return jsonify(change_notifier.stats())
+
+@app.route('/api/_writes', methods=['GET'])
+@token_required
+def write_stats(current_admin):
+    return jsonify(write_queue.stats())
+
+@app.route('/api/_cache', methods=['GET'])
+@token_required
+def cache_stats(current_admin):
+    return jsonify(read_cache.stats())
+
+@app.route('/api/_metrics', methods=['GET'])
+def prometheus_metrics():
+    # Left open so a Prometheus scraper can read it without a token
+    pool_stats = pool.stats()
+    cache_stats = read_cache.stats()
+    write_stats = write_queue.stats()
+    extra = {
+        'hostel_db_pool_live_connections': ('gauge', 'Open pooled connections.', pool_stats['live_connections']),
+        'hostel_db_pool_in_use': ('gauge', 'Connections checked out.', pool_stats['in_use']),
+        'hostel_db_pool_checkouts_total': ('counter', 'Connection checkouts.', pool_stats['checkouts']),
+        'hostel_db_pool_wait_seconds_total': ('counter', 'Time spent waiting for a connection.', pool_stats['wait_seconds_total']),
+        'hostel_db_pool_timeouts_total': ('counter', 'Checkouts that timed out.', pool_stats['timeouts']),
+        'hostel_cache_hits_total': ('counter', 'Read cache hits.', cache_stats['hits']),
+        'hostel_cache_misses_total': ('counter', 'Read cache misses.', cache_stats['misses']),
+        'hostel_cache_not_modified_total': ('counter', 'Responses answered with 304.', cache_stats['not_modified']),
+        'hostel_cache_entries': ('gauge', 'Cached responses.', cache_stats['entries']),
+        'hostel_write_queue_depth': ('gauge', 'Mutations waiting for the writer thread.', write_stats['queue_depth']),
+        'hostel_write_queue_max_depth': ('gauge', 'Deepest the write queue has been.', write_stats['max_queue_depth']),
+        'hostel_write_mutations_total': ('counter', 'Mutations committed by the writer thread.', write_stats['committed']),
+        'hostel_write_failures_total': ('counter', 'Mutations that raised or whose batch failed.', write_stats['failed']),
+        'hostel_write_batches_total': ('counter', 'Group commits.', write_stats['batches']),
+        'hostel_write_busy_retries_total': ('counter', 'Batches retried because the database was locked.', write_stats['busy_retries']),
+        'hostel_write_queue_wait_seconds_total': ('counter', 'Time mutations spent queued.', write_stats['queue_wait_seconds_total']),
+        'hostel_write_commit_seconds_total': ('counter', 'Time spent running and committing batches.', write_stats['commit_seconds_total']),
+    }
+    return Response(render_prometheus(metrics, extra), mimetype='text/plain; version=0.0.4')
+
 @app.route('/')
 def home():
     return '''
     <h1>Hostel Management System API</h1>
-    <p>This is a simplified API with token authentication disabled for development.</p>
+    <p>This is a simplified API. Token authentication is disabled for development unless <code>HOSTEL_AUTH_REQUIRED=1</code> is set.</p>
     <h2>Available Endpoints:</h2>
     <ul>
-        <li><code>POST /api/login</code> - Login (automatically succeeds)</li>
-        <li><code>GET /api/rooms</code> - Get all rooms</li>
+        <li><code>POST /api/login</code> - Login; returns a signed session token</li>
+        <li><code>POST /api/logout</code> - Revoke the current session token</li>
+        <li><code>GET /api/rooms</code> - List rooms (<code>?after_id=&amp;limit=&amp;sort=&amp;fields=&amp;status=&amp;room_type=</code>)</li>
         <li><code>POST /api/rooms</code> - Create new room</li>
-        <li><code>GET /api/members</code> - Get all members</li>
-        <li><code>POST /api/members</code> - Add new member</li>
+        <li><code>POST /api/rooms/bulk</code> - Create many rooms in one transaction</li>
+        <li><code>GET /api/members</code> - List members (<code>?after_id=&amp;limit=&amp;sort=&amp;fields=&amp;status=&amp;room_id=&amp;room_type=&amp;start_date=&amp;end_date=&amp;include_archived=</code>)</li>
+        <li><code>GET /api/members/search</code> - Ranked prefix search over name, email, phone and emergency contact (<code>?q=&amp;limit=</code>)</li>
+        <li><code>POST /api/members</code> - Add new member (omit <code>room_id</code> to auto-assign by <code>room_type</code>/<code>max_price</code>)</li>
+        <li><code>POST /api/members/bulk</code> - Add many members in one transaction</li>
+        <li><code>GET /api/stats</code> - Dashboard totals, occupancy by room type and revenue by month</li>
         <li><code>GET /api/reports/occupancy</code> - Get occupancy report</li>
-        <li><code>GET /api/reports/payments</code> - Get payments report</li>
-        <li><code>GET /api/payments</code> - Get all payments</li>
+        <li><code>GET /api/reports/payments</code> - Payments report (<code>?start_date=&amp;end_date=&amp;group_by=month|day|year|payment_type|status&amp;limit=&amp;include_archived=</code>)</li>
+        <li><code>GET /api/payments</code> - List payments (<code>?after_id=&amp;limit=&amp;sort=&amp;fields=&amp;status=&amp;member_id=&amp;payment_type=&amp;start_date=&amp;end_date=&amp;include_archived=</code>)</li>
         <li><code>POST /api/payments</code> - Create new payment</li>
+        <li><code>POST /api/payments/bulk</code> - Record many payments in one transaction</li>
+        <li><code>POST /api/billing/run</code> - Charge every active member their room's rent for a period (<code>{"period": "YYYY-MM", "due_day": 5, "dry_run": false}</code>); safe to repeat</li>
+        <li><code>GET /api/changes</code> - Rows written since a sync cursor (<code>?since=&amp;limit=&amp;tables=room,member,payment&amp;wait=</code>; <code>wait</code> long-polls up to 30 s)</li>
+        <li><code>GET /api/changes/stream</code> - The same changes as server-sent events (<code>?since=</code> or <code>Last-Event-ID</code>)</li>
+        <li>List endpoints stream the full result with <code>?stream=1</code> (JSON array) or <code>Accept: application/x-ndjson</code></li>
+        <li><code>GET /api/_pool</code> - Database connection pool metrics</li>
+        <li><code>GET /api/_sessions</code> - Session token cache counters</li>
+        <li><code>GET /api/_changes</code> - Change feed waiters and wake-ups</li>
+        <li><code>GET /api/_writes</code> - Write queue depth, batch sizes and group-commit timings</li>
+        <li><code>GET /api/_cache</code> - Read cache hit/miss counters</li>
+        <li><code>GET /api/_metrics</code> - Per-route latency, SQL and payload metrics (Prometheus text format)</li>
     </ul>
-    <p>Note: Authentication is disabled for development purposes.</p>
+    <p>Note: with <code>HOSTEL_AUTH_REQUIRED=1</code>, send <code>Authorization: Bearer &lt;token&gt;</code> from <code>/api/login</code>; admins are added with <code>add_admin.py</code>.</p>
     '''
 
 if __name__ == '__main__':
-    print("Starting Hostel Management System API...")
-    print("API available at http://localhost:5001")
-    app.run(debug=True, port=5001) 
\ No newline at end of file
+    logger.info("Starting Hostel Management System API...")
+    logger.info("API available at http://localhost:5001")
+    # Development server only; use serve.py (gunicorn / waitress) in production.
+    # Set HOSTEL_DEBUG=0 to turn off the reloader and debugger.
+    app.run(debug=os.environ.get('HOSTEL_DEBUG', '1') == '1', port=5001) 
\ No newline at end of file
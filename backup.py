@@ -0,0 +1,362 @@
+"""Online backups and chunked table exports.
+
+Usage:
+    python backup.py backup backups/hostel.db
+    python backup.py export database_export
+    python backup.py export nightly --format parquet --incremental changes
+
+``backup`` copies the live database with SQLite's backup API a few pages
+per step, so the API keeps serving (and writing) while it runs. Copying the
+file itself is unsafe while it is being written and misses whatever is
+still in the WAL. If writers keep restarting the paged copy, it falls back
+to a single step: under WAL that takes a read snapshot and still does not
+block writers. The copy is checked and then renamed into place, so
+``dest`` is never a half-written file.
+
+``export`` writes ``room``, ``member`` and ``payment`` to CSV (or Parquet
+when ``pyarrow`` is installed), ``chunk_size`` rows at a time, all from one
+read snapshot. Members and payments are read through ``archive.source``,
+so rows archive.py has moved to the archive tables are exported too. With ``--incremental`` a state file in the output directory
+remembers how far the last run got:
+
+* ``id`` exports rows with a higher id than last time (new rows only);
+* ``changes`` exports rows inserted, updated or deleted since the last
+  change-log sequence number (migration 6), one line per row with its
+  current values plus ``_seq`` and ``_op`` columns. A row moved to an
+  archive table has ``_op`` ``archive`` and keeps its values.
+
+A first run, or one whose change-log position has been pruned, exports the
+full tables.
+"""
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+import archive
+from streaming import iter_rows
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # optional dependency
+    pyarrow = None
+
+DB_PATH = os.environ.get('HOSTEL_DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'simple_hostel.db'))
+# The admin table holds password hashes and is deliberately not exported
+EXPORT_TABLES = ('room', 'member', 'payment')
+STATE_FILE = 'export_state.json'
+
+DEFAULT_PAGES = 256
+DEFAULT_SLEEP = 0.005
+# Paged copies restart whenever another connection writes; give up on
+# paging after this many restarts
+MAX_RESTARTS = 5
+DEFAULT_CHUNK_SIZE = 5000
+
+
+class BackupError(Exception):
+    """Raised when a backup or export cannot be completed."""
+
+
+class _Restarted(Exception):
+    pass
+
+
+def backup(db_path, dest_path, pages=DEFAULT_PAGES, sleep=DEFAULT_SLEEP, max_restarts=MAX_RESTARTS,
+           progress=None):
+    """Copy the database at ``db_path`` to ``dest_path`` while it stays online.
+
+    ``progress(remaining, total)`` is called after every step. Returns a
+    dict with the page count, steps, restarts and elapsed seconds.
+    """
+    partial = dest_path + '.partial'
+    os.makedirs(os.path.dirname(os.path.abspath(dest_path)), exist_ok=True)
+    stats = {'pages': 0, 'steps': 0, 'restarts': 0, 'single_step': False}
+    start = time.perf_counter()
+    src = sqlite3.connect(db_path, timeout=30)
+    try:
+        for step_pages in (pages, -1):
+            if os.path.exists(partial):
+                os.remove(partial)
+            last_remaining = None
+
+            def watch(status, remaining, total):
+                nonlocal last_remaining
+                stats['steps'] += 1
+                stats['pages'] = total
+                # The copy starts over when another connection writes
+                if last_remaining is not None and remaining > last_remaining:
+                    stats['restarts'] += 1
+                    if step_pages > 0 and stats['restarts'] > max_restarts:
+                        raise _Restarted()
+                last_remaining = remaining
+                if progress is not None:
+                    progress(remaining, total)
+
+            dst = sqlite3.connect(partial)
+            try:
+                src.backup(dst, pages=step_pages, progress=watch, sleep=sleep)
+            except _Restarted:
+                dst.close()
+                stats['single_step'] = True
+                continue
+            try:
+                result = dst.execute('PRAGMA quick_check').fetchone()[0]
+            finally:
+                dst.close()
+            if result != 'ok':
+                raise BackupError(f'backup failed its integrity check: {result}')
+            break
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    finally:
+        src.close()
+
+    os.replace(partial, dest_path)
+    stats['seconds'] = round(time.perf_counter() - start, 3)
+    stats['bytes'] = os.path.getsize(dest_path)
+    return stats
+
+
+# Export sinks. Both write to a temporary name and rename on close, so a
+# failed run never leaves a truncated file behind.
+
+class CsvSink:
+    extension = 'csv'
+
+    def __init__(self, path, columns, types):
+        self.path = path
+        self._file = open(path + '.partial', 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(columns)
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+
+    def close(self, keep=True):
+        self._file.close()
+        if keep:
+            os.replace(self.path + '.partial', self.path)
+        else:
+            os.remove(self.path + '.partial')
+
+
+class ParquetSink:
+    """One Parquet row group per chunk, typed from the declared column types."""
+
+    extension = 'parquet'
+
+    def __init__(self, path, columns, types):
+        if pyarrow is None:
+            raise BackupError('Parquet export needs pyarrow: pip install pyarrow')
+        self.path = path
+        self.columns = columns
+        self.schema = pyarrow.schema([(column, _arrow_type(declared)) for column, declared in zip(columns, types)])
+        self._writer = pyarrow.parquet.ParquetWriter(path + '.partial', self.schema, compression='zstd')
+
+    def write(self, rows):
+        data = {column: [row[i] for row in rows] for i, column in enumerate(self.columns)}
+        self._writer.write_table(pyarrow.Table.from_pydict(data, schema=self.schema))
+
+    def close(self, keep=True):
+        self._writer.close()
+        if keep:
+            os.replace(self.path + '.partial', self.path)
+        else:
+            os.remove(self.path + '.partial')
+
+
+SINKS = {'csv': CsvSink, 'parquet': ParquetSink}
+
+
+def _arrow_type(declared):
+    declared = (declared or '').upper()
+    if 'INT' in declared:
+        return pyarrow.int64()
+    if any(name in declared for name in ('REAL', 'FLOA', 'DOUB')):
+        return pyarrow.float64()
+    return pyarrow.string()
+
+
+def _declared_types(conn, table):
+    return {row[1]: row[2] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def _write(cursor, sink_class, path, types, chunk_size, keep_empty=False):
+    """Write ``cursor``'s rows to ``path`` in chunks; returns the row count."""
+    columns = [column[0] for column in cursor.description]
+    sink = sink_class(path, columns, [types.get(column, 'TEXT') for column in columns])
+    count = 0
+    try:
+        for rows in iter_rows(cursor, batch_size=chunk_size):
+            sink.write(rows)
+            count += len(rows)
+    except BaseException:
+        sink.close(keep=False)
+        raise
+    sink.close(keep=count > 0 or keep_empty)
+    return count
+
+
+def _change_head(conn):
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'").fetchone()
+    return row[0] if row else 0
+
+
+def _changes_retained(conn, since, head):
+    if since >= head:
+        return since == head
+    oldest = conn.execute("SELECT MIN(seq) FROM change_log").fetchone()[0]
+    return oldest is not None and since >= oldest - 1
+
+
+def _source(conn, table):
+    """``table``, or its hot and archived rows together once migration 7 exists."""
+    if table not in archive.ARCHIVES:
+        return table
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (archive.ARCHIVES[table],)
+    ).fetchone()
+    return archive.source(table, True) if exists else table
+
+
+def load_state(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_state(path, state):
+    with open(path + '.partial', 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(path + '.partial', path)
+
+
+def export(db_path, out_dir, tables=EXPORT_TABLES, fmt='csv', incremental=None,
+           chunk_size=DEFAULT_CHUNK_SIZE, state_path=None):
+    """Export ``tables`` into ``out_dir``; returns one summary dict per table."""
+    sink_class = SINKS[fmt]
+    os.makedirs(out_dir, exist_ok=True)
+    state_path = state_path or os.path.join(out_dir, STATE_FILE)
+    state = load_state(state_path) if incremental else {}
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.execute('PRAGMA query_only = 1')
+    summary = []
+    try:
+        # One read snapshot for every table. Under WAL it does not block the API.
+        conn.execute('BEGIN')
+        has_change_log = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'change_log'"
+        ).fetchone() is not None
+        if incremental == 'changes' and not has_change_log:
+            raise BackupError('incremental change exports need schema migration 6 (change_log)')
+        head = _change_head(conn) if has_change_log else None
+
+        for table in tables:
+            if table not in EXPORT_TABLES:
+                raise BackupError(f"unknown table {table!r}; choose from {', '.join(EXPORT_TABLES)}")
+            types = _declared_types(conn, table)
+            source = _source(conn, table)
+            previous = state.get(table, {})
+            cursor = conn.cursor()
+            mode = 'full'
+
+            if incremental == 'id' and 'last_id' in previous:
+                mode = 'id'
+                cursor.execute(f"SELECT * FROM {source} AS t WHERE id > ? ORDER BY id", (previous['last_id'],))
+                path = os.path.join(out_dir, f"{table}-new-{stamp}.{sink_class.extension}")
+            elif incremental == 'changes' and 'seq' in previous and _changes_retained(conn, previous['seq'], head):
+                mode = 'changes'
+                types = dict(types, _seq='INTEGER', _op='TEXT')
+                # Latest change per row; deleted rows keep only id, _seq and
+                # _op, archived ones are still found in the archive table
+                columns = ', '.join('c.row_id AS id' if column == 'id' else f't.{column}' for column in types
+                                    if not column.startswith('_'))
+                cursor.execute(f"""
+                SELECT c.seq AS _seq, c.op AS _op, {columns}
+                FROM (SELECT row_id, MAX(seq) AS seq, op FROM change_log
+                      WHERE table_name = ? AND seq > ? GROUP BY row_id) AS c
+                LEFT JOIN {source} t ON t.id = c.row_id
+                ORDER BY c.seq
+                """, (table, previous['seq']))
+                path = os.path.join(out_dir, f"{table}-changes-{stamp}.{sink_class.extension}")
+            else:
+                cursor.execute(f"SELECT * FROM {source} AS t ORDER BY id")
+                name = f"{table}-full-{stamp}" if incremental else table
+                path = os.path.join(out_dir, f"{name}.{sink_class.extension}")
+
+            start = time.perf_counter()
+            count = _write(cursor, sink_class, path, types, chunk_size, keep_empty=mode == 'full')
+            last_id = conn.execute(f"SELECT MAX(id) FROM {source} AS t").fetchone()[0] or 0
+            state[table] = {'last_id': max(last_id, previous.get('last_id', 0))}
+            if head is not None:
+                state[table]['seq'] = head
+            summary.append({
+                'table': table,
+                'mode': mode,
+                'rows': count,
+                'file': path if count or mode == 'full' else None,
+                'seconds': round(time.perf_counter() - start, 3),
+            })
+        conn.execute('COMMIT')
+    finally:
+        conn.close()
+
+    if incremental:
+        # Only advance once every file is in place
+        save_state(state_path, state)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Back up or export the hostel database while it is in use.')
+    parser.add_argument('--db', default=DB_PATH, help='Database to read (default: HOSTEL_DB_PATH or simple_hostel.db)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    backup_parser = commands.add_parser('backup', help='Copy the database with the online backup API')
+    backup_parser.add_argument('dest')
+    backup_parser.add_argument('--pages', type=int, default=DEFAULT_PAGES, help='Pages copied per step')
+    backup_parser.add_argument('--sleep', type=float, default=DEFAULT_SLEEP, help='Seconds to pause between steps')
+
+    export_parser = commands.add_parser('export', help='Export tables to CSV or Parquet')
+    export_parser.add_argument('out_dir')
+    export_parser.add_argument('--format', choices=sorted(SINKS), default='csv')
+    export_parser.add_argument('--tables', default=','.join(EXPORT_TABLES))
+    export_parser.add_argument('--incremental', choices=('id', 'changes'),
+                               help='Export only rows added (id) or changed (changes) since the last run')
+    export_parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    export_parser.add_argument('--state', help=f'State file (default: OUT_DIR/{STATE_FILE})')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        sys.exit(f"{args.db} does not exist")
+    try:
+        if args.command == 'backup':
+            print(f"Backing up {args.db} to {args.dest}...")
+            stats = backup(args.db, args.dest, pages=args.pages, sleep=args.sleep)
+            note = ' (fell back to a single step)' if stats['single_step'] else ''
+            print(f"Copied {stats['pages']} pages in {stats['seconds']}s, {stats['steps']} steps, "
+                  f"{stats['restarts']} restarts{note}")
+        else:
+            tables = [table.strip() for table in args.tables.split(',') if table.strip()]
+            for item in export(args.db, args.out_dir, tables, args.format, args.incremental,
+                               args.chunk_size, args.state):
+                target = item['file'] or 'nothing new'
+                print(f"{item['table']}: {item['rows']} rows ({item['mode']}) in {item['seconds']}s -> {target}")
+    except BackupError as e:
+        sys.exit(str(e))
+
+
+if __name__ == '__main__':
+    main()
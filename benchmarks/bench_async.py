@@ -0,0 +1,188 @@
+"""Compare the sync (gunicorn) and async (async_api) servers under slow clients.
+
+Usage:
+    python benchmarks/bench_async.py bench.db [--slow-clients 64] [--slow-seconds 2]
+                                              [--threads 4] [--requests 400]
+
+Each server is started as a single process with ``--threads`` database
+threads (gunicorn gthread worker threads for the sync app, reader threads for
+the async one). While ``--slow-clients`` connections trickle their request
+headers in over ``--slow-seconds`` (think mobile clients on a bad network),
+``--requests`` ordinary requests are sent at ``--concurrency`` and their
+latency is measured. A sync worker thread is tied up for as long as a slow
+client takes to send its request; the event loop is not, so the fast
+requests keep flowing. The read cache is disabled so every request reaches
+SQLite.
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from load_test import RESULTS_DIR, percentile  # noqa: E402
+
+PATH = '/api/rooms?limit=50'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(kind, db_path, port, threads):
+    env = dict(os.environ,
+               HOSTEL_DB_PATH=db_path,
+               HOSTEL_BIND=f'127.0.0.1:{port}',
+               HOSTEL_LOG_LEVEL='warning',
+               HOSTEL_CACHE_SIZE='0',
+               HOSTEL_WORKERS='1',
+               HOSTEL_THREADS=str(threads),
+               HOSTEL_ASYNC_READERS=str(threads))
+    if kind == 'sync':
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app']
+    else:
+        command = [sys.executable, 'async_api.py']
+    process = subprocess.Popen(command, cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/api/stats', timeout=1).read()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f'{kind} server did not start on port {port}')
+
+
+async def _read_response(reader):
+    head = await reader.readuntil(b'\r\n\r\n')
+    status = int(head.split(b' ', 2)[1])
+    length = 0
+    for line in head.split(b'\r\n'):
+        if line.lower().startswith(b'content-length:'):
+            length = int(line.split(b':', 1)[1])
+    await reader.readexactly(length)
+    return status
+
+
+async def fast_request(port):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        writer.write(f'GET {PATH} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n'.encode())
+        await writer.drain()
+        return await _read_response(reader)
+    finally:
+        writer.close()
+
+
+async def slow_request(port, seconds, lines=10):
+    """Send the request headers one line at a time over ``seconds``."""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        writer.write(f'GET {PATH} HTTP/1.1\r\nHost: localhost\r\n'.encode())
+        for n in range(lines):
+            await writer.drain()
+            await asyncio.sleep(seconds / lines)
+            writer.write(f'X-Slow-{n}: 1\r\n'.encode())
+        writer.write(b'Connection: close\r\n\r\n')
+        await writer.drain()
+        return await _read_response(reader)
+    finally:
+        writer.close()
+
+
+async def measure(port, slow_clients, slow_seconds, requests, concurrency):
+    slow = [asyncio.create_task(slow_request(port, slow_seconds)) for _ in range(slow_clients)]
+    # Let the slow clients connect and occupy whatever they are going to occupy
+    await asyncio.sleep(min(0.5, slow_seconds / 4))
+
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                status = await fast_request(port)
+            except OSError:
+                status = 599
+            latencies.append(time.perf_counter() - start)
+            if status >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    wall = time.perf_counter() - started
+    slow_results = await asyncio.gather(*slow, return_exceptions=True)
+
+    latencies.sort()
+    return {
+        'requests': requests,
+        'errors': errors,
+        'throughput_rps': round(requests / wall, 1) if wall else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'max_ms': round(latencies[-1] * 1000, 3),
+        'slow_clients_ok': sum(1 for result in slow_results if result == 200),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sync vs async serving under slow clients.')
+    parser.add_argument('db_path', help='Database to copy and serve (see generate_data.py)')
+    parser.add_argument('--slow-clients', type=int, default=64)
+    parser.add_argument('--slow-seconds', type=float, default=2.0)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--threads', type=int, default=4, help='Database threads per server')
+    parser.add_argument('--output', help='Where to write the JSON report')
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'server':<8}{'slow':>6}{'rps':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}{'slow ok':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for kind in ('sync', 'async'):
+            # Fresh copy per server so neither sees the other's WAL
+            db_path = os.path.join(tmp, f'{kind}.db')
+            shutil.copyfile(args.db_path, db_path)
+            port = free_port()
+            process = start_server(kind, db_path, port, args.threads)
+            try:
+                for slow_clients in (0, args.slow_clients):
+                    result = asyncio.run(measure(port, slow_clients, args.slow_seconds,
+                                                 args.requests, args.concurrency))
+                    result.update({'server': kind, 'slow_clients': slow_clients})
+                    results.append(result)
+                    print(f"{kind:<8}{slow_clients:>6}{result['throughput_rps']:>10}{result['p50_ms']:>10}"
+                          f"{result['p99_ms']:>10}{result['errors']:>8}{result['slow_clients_ok']:>9}")
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"async_{datetime.now():%Y%m%d_%H%M%S}.json")
+    with open(output, 'w') as f:
+        json.dump({'threads': args.threads, 'slow_seconds': args.slow_seconds,
+                   'path': PATH, 'results': results}, f, indent=2)
+    print(f"\nReport written to {output}")
+
+
+if __name__ == '__main__':
+    main()
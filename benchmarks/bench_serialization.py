@@ -0,0 +1,144 @@
+"""Compare list-response serialization paths on a large payment table.
+
+Usage: python benchmarks/bench_serialization.py [--rows 100000] [--repeat 5]
+
+Builds a throwaway database with ``--rows`` payment rows and times each way
+of turning ``SELECT * FROM payment`` into a JSON body:
+
+- dict_factory + jsonify   (the original path)
+- sqlite3.Row + json.dumps
+- tuples + names once      (serialize.rows_to_dicts + serialize.dumps)
+- json_group_array         (serialize.json_array_sql, JSON built in SQLite)
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, jsonify  # noqa: E402
+
+from serialize import dumps, json_array_sql, rows_to_dicts, tuple_cursor  # noqa: E402
+
+COLUMNS = ['id', 'member_id', 'amount', 'payment_type', 'payment_date', 'due_date', 'status', 'description']
+QUERY = "SELECT id, member_id, amount, payment_type, payment_date, due_date, status, description FROM payment ORDER BY id"
+
+
+def dict_factory(cursor, row):
+    d = {}
+    for idx, col in enumerate(cursor.description):
+        d[col[0]] = row[idx]
+    return d
+
+
+def build_database(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute('''
+    CREATE TABLE payment (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        member_id INTEGER,
+        amount REAL,
+        payment_type TEXT,
+        payment_date TEXT,
+        due_date TEXT,
+        status TEXT,
+        description TEXT
+    )
+    ''')
+    rng = random.Random(42)
+    conn.executemany(
+        "INSERT INTO payment (member_id, amount, payment_type, payment_date, due_date, status, description) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (
+            (
+                rng.randint(1, 20000),
+                round(rng.uniform(50, 800), 2),
+                rng.choice(['rent', 'deposit', 'mess', 'fine']),
+                f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                f"2024-{rng.randint(1, 12):02d}-05",
+                rng.choice(['completed', 'completed', 'due', 'pending']),
+                'monthly charge',
+            )
+            for _ in range(rows)
+        )
+    )
+    conn.commit()
+    conn.close()
+
+
+def run_dict_factory_jsonify(conn, app):
+    conn.row_factory = dict_factory
+    try:
+        rows = conn.execute(QUERY).fetchall()
+        with app.app_context():
+            return jsonify(rows).get_data()
+    finally:
+        conn.row_factory = None
+
+
+def run_sqlite_row(conn, app):
+    conn.row_factory = sqlite3.Row
+    try:
+        rows = conn.execute(QUERY).fetchall()
+        return json.dumps([dict(row) for row in rows]).encode()
+    finally:
+        conn.row_factory = None
+
+
+def run_tuples(conn, app):
+    cursor = tuple_cursor(conn)
+    cursor.execute(QUERY)
+    return dumps(rows_to_dicts(cursor, cursor.fetchall())).encode()
+
+
+def run_sql_json(conn, app):
+    cursor = tuple_cursor(conn)
+    cursor.execute(json_array_sql(QUERY, COLUMNS))
+    return cursor.fetchone()[0].encode()
+
+
+PATHS = [
+    ('dict_factory + jsonify', run_dict_factory_jsonify),
+    ('sqlite3.Row + json.dumps', run_sqlite_row),
+    ('tuples + names once', run_tuples),
+    ('json_group_array', run_sql_json),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        print(f"Building {args.rows} payment rows...")
+        build_database(path, args.rows)
+        conn = sqlite3.connect(path)
+
+        baseline = None
+        print(f"{'path':<28}{'best ms':>10}{'median ms':>12}{'bytes':>12}{'speedup':>10}")
+        for name, run in PATHS:
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                body = run(conn, app)
+                timings.append(time.perf_counter() - start)
+            # Every path must produce the same rows
+            assert len(json.loads(body)) == args.rows
+            timings.sort()
+            best = timings[0] * 1000
+            median = timings[len(timings) // 2] * 1000
+            baseline = baseline or median
+            print(f"{name:<28}{best:>10.1f}{median:>12.1f}{len(body):>12}{baseline / median:>9.2f}x")
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
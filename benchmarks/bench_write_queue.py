@@ -0,0 +1,167 @@
+"""Compare per-request commits with the group-committing write queue.
+
+Usage:
+    python benchmarks/bench_write_queue.py [--threads 16] [--writes 200]
+                                           [--synchronous NORMAL|FULL]
+
+Builds a throwaway database from migrations.py with a few members, then has
+``--threads`` threads record ``--writes`` payments each, the way
+``POST /api/payments`` does (check the member, insert the payment):
+
+- direct      every write checks out a pooled connection and commits its own
+              BEGIN IMMEDIATE transaction (allocation.run_write), so the
+              threads contend for SQLite's write lock
+- queue/1     write_queue.WriteQueue with max_batch=1: one writer thread, one
+              commit per write
+- queue       WriteQueue with its defaults (HOSTEL_WRITE_BATCH,
+              HOSTEL_WRITE_DELAY_MS): writes queued together share a commit
+
+and reports writes per second, latency percentiles, errors and the average
+group size. ``--synchronous FULL`` fsyncs every commit, which is where
+group commit gains the most.
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from allocation import run_write  # noqa: E402
+from db_pool import DEFAULT_PRAGMAS, ConnectionPool  # noqa: E402
+from load_test import RESULTS_DIR, percentile  # noqa: E402
+from migrations import migrate  # noqa: E402
+from write_queue import MAX_BATCH, MAX_DELAY, WriteQueue  # noqa: E402
+
+MEMBERS = 100
+
+
+def build_database(path):
+    migrate(path)
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO room (room_number, capacity, room_type, price_per_month) VALUES ('B1', ?, 'Dormitory', 200)",
+                 (MEMBERS,))
+    conn.executemany(
+        "INSERT INTO member (name, email, phone, room_id) VALUES (?, ?, '555', 1)",
+        [(f'Member {i}', f'member{i}@example.com') for i in range(MEMBERS)],
+    )
+    conn.commit()
+    conn.close()
+
+
+def record_payment(conn, member_id, amount):
+    if conn.execute("SELECT id FROM member WHERE id = ?", (member_id,)).fetchone() is None:
+        return None
+    cursor = conn.execute(
+        "INSERT INTO payment (member_id, amount, payment_type, payment_date, status) "
+        "VALUES (?, ?, 'rent', date('now'), 'completed')",
+        (member_id, amount),
+    )
+    return cursor.lastrowid
+
+
+def measure(mode, db_path, threads, writes, pragmas):
+    pool = ConnectionPool(db_path, max_size=threads, pragmas=pragmas)
+    queue = None
+    if mode == 'queue/1':
+        queue = WriteQueue(db_path, max_batch=1, max_delay=0, pragmas=pragmas)
+    elif mode == 'queue':
+        queue = WriteQueue(db_path, pragmas=pragmas)
+
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    start_line = threading.Barrier(threads + 1)
+
+    def worker(seed):
+        rng = random.Random(seed)
+        mine = []
+        failed = []
+        start_line.wait()
+        for _ in range(writes):
+            member_id, amount = rng.randint(1, MEMBERS), rng.randint(100, 500)
+            began = time.perf_counter()
+            try:
+                if queue is None:
+                    with pool.connection() as conn:
+                        run_write(conn, lambda conn: record_payment(conn, member_id, amount))
+                else:
+                    queue.run(record_payment, member_id, amount)
+            except sqlite3.Error as e:
+                failed.append(str(e))
+            mine.append(time.perf_counter() - began)
+        with lock:
+            latencies.extend(mine)
+            errors.extend(failed)
+
+    workers = [threading.Thread(target=worker, args=(seed,)) for seed in range(threads)]
+    for thread in workers:
+        thread.start()
+    start_line.wait()
+    began = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - began
+
+    stats = queue.stats() if queue is not None else None
+    if queue is not None:
+        queue.close()
+    pool.close_all()
+    latencies.sort()
+    done = len(latencies) - len(errors)
+    return {
+        'mode': mode,
+        'writes': len(latencies),
+        'errors': len(errors),
+        'error_sample': errors[:3],
+        'seconds': round(elapsed, 3),
+        'writes_per_second': round(done / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'avg_batch_size': stats['avg_batch_size'] if stats else 1,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-request commits vs the group-committing write queue.')
+    parser.add_argument('--threads', type=int, default=16, help='Concurrent writers (request threads)')
+    parser.add_argument('--writes', type=int, default=200, help='Writes per thread')
+    parser.add_argument('--synchronous', default='NORMAL', choices=('OFF', 'NORMAL', 'FULL'))
+    parser.add_argument('--output', help='Where to write the JSON report')
+    args = parser.parse_args()
+
+    pragmas = tuple((name, args.synchronous if name == 'synchronous' else value)
+                    for name, value in DEFAULT_PRAGMAS)
+    results = []
+    print(f"{args.threads} threads x {args.writes} writes, synchronous={args.synchronous}, "
+          f"queue max_batch={MAX_BATCH}, max_delay={MAX_DELAY * 1000:g} ms")
+    print(f"{'mode':<10}{'writes/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}{'batch':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ('direct', 'queue/1', 'queue'):
+            # Fresh database per mode so each starts from the same size
+            db_path = os.path.join(tmp, f"{mode.replace('/', '_')}.db")
+            build_database(db_path)
+            result = measure(mode, db_path, args.threads, args.writes, pragmas)
+            results.append(result)
+            print(f"{mode:<10}{result['writes_per_second']:>10}{result['p50_ms']:>10}{result['p99_ms']:>10}"
+                  f"{result['errors']:>8}{result['avg_batch_size']:>8}")
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"writes_{datetime.now():%Y%m%d_%H%M%S}.json")
+    with open(output, 'w') as f:
+        json.dump({'threads': args.threads, 'writes_per_thread': args.writes,
+                   'synchronous': args.synchronous, 'results': results}, f, indent=2)
+    print(f"\nReport written to {output}")
+
+
+if __name__ == '__main__':
+    main()
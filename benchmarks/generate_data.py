@@ -0,0 +1,169 @@
+"""Generate a synthetic hostel database at a chosen scale.
+
+Usage:
+    python benchmarks/generate_data.py bench.db --scale large
+    python benchmarks/generate_data.py bench.db --rooms 500 --members 20000 --payments 300000
+
+The schema comes from migrations.py, so the dataset has the same tables,
+indexes and triggers as production. Output is deterministic for a given
+``--seed``. Members beyond the available beds are generated as former
+residents (status 'left' with a leave_date), which is what a hostel with
+years of history looks like.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from migrations import migrate  # noqa: E402
+
+SCALES = {
+    'small': {'rooms': 50, 'members': 2000, 'payments': 50000},
+    'medium': {'rooms': 500, 'members': 20000, 'payments': 500000},
+    'large': {'rooms': 5000, 'members': 200000, 'payments': 5000000},
+}
+
+ROOM_TYPES = [
+    # (room_type, capacity, price_per_month)
+    ('Single', 1, 450.0),
+    ('Double', 2, 350.0),
+    ('Triple', 3, 280.0),
+    ('Dormitory', 6, 200.0),
+]
+PAYMENT_TYPES = ['rent', 'rent', 'rent', 'deposit', 'mess', 'fine']
+BATCH_SIZE = 50000
+
+
+def _batches(rows, size=BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def generate(db_path, rooms, members, payments, seed=42, years=3, occupancy=0.9):
+    """Create ``db_path`` and fill it. Returns the row counts written."""
+    if os.path.exists(db_path):
+        raise SystemExit(f"{db_path} already exists; remove it or choose another path")
+    migrate(db_path)
+    rng = random.Random(seed)
+    start_day = date.today() - timedelta(days=365 * years)
+
+    conn = sqlite3.connect(db_path)
+    # Bulk load settings: nothing here needs to survive a crash mid-run
+    conn.execute('PRAGMA journal_mode = OFF')
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.execute('PRAGMA cache_size = -200000')
+
+    # Rooms, with the beds each one has
+    room_rows = []
+    beds = []
+    for room_id in range(1, rooms + 1):
+        room_type, capacity, price = rng.choice(ROOM_TYPES)
+        floor = (room_id - 1) // 100 + 1
+        room_rows.append([f"{floor}{(room_id - 1) % 100:02d}-{room_id}", capacity, room_type, price])
+        beds.extend([room_id] * capacity)
+    rng.shuffle(beds)
+    # Leave some beds free so check-in scenarios have somewhere to go
+    del beds[int(len(beds) * occupancy):]
+
+    # Active members fill beds first; the rest are former residents
+    occupancy = {}
+    member_rows = []
+    for member_id in range(1, members + 1):
+        joined = start_day + timedelta(days=rng.randint(0, 365 * years))
+        if beds:
+            room_id = beds.pop()
+            occupancy[room_id] = occupancy.get(room_id, 0) + 1
+            status, left = 'active', None
+        else:
+            room_id = rng.randint(1, rooms) if rooms else None
+            status = 'left'
+            left = min(joined + timedelta(days=rng.randint(30, 600)), date.today()).isoformat()
+        member_rows.append((
+            f"Resident {member_id}",
+            f"resident{member_id}@example.com",
+            f"555-{member_id:07d}",
+            room_id,
+            joined.isoformat() + ' 09:00:00',
+            left,
+            status,
+            f"Guardian {member_id} 555-{rng.randint(0, 9999999):07d}",
+        ))
+
+    conn.executemany(
+        "INSERT INTO room (room_number, capacity, current_occupancy, room_type, price_per_month, status) VALUES (?, ?, ?, ?, ?, 'available')",
+        ((number, capacity, occupancy.get(i + 1, 0), room_type, price)
+         for i, (number, capacity, room_type, price) in enumerate(room_rows))
+    )
+    for batch in _batches(member_rows):
+        conn.executemany(
+            "INSERT INTO member (name, email, phone, room_id, join_date, leave_date, status, emergency_contact) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            batch
+        )
+    conn.commit()
+
+    prices = {i + 1: row[3] for i, row in enumerate(room_rows)}
+    today = date.today()
+
+    def payment_rows():
+        for _ in range(payments):
+            member_id = rng.randint(1, members)
+            room_id = member_rows[member_id - 1][3]
+            paid_on = start_day + timedelta(days=rng.randint(0, 365 * years))
+            due = paid_on.replace(day=5).isoformat()
+            payment_type = rng.choice(PAYMENT_TYPES)
+            amount = prices.get(room_id, 300.0) if payment_type == 'rent' else round(rng.uniform(20, 500), 2)
+            if paid_on > today - timedelta(days=45) and rng.random() < 0.3:
+                status = 'due'
+            else:
+                status = 'completed'
+            yield (member_id, amount, payment_type, paid_on.isoformat(), due, status, f"{payment_type} {paid_on:%b %Y}")
+
+    for batch in _batches(payment_rows()):
+        conn.executemany(
+            "INSERT INTO payment (member_id, amount, payment_type, payment_date, due_date, status, description) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            batch
+        )
+        conn.commit()
+
+    conn.execute('ANALYZE')
+    conn.commit()
+    conn.close()
+    return {'rooms': rooms, 'members': members, 'payments': payments}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic hostel database.')
+    parser.add_argument('db_path')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--rooms', type=int)
+    parser.add_argument('--members', type=int)
+    parser.add_argument('--payments', type=int)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--occupancy', type=float, default=0.9, help='Share of beds filled by active members')
+    args = parser.parse_args()
+
+    sizes = dict(SCALES[args.scale])
+    for name in sizes:
+        if getattr(args, name) is not None:
+            sizes[name] = getattr(args, name)
+
+    print(f"Generating {sizes['rooms']} rooms, {sizes['members']} members, {sizes['payments']} payments into {args.db_path}...")
+    start = time.perf_counter()
+    generate(args.db_path, seed=args.seed, occupancy=args.occupancy, **sizes)
+    elapsed = time.perf_counter() - start
+    print(f"Done in {elapsed:.1f}s ({os.path.getsize(args.db_path) / 1024 / 1024:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
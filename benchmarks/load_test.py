@@ -0,0 +1,342 @@
+"""Drive every API route at fixed concurrency levels and record latency.
+
+Usage:
+    python benchmarks/load_test.py bench.db --concurrency 1,4,16 --requests 200
+    python benchmarks/load_test.py bench.db --url http://localhost:5001
+    python benchmarks/load_test.py --compare old.json new.json
+
+By default the app is imported in-process and exercised through Flask's
+test client from a thread pool, so results measure server-side cost with no
+network in the way. With ``--url`` the same scenarios are sent over HTTP to
+a running server instead (the database argument is then only used to pick
+ids for the requests). Every run writes a JSON report with p50/p90/p99
+latency, throughput, error counts and peak RSS; ``--compare`` diffs two
+reports and exits non-zero if any scenario regressed past ``--threshold``.
+
+The harness logs in once (``--username`` / ``--password``) and sends the
+session token with every request, so runs against a server with
+``HOSTEL_AUTH_REQUIRED=1`` measure the routes rather than the 401 path.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+# Rows per request in the bulk scenarios
+BULK_ROWS = 100
+
+
+def scenarios(db_path, username='svce', password='1234'):
+    """Build the (name, method, path_factory, body_factory) list for a dataset."""
+    conn = sqlite3.connect(db_path)
+    max_room = conn.execute("SELECT COALESCE(MAX(id), 1) FROM room").fetchone()[0]
+    max_member = conn.execute("SELECT COALESCE(MAX(id), 1) FROM member").fetchone()[0]
+    max_payment = conn.execute("SELECT COALESCE(MAX(id), 1) FROM payment").fetchone()[0]
+    room_types = [row[0] for row in conn.execute("SELECT DISTINCT room_type FROM room")] or ['Single']
+    prefixes = sorted({row[0][:3] for row in conn.execute(
+        "SELECT name FROM member WHERE length(name) >= 3 LIMIT 1000")}) or ['Mem']
+    try:
+        # Recent enough to stay clear of pruned change log entries
+        first_seq, last_seq = conn.execute(
+            "SELECT COALESCE(MIN(seq), 1) - 1, COALESCE(MAX(seq), 0) FROM change_log").fetchone()
+        since = max(first_seq, last_seq - 500)
+    except sqlite3.OperationalError:  # Before migration 6
+        since = 0
+    conn.close()
+
+    counter = itertools.count()
+    # Run tag keeps generated emails unique across repeated runs
+    tag = f"{int(time.time())}{os.getpid()}"
+
+    def new_member():
+        n = next(counter)
+        return {
+            'name': f'Load Test {n}',
+            'email': f'load{tag}-{n}@example.com',
+            'phone': '555-0000',
+            'room_type': random.choice(room_types),
+        }
+
+    def new_payment():
+        return {
+            'member_id': random.randint(1, max_member),
+            'amount': round(random.uniform(50, 500), 2),
+            'payment_type': 'rent',
+        }
+
+    def new_room():
+        return {
+            'room_number': f'L{tag}-{next(counter)}',
+            'capacity': random.randint(1, 4),
+            'room_type': random.choice(room_types),
+            'price_per_month': random.choice([200, 350, 500]),
+        }
+
+    def new_bulk_members():
+        # Fill beds that are free now (the writes above keep taking them);
+        # runs before the request is timed
+        with sqlite3.connect(db_path) as conn:
+            beds = [room_id for room_id, free in conn.execute(
+                "SELECT id, capacity - current_occupancy FROM room WHERE current_occupancy < capacity "
+                "ORDER BY random() LIMIT ?", (BULK_ROWS,)) for _ in range(free)]
+        members = []
+        for room_id in (beds or [1])[:BULK_ROWS]:
+            member = new_member()
+            del member['room_type']
+            member['room_id'] = room_id
+            members.append(member)
+        return members
+
+    return [
+        ('rooms_all', 'GET', lambda: '/api/rooms', None),
+        ('rooms_page', 'GET', lambda: f'/api/rooms?limit=50&after_id={random.randint(0, max_room)}', None),
+        ('members_page', 'GET', lambda: f'/api/members?limit=50&after_id={random.randint(0, max_member)}', None),
+        ('members_filtered', 'GET', lambda: f'/api/members?limit=50&room_type={random.choice(room_types)}&status=active', None),
+        ('payments_page', 'GET', lambda: f'/api/payments?limit=50&after_id={random.randint(0, max_payment)}&sort=id', None),
+        ('payments_recent', 'GET', lambda: '/api/payments?limit=50', None),
+        ('occupancy_report', 'GET', lambda: '/api/reports/occupancy', None),
+        ('payments_report', 'GET', lambda: '/api/reports/payments?start_date=2024-01-01&end_date=2024-12-31', None),
+        ('stats', 'GET', lambda: '/api/stats', None),
+        ('members_search', 'GET', lambda: f'/api/members/search?q={random.choice(prefixes)}&limit=20', None),
+        ('changes', 'GET', lambda: f'/api/changes?since={since}&limit=100', None),
+        ('login', 'POST', lambda: '/api/login', lambda: {'username': username, 'password': password}),
+        ('create_room', 'POST', lambda: '/api/rooms', new_room),
+        ('create_member', 'POST', lambda: '/api/members', new_member),
+        ('create_payment', 'POST', lambda: '/api/payments', new_payment),
+        ('rooms_bulk', 'POST', lambda: '/api/rooms/bulk', lambda: [new_room() for _ in range(BULK_ROWS)]),
+        ('members_bulk', 'POST', lambda: '/api/members/bulk', new_bulk_members),
+        ('payments_bulk', 'POST', lambda: '/api/payments/bulk',
+         lambda: [new_payment() for _ in range(BULK_ROWS)]),
+    ]
+
+
+class ClientTransport:
+    """Sends requests to the in-process app through Flask's test client."""
+
+    def __init__(self, app):
+        self.app = app
+        self.token = None
+        self._local = threading.local()
+
+    def __call__(self, method, path, body):
+        """Send one request; returns ``(status, body bytes)``."""
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        headers = {'Authorization': f'Bearer {self.token}'} if self.token else None
+        response = client.open(path, method=method, json=body, headers=headers)
+        return response.status_code, response.get_data()
+
+
+class HttpTransport:
+    """Sends requests to a running server over HTTP."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.token = None
+
+    def __call__(self, method, path, body):
+        """Send one request; returns ``(status, body bytes)``."""
+        data = json.dumps(body).encode() if body is not None else None
+        headers = {'Content-Type': 'application/json'}
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        request = urllib.request.Request(self.base_url + path, data=data, method=method, headers=headers)
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+
+def log_in(transport, username, password):
+    """Log in once and have ``transport`` send the session token from then on."""
+    status, body = transport('POST', '/api/login', {'username': username, 'password': password})
+    if status != 200:
+        raise SystemExit(f'Login as {username} failed with HTTP {status}: {body[:200]!r}')
+    transport.token = json.loads(body)['token']
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / 1024 / (1024 if sys.platform == 'darwin' else 1), 1)
+
+
+def run_scenario(transport, method, path_factory, body_factory, concurrency, requests):
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(_):
+        nonlocal errors
+        path = path_factory()
+        body = body_factory() if body_factory else None
+        start = time.perf_counter()
+        try:
+            status, _ = transport(method, path, body)
+        except Exception:
+            status = 599
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if status >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': requests,
+        'errors': errors,
+        'throughput_rps': round(requests / wall, 1) if wall else 0.0,
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p90_ms': round(percentile(latencies, 90) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'max_ms': round(latencies[-1] * 1000, 3),
+        'rss_mb': peak_rss_mb(),
+    }
+
+
+def dataset_counts(db_path):
+    conn = sqlite3.connect(db_path)
+    counts = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+              for table in ('room', 'member', 'payment')}
+    conn.close()
+    return counts
+
+
+def run(args):
+    db_path = os.path.abspath(args.db_path)
+    if args.url:
+        transport = HttpTransport(args.url)
+        mode = f'http {args.url}'
+    else:
+        os.environ['HOSTEL_DB_PATH'] = db_path
+        # Per-request INFO logs would drown out the results table
+        os.environ.setdefault('HOSTEL_LOG_LEVEL', 'WARNING')
+        if args.no_cache:
+            os.environ['HOSTEL_CACHE_SIZE'] = '0'
+        import auth_api
+        transport = ClientTransport(auth_api.app)
+        mode = 'in-process test client'
+
+    log_in(transport, args.username, args.password)
+    selected = scenarios(db_path, args.username, args.password)
+    if args.only:
+        wanted = set(args.only.split(','))
+        selected = [scenario for scenario in selected if scenario[0] in wanted]
+    levels = [int(level) for level in args.concurrency.split(',')]
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'mode': mode,
+            'cache': not args.no_cache,
+            'database': db_path,
+            'dataset': dataset_counts(db_path),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+        },
+        'results': [],
+    }
+
+    print(f"{'scenario':<20}{'conc':>5}{'rps':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for name, method, path_factory, body_factory in selected:
+        for concurrency in levels:
+            result = run_scenario(transport, method, path_factory, body_factory,
+                                  concurrency, args.requests)
+            result.update({'scenario': name, 'concurrency': concurrency})
+            report['results'].append(result)
+            print(f"{name:<20}{concurrency:>5}{result['throughput_rps']:>10}"
+                  f"{result['p50_ms']:>10}{result['p99_ms']:>10}{result['errors']:>8}")
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"load_{datetime.now():%Y%m%d_%H%M%S}.json")
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {output}")
+
+
+def compare(old_path, new_path, threshold):
+    """Print per-scenario changes; return True if anything regressed."""
+    with open(old_path) as f:
+        old = {(r['scenario'], r['concurrency']): r for r in json.load(f)['results']}
+    with open(new_path) as f:
+        new = {(r['scenario'], r['concurrency']): r for r in json.load(f)['results']}
+
+    regressed = False
+    print(f"{'scenario':<20}{'conc':>5}{'p50 old':>10}{'p50 new':>10}{'p99 old':>10}{'p99 new':>10}{'rps Δ%':>9}")
+    for key in sorted(old.keys() & new.keys()):
+        a, b = old[key], new[key]
+        rps_change = (b['throughput_rps'] - a['throughput_rps']) / a['throughput_rps'] * 100 if a['throughput_rps'] else 0.0
+        p99_change = (b['p99_ms'] - a['p99_ms']) / a['p99_ms'] * 100 if a['p99_ms'] else 0.0
+        flag = ''
+        if rps_change < -threshold or p99_change > threshold:
+            flag = '  REGRESSION'
+            regressed = True
+        print(f"{key[0]:<20}{key[1]:>5}{a['p50_ms']:>10}{b['p50_ms']:>10}"
+              f"{a['p99_ms']:>10}{b['p99_ms']:>10}{rps_change:>8.1f}%{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test the hostel API.')
+    parser.add_argument('db_path', nargs='?', help='Database to test against (see generate_data.py)')
+    parser.add_argument('--url', help='Base URL of a running server; default is in-process')
+    parser.add_argument('--concurrency', default='1,4,16', help='Comma-separated concurrency levels')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per scenario and level')
+    parser.add_argument('--only', help='Comma-separated scenario names to run')
+    parser.add_argument('--no-cache', action='store_true', help='Disable the read cache (in-process only)')
+    parser.add_argument('--username', default=os.environ.get('HOSTEL_LOAD_USER', 'svce'),
+                        help='Admin to log in as; the token is sent with every request')
+    parser.add_argument('--password', default=os.environ.get('HOSTEL_LOAD_PASSWORD', '1234'))
+    parser.add_argument('--output', help='Where to write the JSON report')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='Compare two reports')
+    parser.add_argument('--threshold', type=float, default=10.0, help='Regression threshold in percent')
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+    if not args.db_path:
+        parser.error('db_path is required unless --compare is used')
+    run(args)
+
+
+if __name__ == '__main__':
+    main()
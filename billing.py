@@ -0,0 +1,231 @@
+"""Monthly rent billing for every active member in one pass.
+
+Usage:
+    python billing.py                          (bills the current month)
+    python billing.py --period 2026-11 --due-day 5 --dry-run
+
+A run charges each active member with a room one ``due`` payment of the
+room's ``price_per_month`` for the billing period (``YYYY-MM``). The
+charges are written by set-based ``INSERT ... SELECT`` statements, one per
+``chunk_size`` members in its own short write transaction, instead of one
+``POST /api/payments`` round trip per resident.
+
+Charges carry the period in ``payment.billing_period`` (migration 8), whose
+unique index skips members already charged for it, so a run can be repeated
+or resumed after a failure without double billing. Members who join after
+the period has ended are not charged for it.
+"""
+import argparse
+import calendar
+import os
+import re
+import sqlite3
+import time
+from datetime import date, timedelta
+
+from allocation import run_write
+from serialize import tuple_cursor
+
+PAYMENT_TYPE = 'rent'
+STATUS = 'due'
+MEMBER_STATUS = 'active'
+DUE_DAY = int(os.environ.get('HOSTEL_BILLING_DUE_DAY', 5))
+CHUNK_SIZE = 10000
+# Seconds between chunks, so queued API writes get the lock
+PAUSE = 0.01
+
+_PERIOD = re.compile(r'^(\d{4})-(\d{2})$')
+
+
+class BillingError(ValueError):
+    """Raised for an invalid billing period or due day."""
+
+
+def parse_period(period=None, today=None):
+    """``(period, first_day, last_day)`` for ``YYYY-MM``, default the current month."""
+    if not period:
+        period = (today or date.today()).strftime('%Y-%m')
+    match = _PERIOD.match(str(period))
+    if not match or not 1 <= int(match.group(2)) <= 12:
+        raise BillingError('period must be in YYYY-MM format')
+    year, month = int(match.group(1)), int(match.group(2))
+    last = calendar.monthrange(year, month)[1]
+    return period, date(year, month, 1), date(year, month, last)
+
+
+def due_date(first_day, last_day, due_day):
+    try:
+        due_day = int(due_day)
+    except (TypeError, ValueError):
+        raise BillingError('due_day must be an integer')
+    if not 1 <= due_day <= 31:
+        raise BillingError('due_day must be between 1 and 31')
+    # Day 31 in a 30-day month falls on the last day
+    return first_day.replace(day=min(due_day, last_day.day))
+
+
+def options(data):
+    """``run_billing`` keyword arguments from an API request body."""
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        raise BillingError('Expected a JSON object')
+    dry_run = data.get('dry_run', False)
+    if not isinstance(dry_run, bool):
+        raise BillingError('dry_run must be true or false')
+    payment_type = data.get('payment_type', PAYMENT_TYPE)
+    if not isinstance(payment_type, str) or not payment_type.strip():
+        raise BillingError('payment_type must be a non-empty string')
+    return {
+        'period': data.get('period'),
+        'due_day': data.get('due_day', DUE_DAY),
+        'payment_type': payment_type.strip(),
+        'dry_run': dry_run,
+    }
+
+
+# Members, billable members and the last member id of the next chunk;
+# status = ? AND id > ? ORDER BY id walks idx_member_status in order
+CHUNK_SQL = """
+SELECT COUNT(*), COUNT(CASE WHEN r.price_per_month > 0 THEN 1 END), MAX(m.id)
+FROM (
+    SELECT id, room_id FROM member
+    WHERE status = ? AND id > ? AND (join_date IS NULL OR join_date < ?)
+    ORDER BY id LIMIT ?
+) AS m
+LEFT JOIN room r ON r.id = m.room_id
+"""
+
+# The upsert target names the partial unique index from migration 8
+BILL_SQL = f"""
+INSERT INTO payment (member_id, amount, payment_type, payment_date, due_date, status, description, billing_period)
+SELECT m.id, r.price_per_month, ?, ?, ?, '{STATUS}', ?, ?
+FROM member m JOIN room r ON r.id = m.room_id
+WHERE m.status = ? AND m.id > ? AND m.id <= ?
+  AND (m.join_date IS NULL OR m.join_date < ?)
+  AND r.price_per_month > 0
+ON CONFLICT (billing_period, payment_type, member_id) WHERE billing_period IS NOT NULL DO NOTHING
+"""
+
+UNBILLED_SQL = """
+SELECT COUNT(*) FROM member m JOIN room r ON r.id = m.room_id
+WHERE m.status = ? AND m.id > ? AND m.id <= ?
+  AND (m.join_date IS NULL OR m.join_date < ?)
+  AND r.price_per_month > 0
+  AND NOT EXISTS (
+      SELECT 1 FROM payment p
+      WHERE p.billing_period = ? AND p.payment_type = ? AND p.member_id = m.id
+  )
+"""
+
+
+def run_billing(conn, period=None, due_day=DUE_DAY, payment_type=PAYMENT_TYPE,
+                chunk_size=CHUNK_SIZE, pause=PAUSE, dry_run=False, today=None, write=None):
+    """Charge every active member for ``period``. Returns counts and timings.
+
+    Each chunk is written by ``write(work)``, which runs ``work(conn)`` in a
+    write transaction and returns its result; the API passes its write
+    queue's ``run`` so billing goes through the same single writer as every
+    other write. By default chunks are written on ``conn`` with
+    ``run_write``, and ``conn`` must not be in a transaction. With
+    ``dry_run`` nothing is written and ``billed`` is what the run would
+    charge.
+    """
+    period, first_day, last_day = parse_period(period, today)
+    due = due_date(first_day, last_day, due_day).isoformat()
+    # join_date may carry a time ('YYYY-MM-DD HH:MM:SS'), so compare it with
+    # the start of the next month rather than the last day
+    period_end = (last_day + timedelta(days=1)).isoformat()
+    first_day = first_day.isoformat()
+    description = f'{payment_type.capitalize()} {period}'
+    if write is None:
+        def write(work):
+            return run_write(conn, work)
+
+    members = billable = billed = chunks = 0
+    after = 0
+    start = time.perf_counter()
+    while True:
+        def work(conn):
+            cursor = tuple_cursor(conn)
+            count, priced, last_id = cursor.execute(
+                CHUNK_SQL, (MEMBER_STATUS, after, period_end, chunk_size)).fetchone()
+            if not count:
+                return count, priced, 0, last_id
+            if dry_run:
+                new = cursor.execute(UNBILLED_SQL, (MEMBER_STATUS, after, last_id, period_end,
+                                                    period, payment_type)).fetchone()[0]
+            else:
+                new = cursor.execute(BILL_SQL, (payment_type, first_day, due, description, period,
+                                                MEMBER_STATUS, after, last_id, period_end)).rowcount
+            return count, priced, new, last_id
+
+        count, priced, new, last_id = work(conn) if dry_run else write(work)
+        if not count:
+            break
+        members += count
+        billable += priced
+        billed += new
+        chunks += 1
+        after = last_id
+        if count < chunk_size:
+            break
+        if pause and not dry_run:
+            time.sleep(pause)
+    seconds = time.perf_counter() - start
+
+    charges, amount = tuple_cursor(conn).execute(
+        "SELECT COUNT(*), TOTAL(amount) FROM payment WHERE billing_period = ? AND payment_type = ?",
+        (period, payment_type),
+    ).fetchone()
+    return {
+        'period': period,
+        'payment_type': payment_type,
+        'due_date': due,
+        'dry_run': dry_run,
+        'members': members,
+        'billed': billed,
+        'already_billed': billable - billed,
+        # Active members without a room, or whose room has no price
+        'not_billable': members - billable,
+        'chunks': chunks,
+        'seconds': round(seconds, 3),
+        'period_total': {'payments': charges, 'amount': round(amount, 2)},
+    }
+
+
+def main():
+    from migrations import migrate
+
+    parser = argparse.ArgumentParser(description='Charge every active member rent for a billing period.')
+    parser.add_argument('--db', default=os.environ.get(
+        'HOSTEL_DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'simple_hostel.db')))
+    parser.add_argument('--period', help='Billing period as YYYY-MM (default: the current month)')
+    parser.add_argument('--due-day', type=int, default=DUE_DAY, help='Day of the month the charge is due')
+    parser.add_argument('--payment-type', default=PAYMENT_TYPE)
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Members billed per transaction')
+    parser.add_argument('--dry-run', action='store_true', help='Only count what would be billed')
+    args = parser.parse_args()
+
+    migrate(args.db)
+    conn = sqlite3.connect(args.db, timeout=30)
+    # Same durability as the API's pooled connections (WAL, fsync at checkpoints)
+    conn.execute('PRAGMA synchronous = NORMAL')
+    try:
+        report = run_billing(conn, args.period, args.due_day, args.payment_type,
+                             args.chunk_size, dry_run=args.dry_run)
+    except BillingError as e:
+        parser.error(str(e))
+    finally:
+        conn.close()
+    verb = 'Would bill' if args.dry_run else 'Billed'
+    print(f"{verb} {report['billed']} of {report['members']} active members for {report['period']} "
+          f"(due {report['due_date']}) in {report['seconds']}s, {report['chunks']} chunks")
+    print(f"Already billed: {report['already_billed']}, not billable: {report['not_billable']}")
+    total = report['period_total']
+    print(f"{total['payments']} {report['payment_type']} charges for {report['period']} "
+          f"totalling {total['amount']:.2f}")
+
+
+if __name__ == '__main__':
+    main()
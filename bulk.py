@@ -0,0 +1,256 @@
+"""Batched inserts for rooms, members and payments.
+
+Each batch is validated up front (field checks, uniqueness and room capacity
+are resolved with one set-based lookup per batch), then every valid row is
+written with ``executemany`` inside a single write transaction, so a batch
+costs one commit instead of one per row. Rows that fail validation are
+reported back individually and do not stop the rest of the batch.
+
+Every resource has two halves: ``validate_*(items)`` runs the per-row field
+checks without touching the database and returns ``(results, candidates)``,
+and ``write_*(conn, results, candidates)`` does the lookups and inserts
+inside the caller's write transaction. The API validates on the request
+thread and queues only the write half, so the writer thread does not hold
+the write lock while a large body is checked. ``insert_*`` does both in one
+``run_write`` call.
+"""
+import json
+from datetime import datetime
+
+from allocation import run_write
+
+MAX_BATCH_SIZE = 5000
+
+
+class BulkError(ValueError):
+    """Raised when the batch as a whole is unusable."""
+
+
+def _check_batch(items):
+    if not isinstance(items, list):
+        raise BulkError('Expected a JSON array of objects')
+    if not items:
+        raise BulkError('Batch is empty')
+    if len(items) > MAX_BATCH_SIZE:
+        raise BulkError(f'Batch is larger than {MAX_BATCH_SIZE} rows')
+
+
+def _missing(item, fields):
+    if not isinstance(item, dict):
+        return 'Row must be an object'
+    for field in fields:
+        # An explicit null or blank value would only fail on a NOT NULL
+        # constraint inside executemany, taking the whole batch with it
+        value = item.get(field)
+        if value is None or (isinstance(value, str) and not value.strip()):
+            return f'Missing required field: {field}'
+    return None
+
+
+def _existing(cursor, table, column, values):
+    """Return the subset of ``values`` already present in ``table.column``."""
+    if not values:
+        return set()
+    cursor.execute(
+        f"SELECT {column} FROM {table} WHERE {column} IN (SELECT value FROM json_each(?))",
+        (json.dumps(list(values)),)
+    )
+    return {row[column] for row in cursor.fetchall()}
+
+
+def _insert(conn, table, sql, rows):
+    """executemany ``rows`` and return the ids they were assigned.
+
+    All tables use AUTOINCREMENT and the batch holds the write lock, so the
+    new rows take the ``len(rows)`` ids ending at the table's sequence value.
+    """
+    cursor = conn.cursor()
+    cursor.executemany(sql, rows)
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,))
+    last_id = cursor.fetchone()['seq']
+    return range(last_id - len(rows) + 1, last_id + 1)
+
+
+def _finish(conn, table, sql, pending, results):
+    if pending:
+        ids = _insert(conn, table, sql, [row for _, row in pending])
+        for (index, _), new_id in zip(pending, ids):
+            results[index] = {'index': index, 'status': 'created', 'id': new_id}
+    return results
+
+
+def _fail(results, index, message):
+    results[index] = {'index': index, 'status': 'error', 'message': message}
+
+
+def validate_rooms(items):
+    """Field checks for a batch of rooms; returns ``(results, candidates)``."""
+    _check_batch(items)
+    results = [None] * len(items)
+    candidates = []
+    for index, item in enumerate(items):
+        error = _missing(item, ['room_number', 'capacity', 'room_type', 'price_per_month'])
+        if error:
+            _fail(results, index, error)
+            continue
+        try:
+            capacity = int(item['capacity'])
+            price = float(item['price_per_month'])
+        except (TypeError, ValueError) as e:
+            _fail(results, index, f'Invalid numeric value: {str(e)}')
+            continue
+        if capacity <= 0:
+            _fail(results, index, 'Capacity must be greater than 0')
+        elif price <= 0:
+            _fail(results, index, 'Price must be greater than 0')
+        else:
+            row = (str(item['room_number']), capacity, 0, item['room_type'], price, 'available')
+            candidates.append((index, row))
+    return results, candidates
+
+
+def write_rooms(conn, results, candidates):
+    """Insert validated rooms in the open write transaction. Returns one result per item."""
+    cursor = conn.cursor()
+    taken = _existing(cursor, 'room', 'room_number', {row[0] for _, row in candidates})
+    pending = []
+    for index, row in candidates:
+        if row[0] in taken:
+            _fail(results, index, 'Room number already exists')
+            continue
+        taken.add(row[0])
+        pending.append((index, row))
+
+    return _finish(
+        conn, 'room',
+        "INSERT INTO room (room_number, capacity, current_occupancy, room_type, price_per_month, status) VALUES (?, ?, ?, ?, ?, ?)",
+        pending, results
+    )
+
+
+def insert_rooms(conn, items):
+    """Validate and insert a batch of rooms. Returns one result per item."""
+    results, candidates = validate_rooms(items)
+    return run_write(conn, lambda conn: write_rooms(conn, results, candidates))
+
+
+def validate_members(items):
+    """Field checks for a batch of members; returns ``(results, candidates)``."""
+    _check_batch(items)
+    results = [None] * len(items)
+    candidates = []
+    for index, item in enumerate(items):
+        error = _missing(item, ['name', 'email', 'phone', 'room_id'])
+        if error:
+            _fail(results, index, error)
+            continue
+        try:
+            room_id = int(item['room_id'])
+        except (TypeError, ValueError) as e:
+            _fail(results, index, f'Invalid numeric value: {str(e)}')
+            continue
+        row = (item['name'], item['email'], item['phone'], room_id, item.get('emergency_contact', ''))
+        candidates.append((index, row))
+    return results, candidates
+
+
+def write_members(conn, results, candidates):
+    """Insert validated members in the open write transaction, updating room occupancy once per room."""
+    cursor = conn.cursor()
+    taken = _existing(cursor, 'member', 'email', {row[1] for _, row in candidates})
+
+    room_ids = list({row[3] for _, row in candidates})
+    cursor.execute(
+        "SELECT id, capacity - current_occupancy AS free FROM room WHERE id IN (SELECT value FROM json_each(?))",
+        (json.dumps(room_ids),)
+    )
+    free = {row['id']: row['free'] for row in cursor.fetchall()}
+
+    pending = []
+    added = {}
+    for index, row in candidates:
+        email, room_id = row[1], row[3]
+        if email in taken:
+            _fail(results, index, 'Email already exists')
+        elif room_id not in free:
+            _fail(results, index, 'Room not found')
+        elif free[room_id] <= 0:
+            _fail(results, index, 'Room is full')
+        else:
+            taken.add(email)
+            free[room_id] -= 1
+            added[room_id] = added.get(room_id, 0) + 1
+            pending.append((index, row))
+
+    cursor.executemany(
+        "UPDATE room SET current_occupancy = current_occupancy + ? WHERE id = ?",
+        [(count, room_id) for room_id, count in added.items()]
+    )
+    return _finish(
+        conn, 'member',
+        "INSERT INTO member (name, email, phone, room_id, emergency_contact) VALUES (?, ?, ?, ?, ?)",
+        pending, results
+    )
+
+
+def insert_members(conn, items):
+    """Validate and insert a batch of members, updating room occupancy once per room."""
+    results, candidates = validate_members(items)
+    return run_write(conn, lambda conn: write_members(conn, results, candidates))
+
+
+def validate_payments(items):
+    """Field checks for a batch of payments; returns ``(results, candidates)``."""
+    _check_batch(items)
+    results = [None] * len(items)
+    candidates = []
+    today = datetime.now().strftime('%Y-%m-%d')
+    for index, item in enumerate(items):
+        error = _missing(item, ['member_id', 'amount', 'payment_type'])
+        if error:
+            _fail(results, index, error)
+            continue
+        try:
+            member_id = int(item['member_id'])
+            amount = float(item['amount'])
+        except (TypeError, ValueError) as e:
+            _fail(results, index, f'Invalid numeric value: {str(e)}')
+            continue
+        if amount <= 0:
+            _fail(results, index, 'Amount must be greater than 0')
+            continue
+        row = (
+            member_id,
+            amount,
+            item['payment_type'],
+            item.get('payment_date', today),
+            item.get('due_date', None),
+            item.get('status', 'completed'),
+            item.get('description', ''),
+        )
+        candidates.append((index, row))
+    return results, candidates
+
+
+def write_payments(conn, results, candidates):
+    """Insert validated payments in the open write transaction."""
+    cursor = conn.cursor()
+    members = _existing(cursor, 'member', 'id', {row[0] for _, row in candidates})
+    pending = []
+    for index, row in candidates:
+        if row[0] not in members:
+            _fail(results, index, 'Member not found')
+        else:
+            pending.append((index, row))
+
+    return _finish(
+        conn, 'payment',
+        "INSERT INTO payment (member_id, amount, payment_type, payment_date, due_date, status, description) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        pending, results
+    )
+
+
+def insert_payments(conn, items):
+    """Validate and insert a batch of payments."""
+    results, candidates = validate_payments(items)
+    return run_write(conn, lambda conn: write_payments(conn, results, candidates))
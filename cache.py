@@ -0,0 +1,246 @@
+"""In-process read cache and HTTP validators for GET endpoints.
+
+Responses are cached per (path, query arguments) in a bounded LRU with a
+TTL. Every entry records the generation of the tables it was built from;
+a changed generation makes dependent entries stale without having to find
+and delete them.
+
+With a ``versions`` callable (see ``table_versions``) generations are the
+change counters kept in the database by triggers (migration 5), so writes
+from any worker, script or bulk import are seen at once. Without one they
+are in-process counters bumped by the write routes, and with several
+workers the TTL is the upper bound on staleness.
+
+Each response carries a strong ETag derived from the request and the table
+versions, plus ``Last-Modified`` when the versions carry a timestamp (the
+ASGI app in async_api.py uses the same scheme through ``validators``). A
+client revalidating with ``If-None-Match`` / ``If-Modified-Since`` gets a
+304 before the view runs or the cache is consulted. ``Last-Modified`` only
+has one-second resolution: after two writes within the same second,
+``If-Modified-Since`` still answers 304 with the older body, so the ETag is
+the validator to rely on (it wins when a client sends both). Bodies above the
+compression threshold are stored compressed per encoding, so cache hits
+are not compressed again.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timezone
+from functools import wraps
+
+from flask import current_app, request
+
+import compression
+from streaming import wants_stream
+
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_TTL = 5.0
+
+
+def table_versions(conn, tables):
+    """``(version, modified_at)`` per table from the ``table_version`` counters."""
+    placeholders = ', '.join('?' for _ in tables)
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    rows = dict((name, (version, modified_at)) for name, version, modified_at in cursor.execute(
+        f"SELECT name, version, modified_at FROM table_version WHERE name IN ({placeholders})", tables
+    ))
+    return tuple(rows.get(table, (0, None)) for table in tables)
+
+
+class ReadCache:
+    """A thread-safe LRU/TTL cache keyed by request, invalidated by table generation."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL, versions=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.versions = versions
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._generations = {}
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.compressions = 0
+
+    def generation(self, tables):
+        """One ``(version, modified_at)`` pair per table; modified_at may be None."""
+        if self.versions is not None:
+            return self.versions(tables)
+        with self._lock:
+            return tuple((self._generations.get(table, 0), None) for table in tables)
+
+    def bump(self, *tables):
+        """Invalidate every entry built from any of ``tables``."""
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+            self.invalidations += 1
+
+    def get(self, key, generation):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != generation or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, generation, body, mimetype, etag):
+        """Store a response; returns the entry, which ``compressed`` fills in."""
+        # The last item holds compressed variants, filled in on demand
+        entry = (generation, time.monotonic() + self.ttl, body, mimetype, etag, {})
+        if self.max_entries <= 0:
+            return entry
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def compressed(self, entry, encoding):
+        """The body of ``entry`` in ``encoding``, compressed once and kept."""
+        variants = entry[5]
+        body = variants.get(encoding)
+        if body is None:
+            body = variants[encoding] = compression.compress(entry[2], encoding)
+            with self._lock:
+                self.compressions += 1
+        return body
+
+    def record_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'not_modified': self.not_modified,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'compressions': self.compressions,
+                'db_versions': self.versions is not None,
+                'generations': dict(self._generations),
+            }
+
+
+def _request_key():
+    args = tuple(sorted(request.args.items(multi=True)))
+    return (request.path, args)
+
+
+def _etag(key, generation):
+    # Today's date is part of the tag because reports count overdue payments
+    # relative to it
+    seed = repr((key, generation, date.today().isoformat())).encode()
+    return hashlib.blake2b(seed, digest_size=16).hexdigest()
+
+
+def _last_modified(generation):
+    stamps = [modified for _, modified in generation if modified is not None]
+    if len(stamps) != len(generation) or not stamps:
+        return None
+    return datetime.fromtimestamp(max(stamps), tz=timezone.utc)
+
+
+def validators(key, generation):
+    """``(etag, last_modified)`` for a request key at a table generation.
+
+    Shared with async_api.py, so both front ends hand out the same
+    validators for the same data.
+    """
+    return _etag(key, generation), _last_modified(generation)
+
+
+def _not_modified(etag, last_modified):
+    if request.if_none_match:
+        # Any encoding of the current version is still a match
+        return any(request.if_none_match.contains(compression.encoded_etag(etag, encoding))
+                   for encoding in (None, 'gzip', 'br'))
+    since = request.if_modified_since
+    return last_modified is not None and since is not None and last_modified <= since
+
+
+def _response(body, mimetype, status, etag, last_modified, encoding=None, cache_status=None):
+    response = current_app.response_class(body, status=status, mimetype=mimetype)
+    response.set_etag(compression.encoded_etag(etag, encoding))
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # Let browsers keep the body but always revalidate it
+    response.cache_control.no_cache = True
+    response.vary.add('Accept-Encoding')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if cache_status:
+        response.headers['X-Cache'] = cache_status
+    return response
+
+
+def cached(read_cache, *tables):
+    """Cache a GET view's 200 responses until any of ``tables`` is written.
+
+    Streamed responses are never cached; they are meant for exports that
+    would not fit the cache anyway.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if wants_stream(request):
+                return f(*args, **kwargs)
+
+            key = _request_key()
+            generation = read_cache.generation(tables)
+            etag, last_modified = validators(key, generation)
+            if _not_modified(etag, last_modified):
+                read_cache.record_not_modified()
+                return _response(b'', None, 304, etag, last_modified, cache_status='NOT-MODIFIED')
+
+            entry = read_cache.get(key, generation)
+            cache_status = 'HIT'
+            if entry is None:
+                response = current_app.make_response(f(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    response.headers['X-Cache'] = 'MISS'
+                    return response
+                cache_status = 'MISS'
+                entry = read_cache.put(key, generation, response.get_data(), response.mimetype, etag)
+
+            _, _, body, mimetype, _, _ = entry
+            encoding = compression.negotiate(request, len(body)) if compression.compressible(mimetype) else None
+            if encoding:
+                body = read_cache.compressed(entry, encoding)
+            return _response(body, mimetype, 200, etag, last_modified, encoding, cache_status)
+        return decorated
+    return decorator
+
+
+def invalidates(read_cache, *tables):
+    """Bump ``tables`` after a write view succeeds (any status below 400)."""
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            response = current_app.make_response(f(*args, **kwargs))
+            if response.status_code < 400:
+                read_cache.bump(*tables)
+            return response
+        return decorated
+    return decorator
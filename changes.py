@@ -0,0 +1,275 @@
+"""Incremental change feed over rooms, members and payments.
+
+Triggers (migration 6) append one ``change_log`` entry per written row
+under a monotonically increasing sequence number. A client loads the full
+lists once, then asks for what changed since the last sequence number it
+saw and applies the deltas, instead of reloading whole collections.
+
+Changes are coalesced per row: a member updated five times since the
+client's cursor is sent once, with its current state. Rows deleted since
+then are sent with ``data: null``, as are rows moved to the archive tables
+(archive.py), which have op ``archive``. The log keeps the newest 100000
+entries; a cursor older than that (or newer than the log, e.g. after a
+restore) gets ``ResyncRequired`` and the client starts over with a full
+load.
+
+``ChangeNotifier`` lets any number of long-poll and server-sent-event
+clients wait for new entries while a single thread per process watches
+``PRAGMA data_version``, which changes whenever another connection commits
+and costs no disk read to check.
+"""
+import asyncio
+import sqlite3
+import threading
+import time
+
+from listing import MEMBERS, PAYMENTS, ROOMS
+from serialize import dumps, tuple_cursor
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 5000
+MAX_WAIT = 30.0
+POLL_INTERVAL = 0.1
+HEARTBEAT_SECONDS = 15.0
+
+# The list endpoints' columns, so a delta has the same shape as a list row
+SPECS = {spec.table: spec for spec in (ROOMS, MEMBERS, PAYMENTS)}
+
+
+class ChangeFeedError(ValueError):
+    """Raised for invalid change feed arguments; reported to the client as a 400."""
+
+
+class ResyncRequired(Exception):
+    """The cursor is outside the retained log; the client must reload in full."""
+
+
+def parse_tables(value):
+    if not value:
+        return tuple(SPECS)
+    tables = tuple(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+    unknown = [name for name in tables if name not in SPECS]
+    if unknown or not tables:
+        raise ChangeFeedError(f"tables must be a comma-separated subset of {', '.join(SPECS)}")
+    return tables
+
+
+def parse_int(value, name, default, minimum=0, maximum=None):
+    if value is None or value == '':
+        return default
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ChangeFeedError(f'{name} must be an integer')
+    if value < minimum:
+        raise ChangeFeedError(f'{name} must be at least {minimum}')
+    return value if maximum is None else min(value, maximum)
+
+
+# Operations after which the row is no longer in its hot table
+GONE = ('delete', 'archive')
+
+
+def head(conn):
+    """The newest sequence number handed out, 0 before the first change."""
+    cursor = tuple_cursor(conn)
+    row = cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'").fetchone()
+    return row[0] if row else 0
+
+
+def _check_cursor(cursor, since, newest):
+    if since > newest:
+        raise ResyncRequired(f'since={since} is ahead of the change log (head {newest})')
+    if since == newest:
+        return
+    oldest = cursor.execute("SELECT MIN(seq) FROM change_log").fetchone()[0]
+    if oldest is None or since < oldest - 1:
+        raise ResyncRequired(f'changes after {since} are no longer retained; reload and resync from {newest}')
+
+
+def _current_rows(cursor, spec, ids):
+    columns = ', '.join(f'{expression} AS {name}' for name, expression in spec.columns.items())
+    key = spec.columns[spec.key]
+    cursor.execute(
+        f"SELECT {columns} FROM {spec.from_clause} WHERE {key} IN (SELECT value FROM json_each(?))",
+        (dumps(ids),),
+    )
+    names = [column[0] for column in cursor.description]
+    return {row[0]: dict(zip(names, row)) for row in cursor.fetchall()}
+
+
+def changes_since(conn, since, limit=DEFAULT_LIMIT, tables=None):
+    """Rows of ``tables`` written after sequence number ``since``.
+
+    Returns ``{'changes': [...], 'next_since': n, 'has_more': bool}``. Each
+    change is ``{'seq', 'table', 'id', 'op', 'data'}`` in sequence order;
+    ``data`` is the row as the list endpoints return it, or None once the
+    row is deleted or archived. Pass ``next_since`` back to continue.
+    """
+    tables = tables or tuple(SPECS)
+    cursor = tuple_cursor(conn)
+    # One read transaction, so the log and the rows it points at agree
+    own_transaction = not conn.in_transaction
+    if own_transaction:
+        cursor.execute('BEGIN')
+    try:
+        newest = head(conn)
+        _check_cursor(cursor, since, newest)
+        # Bare columns next to MAX() come from the row holding the maximum,
+        # so op is the row's latest operation
+        cursor.execute(f"""
+        SELECT table_name, row_id, MAX(seq) AS seq, op
+        FROM change_log
+        WHERE seq > ? AND table_name IN ({', '.join('?' for _ in tables)})
+        GROUP BY table_name, row_id
+        ORDER BY seq
+        LIMIT ?
+        """, (since, *tables, limit + 1))
+        entries = cursor.fetchall()
+        has_more = len(entries) > limit
+        entries = entries[:limit]
+
+        live = {}
+        for table in tables:
+            ids = [row_id for name, row_id, _, op in entries if name == table and op not in GONE]
+            live[table] = _current_rows(cursor, SPECS[table], ids) if ids else {}
+    finally:
+        if own_transaction:
+            cursor.execute('COMMIT')
+
+    changes = []
+    for table, row_id, seq, op in entries:
+        data = live[table].get(row_id)
+        changes.append({
+            'seq': seq,
+            'table': table,
+            'id': row_id,
+            # A row missing despite a later insert/update was deleted mid-read
+            'op': op if data is not None or op in GONE else 'delete',
+            'data': data,
+        })
+    # Without more to fetch the client can jump to the head: entries for
+    # other tables are skipped for good
+    next_since = entries[-1][2] if has_more else max(since, newest)
+    return {'changes': changes, 'next_since': next_since, 'has_more': has_more}
+
+
+class ChangeNotifier:
+    """Wakes waiting requests when the change log grows.
+
+    The watcher thread runs only while someone is waiting and shares one
+    connection, so a hundred idle long-poll clients cost one cheap PRAGMA
+    every ``interval`` seconds instead of a hundred queries.
+    """
+
+    def __init__(self, db_path, interval=POLL_INTERVAL):
+        self.db_path = db_path
+        self.interval = interval
+        self._cond = threading.Condition()
+        self._waiters = 0
+        self._thread = None
+        self.head = None
+        self.wakeups = 0
+
+    def _start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='change-notifier', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        try:
+            data_version = None
+            while True:
+                with self._cond:
+                    while not self._waiters:
+                        self._cond.wait()
+                current = conn.execute('PRAGMA data_version').fetchone()[0]
+                if current != data_version or self.head is None:
+                    data_version = current
+                    newest = head(conn)
+                    with self._cond:
+                        if newest != self.head:
+                            self.head = newest
+                            self.wakeups += 1
+                            self._cond.notify_all()
+                time.sleep(self.interval)
+        finally:
+            conn.close()
+
+    def wait(self, since, timeout):
+        """Block until the log has entries after ``since`` or ``timeout`` passes.
+
+        Returns True if there is something new to fetch.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._waiters += 1
+            self._start()
+            self._cond.notify_all()
+            try:
+                while self.head is None or self.head <= since:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+                return True
+            finally:
+                self._waiters -= 1
+
+    async def wait_async(self, since, timeout):
+        """``wait`` for the asyncio app: polls ``head`` without blocking the loop."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        with self._cond:
+            self._waiters += 1
+            self._start()
+            self._cond.notify_all()
+        try:
+            while self.head is None or self.head <= since:
+                if loop.time() >= deadline:
+                    return False
+                await asyncio.sleep(self.interval)
+            return True
+        finally:
+            with self._cond:
+                self._waiters -= 1
+
+    def stats(self):
+        with self._cond:
+            return {'waiters': self._waiters, 'head': self.head, 'wakeups': self.wakeups}
+
+
+def sse_event(event, data, event_id=None):
+    lines = [f'id: {event_id}'] if event_id is not None else []
+    lines += [f'event: {event}', f'data: {dumps(data)}']
+    return '\n'.join(lines) + '\n\n'
+
+
+def iter_events(pool, notifier, since, limit=DEFAULT_LIMIT, tables=None,
+                max_seconds=None, heartbeat=HEARTBEAT_SECONDS):
+    """Server-sent events: one ``changes`` event per batch, with keep-alives.
+
+    A pooled connection is held only while a batch is read, never while
+    waiting. The event id is the batch's ``next_since``, so a reconnecting
+    ``EventSource`` resumes where it left off via ``Last-Event-ID``. The
+    stream ends after ``max_seconds`` to hand the worker thread back; the
+    browser reconnects on its own.
+    """
+    deadline = None if max_seconds is None else time.monotonic() + max_seconds
+    yield 'retry: 3000\n\n'
+    while deadline is None or time.monotonic() < deadline:
+        try:
+            with pool.connection() as conn:
+                batch = changes_since(conn, since, limit, tables)
+        except ResyncRequired as e:
+            yield sse_event('resync', {'message': str(e)})
+            return
+        if batch['changes']:
+            yield sse_event('changes', batch, batch['next_since'])
+        since = batch['next_since']
+        if batch['has_more']:
+            continue
+        wait = heartbeat if deadline is None else min(heartbeat, deadline - time.monotonic())
+        if wait > 0 and not notifier.wait(since, wait):
+            yield ': keep-alive\n\n'
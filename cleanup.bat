@@ -13,7 +13,7 @@ echo Creating backup of database and essential files...
 echo.
 
 mkdir backup_essential 2>nul
-copy simple_hostel.db backup_essential\ > nul
+python backup.py backup backup_essential\simple_hostel.db > nul
 copy auth_api.py backup_essential\ > nul
 copy db_info.py backup_essential\ > nul
 copy view_db.bat backup_essential\ > nul
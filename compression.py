@@ -0,0 +1,76 @@
+"""Response compression with Accept-Encoding negotiation.
+
+JSON compresses well (list responses shrink 5-10x), which matters far more
+than CPU on the hostel's Wi-Fi. Bodies smaller than
+``HOSTEL_COMPRESS_MIN_BYTES`` are sent as they are, since a few hundred
+bytes gain nothing. Brotli is used when the optional ``brotli`` package is
+installed and the client accepts it, otherwise gzip.
+
+``init_app`` compresses ordinary responses in an ``after_request`` hook.
+The read cache calls ``negotiate`` / ``compress`` itself so it can keep the
+compressed body and skip the work on later hits.
+"""
+import gzip
+import os
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+MIN_SIZE = int(os.environ.get('HOSTEL_COMPRESS_MIN_BYTES', 1024))
+GZIP_LEVEL = int(os.environ.get('HOSTEL_GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.environ.get('HOSTEL_BROTLI_QUALITY', 5))
+
+COMPRESSIBLE = ('application/json', 'application/x-ndjson', 'text/')
+
+
+def compressible(mimetype):
+    return bool(mimetype) and mimetype.startswith(COMPRESSIBLE)
+
+
+def negotiate(request, size):
+    """Pick ``'br'``, ``'gzip'`` or None for a body of ``size`` bytes."""
+    if size < MIN_SIZE:
+        return None
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    # mtime=0 keeps the output identical for identical input
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def encoded_etag(etag, encoding):
+    """Each encoding is a different representation, so it gets its own tag."""
+    return f'{etag}-{encoding}' if encoding else etag
+
+
+def init_app(app):
+    """Compress eligible responses that the read cache has not handled."""
+
+    @app.after_request
+    def compress_response(response):
+        if (response.status_code != 200 or response.is_streamed or response.direct_passthrough
+                or 'Content-Encoding' in response.headers or not compressible(response.mimetype)):
+            return response
+        response.vary.add('Accept-Encoding')
+        body = response.get_data()
+        encoding = negotiate(request, len(body))
+        if encoding is None:
+            return response
+        response.set_data(compress(body, encoding))
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(encoded_etag(etag, encoding), weak)
+        return response
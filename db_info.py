@@ -1,61 +1,368 @@
-import sqlite3
+"""Inspect a hostel database without scanning its tables.
+
+Usage:
+    python db_info.py                       (simple_hostel.db / hostel.db)
+    python db_info.py path/to/hostel.db --sizes
+
+Everything shown comes from catalogs and counters rather than from the data
+itself:
+
+* row counts: the trigger-maintained ``stats_*`` tables for rooms, members
+  and payments, ``sqlite_stat1`` (written by ``PRAGMA optimize``) for the
+  rest, exact ``COUNT(*)`` only for tables of a few pages;
+* sizes, fill and fragmentation: page counts and the freelist, plus the
+  ``dbstat`` virtual table per table and index (skipped above
+  ``SIZES_LIMIT`` unless ``--sizes`` is given, since dbstat reads every
+  page);
+* the ``EXPLAIN QUERY PLAN`` of each hot query behind auth_api.py, taken
+  from the same query builders the API uses. Any plan that scans a table it
+  should search is flagged as a missing index, and indexes that no hot
+  query uses are listed.
+
+The database is opened read-only, so it is safe to run against the live
+file while the API is serving.
+"""
+import argparse
 import os
+import re
+import sqlite3
+import sys
+import time
+
+import archive
+import auth
+import billing
+import changes
+import reports
+import search
+from cache import table_versions
+from listing import MEMBERS, PAYMENTS, ROOMS, build_list_query
+from migrations import latest_version
+from serialize import dict_factory
+
+DEFAULT_DB_FILES = ("simple_hostel.db", "hostel.db")
+# dbstat visits every page; above this the per-object sizes need --sizes
+SIZES_LIMIT = 256 * 1024 * 1024
+# Tables this small are counted exactly
+SMALL_TABLE_PAGES = 64
+# Row counts kept by the migration 3 triggers
+COUNTERS = {
+    'room': "SELECT TOTAL(rooms) AS n FROM stats_room_type",
+    'member': "SELECT TOTAL(members) AS n FROM stats_member",
+    'payment': "SELECT TOTAL(payments) AS n FROM stats_payment",
+}
+
+
+class HotQuery:
+    """A query the API runs often, and the table scans its plan may contain.
+
+    ``statements(conn)`` returns ``(sql, params)`` pairs. ``scans`` names the
+    tables (or aliases) that the query reads in full or in rowid order by
+    design; any other full scan is reported as a missing index. ``ordered``
+    marks keyset-paginated queries, which must not sort in a temp b-tree.
+    """
+
+    def __init__(self, label, statements, scans=(), ordered=False):
+        self.label = label
+        self.statements = statements
+        self.scans = scans
+        self.ordered = ordered
+
+
+def _list_query(spec, **args):
+    def statements(conn):
+        query = build_list_query(spec, args)
+        return [(query.sql, query.params)]
+    return statements
+
+
+def _traced(work):
+    """Run ``work(conn)`` and return the statements it executed.
+
+    Used for the report, search and auth queries, whose SQL lives inside
+    their functions. The arguments chosen keep each run cheap.
+    """
+    def statements(conn):
+        executed = []
+        conn.set_trace_callback(executed.append)
+        try:
+            work(conn)
+        finally:
+            conn.set_trace_callback(None)
+        # Drop FTS5's own bookkeeping statements and pragmas
+        return [(sql, ()) for sql in executed
+                if sql.lstrip().upper().startswith(('SELECT', 'WITH')) and "'main'." not in sql]
+    return statements
+
+
+def _recent_changes(conn):
+    head = changes.head(conn)
+    changes.changes_since(conn, max(head - 100, 0), limit=changes.DEFAULT_LIMIT)
+
+
+def _billing_queries(conn):
+    # Planned rather than traced: a dry run walks every active member
+    period = billing.parse_period()[0]
+    chunk = (billing.MEMBER_STATUS, 0, '9999-12-31', billing.CHUNK_SIZE)
+    unbilled = (billing.MEMBER_STATUS, 0, billing.CHUNK_SIZE, '9999-12-31', period, billing.PAYMENT_TYPE)
+    return [(billing.CHUNK_SQL, chunk), (billing.UNBILLED_SQL, unbilled)]
+
+
+HOT_QUERIES = [
+    HotQuery('GET /api/rooms', _list_query(ROOMS), scans=('room',)),
+    HotQuery('GET /api/rooms?room_type=', _list_query(ROOMS, room_type='Single', limit='50'), ordered=True),
+    HotQuery('GET /api/rooms?status=', _list_query(ROOMS, status='available', limit='50'), ordered=True),
+    HotQuery('GET /api/members?limit=', _list_query(MEMBERS, limit='50', after_id='100'), scans=('m',), ordered=True),
+    HotQuery('GET /api/members?status=&sort=-join_date',
+             _list_query(MEMBERS, status='active', sort='-join_date', limit='50'), ordered=True),
+    HotQuery('GET /api/members?room_id=', _list_query(MEMBERS, room_id='1', limit='50'), ordered=True),
+    HotQuery('GET /api/payments?limit=', _list_query(PAYMENTS, limit='50'), ordered=True),
+    HotQuery('GET /api/payments?member_id=', _list_query(PAYMENTS, member_id='1', limit='50'), ordered=True),
+    HotQuery('GET /api/payments?include_archived=',
+             _list_query(PAYMENTS, include_archived='1', limit='50', after_id='100'), ordered=True),
+    HotQuery('GET /api/payments?status=', _list_query(PAYMENTS, status='pending', limit='50'), ordered=True),
+    HotQuery('GET /api/members/search', _traced(lambda conn: search.search_members(conn, 'wi sm')), scans=('hit',)),
+    HotQuery('GET /api/reports/payments',
+             _traced(lambda conn: reports.payments_report(conn, start_date='2024-01-01', end_date='2024-01-31'))),
+    HotQuery('GET /api/reports/occupancy', _traced(reports.occupancy_report), scans=('room',)),
+    HotQuery('GET /api/stats', _traced(reports.dashboard_stats),
+             scans=('stats_room_type', 'stats_member', 'stats_payment')),
+    HotQuery('GET /api/changes', _traced(_recent_changes)),
+    HotQuery('POST /api/billing/run', _billing_queries),
+    HotQuery('POST /api/login', _traced(lambda conn: auth.authenticate(conn, 'nobody', ''))),
+    HotQuery('cache validators', _traced(lambda conn: table_versions(conn, ('room', 'member', 'payment')))),
+]
+
+_SCAN = re.compile(r'^SCAN (\S+)(.*)$')
+_INDEX = re.compile(r'USING (?:COVERING )?INDEX (\w+)')
+_ALIAS = re.compile(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', re.IGNORECASE)
+
+
+def connect_readonly(db_path):
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    conn.row_factory = dict_factory
+    return conn
+
+
+def _format_size(size):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.1f} {unit}" if unit != 'B' else f"{size} B"
+        size /= 1024
 
-def show_database_info(db_path):
+
+def _objects(conn):
+    rows = conn.execute(
+        "SELECT type, name, tbl_name FROM sqlite_master WHERE type IN ('table', 'index') ORDER BY tbl_name, type DESC, name"
+    ).fetchall()
+    tables = [row['name'] for row in rows if row['type'] == 'table' and not row['name'].startswith('sqlite_')]
+    indexes = {}
+    for row in rows:
+        if row['type'] == 'index':
+            indexes.setdefault(row['tbl_name'], []).append(row['name'])
+    return tables, indexes
+
+
+def _stat1(conn):
+    """``{(table, index or None): stat string}`` from sqlite_stat1, if analysed."""
+    try:
+        rows = conn.execute("SELECT tbl, idx, stat FROM sqlite_stat1").fetchall()
+    except sqlite3.OperationalError:
+        return None
+    return {(row['tbl'], row['idx']): row['stat'] for row in rows}
+
+
+def _object_sizes(conn):
+    """Pages, bytes and unused bytes per table / index from dbstat."""
+    rows = conn.execute(
+        "SELECT name, pageno AS pages, pgsize AS bytes, unused FROM dbstat WHERE aggregate = TRUE"
+    ).fetchall()
+    return {row['name']: row for row in rows}
+
+
+def _row_count(conn, table, stat1, sizes):
+    """``(count, source)`` for ``table`` without reading a large table."""
+    if table in COUNTERS:
+        try:
+            count = int(conn.execute(COUNTERS[table]).fetchone()['n'])
+            # The counters keep archived rows in the totals (migration 7)
+            archived = table in archive.ARCHIVES and conn.execute(
+                f"SELECT EXISTS (SELECT 1 FROM sqlite_master WHERE name = '{archive.ARCHIVES[table]}') AS present"
+            ).fetchone()['present'] and conn.execute(
+                f"SELECT EXISTS (SELECT 1 FROM {archive.ARCHIVES[table]}) AS present"
+            ).fetchone()['present']
+            return count, 'counter, including archived rows' if archived else 'counter'
+        except sqlite3.OperationalError:
+            pass
+    if sizes is not None and table in sizes and sizes[table]['pages'] <= SMALL_TABLE_PAGES:
+        return conn.execute(f'SELECT COUNT(*) AS n FROM "{table}"').fetchone()['n'], 'exact'
+    if stat1:
+        for (tbl, _), stat in stat1.items():
+            if tbl == table:
+                return int(stat.split()[0]), 'sqlite_stat1'
+    try:
+        row = conn.execute(f'SELECT MIN(rowid) AS lo, MAX(rowid) AS hi FROM "{table}"').fetchone()
+    except sqlite3.OperationalError:
+        return None, 'unknown'
+    if row['hi'] is None:
+        return 0, 'exact'
+    return row['hi'] - row['lo'] + 1, 'rowid range (upper bound)'
+
+
+def _plan(conn, sql, params):
+    rows = conn.execute('EXPLAIN QUERY PLAN ' + sql, params).fetchall()
+    depth = {0: -1}
+    lines = []
+    for row in rows:
+        depth[row['id']] = depth.get(row['parent'], -1) + 1
+        lines.append((depth[row['id']], row['detail']))
+    return lines
+
+
+def _aliases(sql):
+    aliases = {}
+    for table, alias in _ALIAS.findall(sql):
+        aliases[table] = table
+        if alias and alias.upper() not in ('WHERE', 'LEFT', 'JOIN', 'ON', 'ORDER', 'GROUP', 'INNER', 'LIMIT'):
+            aliases[alias] = table
+    return aliases
+
+
+def inspect_queries(conn, row_counts):
+    """Plans for HOT_QUERIES plus the problems found and the indexes they use."""
+    results = []
+    used_indexes = set()
+    for hot in HOT_QUERIES:
+        try:
+            statements = hot.statements(conn)
+            plans = [(sql, _plan(conn, sql, params)) for sql, params in statements]
+        except sqlite3.Error as e:
+            results.append((hot, [], None, f"skipped: {e}"))
+            continue
+        problems = []
+        for sql, plan in plans:
+            aliases = _aliases(sql)
+            for _, detail in plan:
+                used_indexes.update(_INDEX.findall(detail))
+                scan = _SCAN.match(detail)
+                if scan and not scan.group(2).strip() and scan.group(1) not in hot.scans:
+                    table = aliases.get(scan.group(1), scan.group(1))
+                    if table in row_counts:
+                        count = row_counts[table][0]
+                        size = f" (~{count} rows)" if count is not None else ''
+                        problems.append(f"full scan of {table}{size}: missing index?")
+                if hot.ordered and detail.startswith('USE TEMP B-TREE FOR ORDER BY'):
+                    problems.append("sorts in a temp b-tree: no index matches the sort order")
+        results.append((hot, plans, list(dict.fromkeys(problems)), None))
+    return results, used_indexes
+
+
+def show_database_info(db_path, sizes=None):
+    """Print the report for ``db_path``. Returns the number of flagged queries."""
     if not os.path.exists(db_path):
         print(f"Database file {db_path} not found.")
-        return
-    
-    print(f"Database file: {db_path} (Size: {os.path.getsize(db_path)/1024:.2f} KB)")
-    print("-" * 50)
-    
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    # Get all tables
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-    tables = cursor.fetchall()
-    
-    print(f"Found {len(tables)} tables:")
-    print("-" * 50)
-    
-    for table in tables:
-        table_name = table[0]
-        print(f"\nTABLE: {table_name}")
-        
-        # Get table structure
-        cursor.execute(f"PRAGMA table_info({table_name})")
-        columns = cursor.fetchall()
-        print("  Columns:")
-        for col in columns:
-            col_id, col_name, col_type, not_null, default_val, is_pk = col
-            print(f"    - {col_name} ({col_type})", end="")
-            if is_pk:
-                print(" PRIMARY KEY", end="")
-            if not_null:
-                print(" NOT NULL", end="")
-            print()
-        
-        # Count rows in table
-        cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
-        row_count = cursor.fetchone()[0]
-        print(f"  Records: {row_count}")
-        
-        # Show sample data (first 5 rows)
-        if row_count > 0:
-            cursor.execute(f"SELECT * FROM {table_name} LIMIT 5")
-            rows = cursor.fetchall()
-            if rows:
-                print("  Sample data:")
-                for row in rows:
-                    print(f"    {row}")
-    
-    conn.close()
+        return 0
 
-if __name__ == "__main__":
-    db_files = ["simple_hostel.db", "hostel.db"]
-    
+    start = time.perf_counter()
+    file_size = os.path.getsize(db_path)
+    wal_path = db_path + '-wal'
+    wal_size = os.path.getsize(wal_path) if os.path.exists(wal_path) else 0
+    if sizes is None:
+        sizes = file_size <= SIZES_LIMIT
+
+    conn = connect_readonly(db_path)
+    try:
+        page_size = conn.execute('PRAGMA page_size').fetchone()['page_size']
+        page_count = conn.execute('PRAGMA page_count').fetchone()['page_count']
+        freelist = conn.execute('PRAGMA freelist_count').fetchone()['freelist_count']
+        journal = conn.execute('PRAGMA journal_mode').fetchone()['journal_mode']
+        schema = conn.execute('PRAGMA user_version').fetchone()['user_version']
+
+        print(f"Database file: {db_path} ({_format_size(file_size)}, WAL {_format_size(wal_size)})")
+        print(f"Schema version {schema}, journal_mode={journal}, {page_count} pages of {page_size} bytes, "
+              f"{freelist} free ({freelist * 100.0 / page_count if page_count else 0:.1f}%)")
+        if freelist and freelist * 10 > page_count:
+            print("  More than 10% of the file is free pages; VACUUM (offline) would shrink it.")
+        if schema < latest_version():
+            print(f"  The schema is behind the API (version {latest_version()}); starting the API migrates it.")
+        print("-" * 50)
+
+        tables, indexes = _objects(conn)
+        stat1 = _stat1(conn)
+        object_sizes = None
+        if sizes:
+            try:
+                object_sizes = _object_sizes(conn)
+            except sqlite3.OperationalError:
+                print("dbstat is not available in this SQLite build; per-table sizes are skipped.")
+        elif file_size > SIZES_LIMIT:
+            print(f"Per-table sizes skipped for a file over {_format_size(SIZES_LIMIT)}; pass --sizes to read them.")
+        if not stat1:
+            print("No sqlite_stat1 statistics; row estimates are rough. Run PRAGMA optimize (the API does after migrating).")
+
+        row_counts = {table: _row_count(conn, table, stat1, object_sizes) for table in tables}
+        query_results, used_indexes = inspect_queries(conn, row_counts)
+
+        print(f"Found {len(tables)} tables:")
+        for table in tables:
+            count, source = row_counts[table]
+            line = f"\nTABLE: {table}  rows: {'?' if count is None else count} ({source})"
+            if object_sizes and table in object_sizes:
+                info = object_sizes[table]
+                fill = 100.0 * (info['bytes'] - info['unused']) / info['bytes'] if info['bytes'] else 0
+                line += f"  size: {_format_size(info['bytes'])}, {info['pages']} pages, {fill:.0f}% full"
+            print(line)
+            for index in indexes.get(table, []):
+                parts = [f"  index {index}"]
+                if object_sizes and index in object_sizes:
+                    parts.append(_format_size(object_sizes[index]['bytes']))
+                if stat1 and (table, index) in stat1:
+                    parts.append(f"stat {stat1[(table, index)]}")
+                if not index.startswith('sqlite_autoindex') and index not in used_indexes:
+                    parts.append("not used by any hot query")
+                print(', '.join(parts))
+
+        print("\n" + "-" * 50)
+        print("Hot query plans:")
+        flagged = 0
+        for hot, plans, problems, skipped in query_results:
+            print(f"\n{hot.label}")
+            if skipped:
+                print(f"  ({skipped})")
+                continue
+            for _, plan in plans:
+                for depth, detail in plan:
+                    print(f"    {'  ' * depth}{detail}")
+            for problem in problems:
+                print(f"  ! {problem}")
+            flagged += bool(problems)
+        print("\n" + "-" * 50)
+        if flagged:
+            print(f"{flagged} hot quer{'y' if flagged == 1 else 'ies'} flagged (see '!' above).")
+        else:
+            print("Every hot query is served by an index.")
+    finally:
+        conn.close()
+    print(f"Inspected in {(time.perf_counter() - start) * 1000:.0f} ms")
+    return flagged
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show sizes, row counts and hot query plans for a hostel database.')
+    parser.add_argument('db_paths', nargs='*', help=f"Database files (default: {', '.join(DEFAULT_DB_FILES)})")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--sizes', dest='sizes', action='store_true', default=None,
+                       help='Always read per-table sizes from dbstat')
+    group.add_argument('--no-sizes', dest='sizes', action='store_false')
+    args = parser.parse_args()
+
+    db_files = args.db_paths or [path for path in DEFAULT_DB_FILES if os.path.exists(path)]
+    if not db_files:
+        sys.exit(f"None of {', '.join(DEFAULT_DB_FILES)} found.")
     for db_file in db_files:
-        if os.path.exists(db_file):
-            show_database_info(db_file)
-            print("\n" + "=" * 80 + "\n") 
\ No newline at end of file
+        show_database_info(db_file, sizes=args.sizes)
+        print("\n" + "=" * 80 + "\n")
+
+
+if __name__ == "__main__":
+    main()
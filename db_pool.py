@@ -0,0 +1,160 @@
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# Pragmas applied to every pooled connection. journal_mode=WAL lets readers
+# run alongside the single writer, synchronous=NORMAL is durable under WAL
+# while only fsyncing at checkpoints, and a negative cache_size is in KiB.
+DEFAULT_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('cache_size', -16000),
+    ('mmap_size', 268435456),
+    ('temp_store', 'MEMORY'),
+    ('busy_timeout', 5000),
+)
+
+
+class PoolTimeout(sqlite3.OperationalError):
+    """Raised when no pooled connection becomes free within the timeout."""
+
+
+class ConnectionPool:
+    """A bounded pool of tuned SQLite connections shared by request threads.
+
+    Connections are opened lazily up to ``max_size`` and handed out one per
+    thread at a time. Each connection keeps its own prepared statement cache,
+    so parameterised queries are compiled once and reused across requests.
+    """
+
+    def __init__(self, db_path, max_size=8, timeout=10.0, row_factory=None,
+                 pragmas=DEFAULT_PRAGMAS, cached_statements=256, factory=None):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.timeout = timeout
+        self.row_factory = row_factory
+        self.pragmas = pragmas
+        self.cached_statements = cached_statements
+        self.factory = factory or sqlite3.Connection
+
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._live = 0
+        self._in_use = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+            factory=self.factory,
+        )
+        for name, value in self.pragmas:
+            conn.execute(f"PRAGMA {name} = {value}")
+        if self.row_factory is not None:
+            conn.row_factory = self.row_factory
+        return conn
+
+    def acquire(self):
+        """Check out a connection, opening a new one if the pool has room."""
+        start = time.perf_counter()
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+
+        if conn is None:
+            with self._lock:
+                can_open = self._live < self.max_size
+                if can_open:
+                    self._live += 1
+            if can_open:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._live -= 1
+                    raise
+            else:
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._timeouts += 1
+                    raise PoolTimeout(
+                        f"No database connection available after {self.timeout}s"
+                    )
+
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return conn
+
+    def release(self, conn):
+        """Return a connection to the pool, discarding any open transaction."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            # A connection we cannot roll back is not safe to hand out again
+            conn.close()
+            with self._lock:
+                self._live -= 1
+                self._in_use -= 1
+            return
+        with self._lock:
+            self._in_use -= 1
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Context manager that checks a connection out and back in."""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def warm(self, count=None):
+        """Open up to ``count`` connections ahead of the first request."""
+        count = self.max_size if count is None else min(count, self.max_size)
+        conns = [self.acquire() for _ in range(count)]
+        for conn in conns:
+            self.release(conn)
+
+    def close_all(self):
+        """Close every idle connection, e.g. before forking or shutting down."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._live -= 1
+
+    def stats(self):
+        """Return a snapshot of pool counters."""
+        with self._lock:
+            checkouts = self._checkouts
+            return {
+                'max_size': self.max_size,
+                'live_connections': self._live,
+                'in_use': self._in_use,
+                'idle': self._live - self._in_use,
+                'checkouts': checkouts,
+                'timeouts': self._timeouts,
+                'wait_seconds_total': round(self._wait_total, 6),
+                'wait_seconds_avg': round(self._wait_total / checkouts, 6) if checkouts else 0.0,
+                'wait_seconds_max': round(self._wait_max, 6),
+            }
@@ -11,7 +11,7 @@ import {
   Hotel as HotelIcon,
   Payment as PaymentIcon,
 } from '@mui/icons-material';
-import { getRooms, getMembers, getPayments } from '../services/api';
+import { getStats } from '../services/api';
 
 function Dashboard() {
   const [loading, setLoading] = useState(true);
@@ -25,24 +25,13 @@ function Dashboard() {
   useEffect(() => {
     const fetchData = async () => {
       try {
-        const [rooms, members, payments] = await Promise.all([
-          getRooms(),
-          getMembers(),
-          getPayments(),
-        ]);
-
-        const totalRooms = rooms.length;
-        const totalMembers = members.length;
-        const totalPayments = payments.length;
-        const occupancyRate = rooms.reduce((acc, room) => {
-          return acc + (room.current_occupancy / room.capacity);
-        }, 0) / totalRooms * 100;
+        const summary = await getStats();
 
         setStats({
-          totalMembers,
-          totalRooms,
-          totalPayments,
-          occupancyRate: Math.round(occupancyRate),
+          totalMembers: summary.total_members,
+          totalRooms: summary.total_rooms,
+          totalPayments: summary.total_payments,
+          occupancyRate: Math.round(summary.occupancy_rate),
         });
       } catch (error) {
         console.error('Error fetching dashboard data:', error);
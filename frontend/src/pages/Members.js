@@ -20,13 +20,15 @@ import {
   CircularProgress,
 } from '@mui/material';
 import { Add as AddIcon, Edit as EditIcon, Delete as DeleteIcon } from '@mui/icons-material';
-import { getMembers, getRooms, createMember } from '../services/api';
+import { getMembers, getRooms, createMember, searchMembers } from '../services/api';
 
 function Members() {
   const [members, setMembers] = useState([]);
   const [rooms, setRooms] = useState([]);
   const [loading, setLoading] = useState(true);
   const [open, setOpen] = useState(false);
+  const [query, setQuery] = useState('');
+  const [results, setResults] = useState(null);
   const [formData, setFormData] = useState({
     name: '',
     email: '',
@@ -39,6 +41,27 @@ function Members() {
     fetchData();
   }, []);
 
+  // Search on the server once the user pauses typing
+  useEffect(() => {
+    if (!query.trim()) {
+      setResults(null);
+      return undefined;
+    }
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        const found = await searchMembers(query.trim());
+        if (!cancelled) setResults(found);
+      } catch (error) {
+        console.error('Error searching members:', error);
+      }
+    }, 250);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [query]);
+
   const fetchData = async () => {
     try {
       const [membersData, roomsData] = await Promise.all([
@@ -104,6 +127,14 @@ function Members() {
         </Button>
       </Box>
 
+      <TextField
+        fullWidth
+        label="Search by name, email or phone"
+        value={query}
+        onChange={(e) => setQuery(e.target.value)}
+        sx={{ mb: 2 }}
+      />
+
       <TableContainer component={Paper}>
         <Table>
           <TableHead>
@@ -118,13 +149,13 @@ function Members() {
             </TableRow>
           </TableHead>
           <TableBody>
-            {members.map((member) => (
+            {(results || members).map((member) => (
               <TableRow key={member.id}>
                 <TableCell>{member.name}</TableCell>
                 <TableCell>{member.email}</TableCell>
                 <TableCell>{member.phone}</TableCell>
                 <TableCell>
-                  {rooms.find((room) => room.id === member.room_id)?.room_number}
+                  {member.room_number || rooms.find((room) => room.id === member.room_id)?.room_number}
                 </TableCell>
                 <TableCell>
                   {new Date(member.join_date).toLocaleDateString()}
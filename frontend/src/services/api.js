@@ -19,6 +19,21 @@ api.interceptors.request.use(
   (error) => Promise.reject(error)
 );
 
+// An expired or revoked session token sends the user back to the login page
+api.interceptors.response.use(
+  (response) => response,
+  (error) => {
+    if (error.response && error.response.status === 401 && !error.config.url.endsWith('/login')) {
+      localStorage.removeItem('token');
+      localStorage.removeItem('user');
+      if (window.location.pathname !== '/login') {
+        window.location.assign('/login');
+      }
+    }
+    return Promise.reject(error);
+  }
+);
+
 // Authentication
 export const login = async (username, password) => {
   try {
@@ -29,6 +44,16 @@ export const login = async (username, password) => {
   }
 };
 
+// Revoke the session token on the server. The token is passed in because
+// the caller clears localStorage right away.
+export const logout = async (token) => {
+  try {
+    await api.post('/logout', null, { headers: { Authorization: `Bearer ${token}` } });
+  } catch (error) {
+    // The token may already be expired or revoked; nothing left to do
+  }
+};
+
 // Rooms
 export const getRooms = async () => {
   try {
@@ -90,6 +115,16 @@ export const getMembers = async () => {
   }
 };
 
+// Ranked prefix search on the server; returns at most `limit` members
+export const searchMembers = async (q, limit = 20) => {
+  try {
+    const response = await api.get('/members/search', { params: { q, limit } });
+    return response.data;
+  } catch (error) {
+    throw error;
+  }
+};
+
 export const createMember = async (memberData) => {
   try {
     const response = await api.post('/members', memberData);
@@ -99,6 +134,16 @@ export const createMember = async (memberData) => {
   }
 };
 
+// Dashboard summary (precomputed on the server)
+export const getStats = async () => {
+  try {
+    const response = await api.get('/stats');
+    return response.data;
+  } catch (error) {
+    throw error;
+  }
+};
+
 // Reports
 export const getOccupancyReport = async () => {
   try {
@@ -175,4 +220,22 @@ export const createPayment = async (paymentData) => {
   }
 };
 
+// Charge every active member rent for `period` (YYYY-MM); safe to repeat
+export const runBilling = async (period, { dueDay, dryRun = false } = {}) => {
+  try {
+    const response = await api.post('/billing/run', { period, due_day: dueDay, dry_run: dryRun });
+    return response.data;
+  } catch (error) {
+    throw error;
+  }
+};
+
+// Incremental sync: rows written since `since` (omit it to get the current
+// cursor). `wait` long-polls for up to that many seconds. A 410 means the
+// cursor is too old and the caller should reload the full lists.
+export const getChanges = async (since, { wait = 0, tables, limit } = {}) => {
+  const response = await api.get('/changes', { params: { since, wait, tables, limit } });
+  return response.data;
+};
+
 export default api; 
\ No newline at end of file
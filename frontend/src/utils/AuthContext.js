@@ -1,5 +1,5 @@
 import React, { createContext, useState, useContext, useEffect } from 'react';
-import { login as apiLogin } from '../services/api';
+import { login as apiLogin, logout as apiLogout } from '../services/api';
 
 const AuthContext = createContext(null);
 
@@ -55,6 +55,10 @@ export const AuthProvider = ({ children }) => {
     };
 
     const logout = () => {
+        const token = localStorage.getItem('token');
+        if (token) {
+            apiLogout(token);
+        }
         localStorage.removeItem('token');
         localStorage.removeItem('user');
         setUser(null);
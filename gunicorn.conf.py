@@ -0,0 +1,39 @@
+"""Gunicorn settings for the hostel API.
+
+Pre-fork model: a master process supervises ``HOSTEL_WORKERS`` worker
+processes, each serving requests on ``HOSTEL_THREADS`` threads. Every worker
+imports the app itself (no preload), so ``kill -HUP <master>`` performs a
+graceful reload: new workers start with fresh code and configuration, warm
+up, and only then do the old ones finish their in-flight requests and exit.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('HOSTEL_BIND', '0.0.0.0:5001')
+workers = int(os.environ.get('HOSTEL_WORKERS', multiprocessing.cpu_count()))
+threads = int(os.environ.get('HOSTEL_THREADS', 4))
+worker_class = 'gthread'
+
+# Migrations are idempotent and serialised with BEGIN IMMEDIATE, so letting
+# each worker import the app is safe and keeps HUP reloads picking up code.
+preload_app = False
+
+timeout = int(os.environ.get('HOSTEL_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('HOSTEL_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+
+# Recycle workers now and then to bound memory growth; jitter avoids
+# restarting them all at once
+max_requests = int(os.environ.get('HOSTEL_MAX_REQUESTS', 10000))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.environ.get('HOSTEL_ACCESS_LOG') or None
+errorlog = '-'
+loglevel = os.environ.get('HOSTEL_LOG_LEVEL', 'info').lower()
+
+
+def post_worker_init(worker):
+    # Runs in the worker after the app is loaded and before it accepts
+    # connections, so warm-up never overlaps with live traffic
+    from wsgi import warm_up
+    warm_up()
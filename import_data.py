@@ -0,0 +1,402 @@
+"""Stream rooms and members from CSV or NDJSON files into the database.
+
+Usage:
+    python import_data.py rooms partner_rooms.csv
+    python import_data.py members partner_members.ndjson --rejects rejected.ndjson
+    python import_data.py members partner_members.csv --offline
+
+Files are read one record at a time and handled in batches of
+``batch_size``. Each batch is validated with one set-based lookup per
+check (duplicate room numbers or emails, unknown rooms, free beds), then
+its valid rows are written with ``executemany``. A transaction is committed
+every ``commit_every`` rows, with ``synchronous = OFF`` for the run.
+Memory use does not grow with the file: no more than one batch is held,
+and rejected records go straight to the ``--rejects`` file.
+
+Room occupancy is not touched per member. Once the file is loaded,
+``recompute_occupancy`` sets every room's ``current_occupancy`` from its
+active members with one aggregate UPDATE.
+
+Rows committed before a failure stay. Running the same file again skips them
+as duplicates (same room number or email), so an interrupted import can
+simply be repeated.
+
+``--offline`` also switches the journal to memory for the run. Use it only
+while the API is stopped and with a backup at hand: a crash mid-import then
+leaves the database corrupt rather than rolled back.
+
+Columns
+    rooms:   room_number, capacity, room_type, price_per_month [, status]
+    members: name, email, phone [, room_id | room_number, emergency_contact,
+             join_date, leave_date, status]
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import date
+
+from serialize import dumps, tuple_cursor
+
+BATCH_SIZE = 5000
+COMMIT_EVERY = 100000
+# Page cache for the run, in KiB (negative cache_size)
+CACHE_KIB = 65536
+# Distinct rejection reasons listed in the report
+MAX_REASONS = 20
+
+MEMBER_STATUSES = ('active', 'left')
+FORMATS = ('csv', 'ndjson')
+
+
+class DataImportError(ValueError):
+    """Raised when the input file as a whole cannot be imported."""
+
+
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return 'csv'
+    if extension in ('.ndjson', '.jsonl', '.json'):
+        return 'ndjson'
+    raise DataImportError(f'Cannot tell the format of {path}; pass --format csv or ndjson')
+
+
+def read_records(path, fmt):
+    """Yield ``(line, record, error)`` for each record in the file, lazily."""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        if fmt == 'csv':
+            reader = csv.DictReader(f)
+            if not reader.fieldnames:
+                raise DataImportError(f'{path} has no header row')
+            for record in reader:
+                # Blank cells count as missing, like absent NDJSON keys
+                yield reader.line_num, {key: value for key, value in record.items()
+                                        if key is not None and value not in (None, '')}, None
+            return
+        for line, text in enumerate(f, 1):
+            if not text.strip():
+                continue
+            try:
+                record = json.loads(text)
+            except ValueError as e:
+                yield line, None, f'Invalid JSON: {e}'
+                continue
+            if not isinstance(record, dict):
+                yield line, None, 'Record must be an object'
+                continue
+            yield line, record, None
+
+
+def _batches(records, size):
+    records = iter(records)
+    while True:
+        batch = list(itertools.islice(records, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _missing(record, fields):
+    for field in fields:
+        if record.get(field) in (None, ''):
+            return f'Missing required field: {field}'
+    return None
+
+
+def _date(value, field):
+    if value in (None, ''):
+        return None
+    value = str(value).strip()
+    try:
+        date.fromisoformat(value[:10])
+    except ValueError:
+        raise ValueError(f'{field} must be an ISO date (YYYY-MM-DD)')
+    return value
+
+
+def _existing(cursor, table, column, values):
+    """The subset of ``values`` already present in ``table.column``."""
+    if not values:
+        return set()
+    cursor.execute(
+        f"SELECT {column} FROM {table} WHERE {column} IN (SELECT value FROM json_each(?))",
+        (dumps(list(values)),),
+    )
+    return {row[0] for row in cursor.fetchall()}
+
+
+# Rooms
+
+ROOM_SQL = ("INSERT INTO room (room_number, capacity, current_occupancy, room_type, price_per_month, status) "
+            "VALUES (?, ?, 0, ?, ?, ?)")
+
+
+def _prepare_room(record):
+    error = _missing(record, ('room_number', 'capacity', 'room_type', 'price_per_month'))
+    if error:
+        raise ValueError(error)
+    try:
+        capacity = int(record['capacity'])
+        price = float(record['price_per_month'])
+    except (TypeError, ValueError) as e:
+        raise ValueError(f'Invalid numeric value: {e}')
+    if capacity <= 0:
+        raise ValueError('Capacity must be greater than 0')
+    if price <= 0:
+        raise ValueError('Price must be greater than 0')
+    return (str(record['room_number']).strip(), capacity, str(record['room_type']).strip(), price,
+            record.get('status') or 'available')
+
+
+def _check_rooms(cursor, candidates, state):
+    taken = _existing(cursor, 'room', 'room_number', {row[0] for _, row in candidates})
+    for line, row in candidates:
+        if row[0] in taken:
+            yield line, row, 'Room number already exists'
+        else:
+            taken.add(row[0])
+            yield line, row, None
+
+
+# Members
+
+MEMBER_SQL = ("INSERT INTO member (name, email, phone, room_id, join_date, leave_date, status, emergency_contact) "
+              "VALUES (?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), ?, ?, ?)")
+
+
+def _prepare_member(record):
+    error = _missing(record, ('name', 'email', 'phone'))
+    if error:
+        raise ValueError(error)
+    room = None
+    if record.get('room_id') not in (None, ''):
+        try:
+            room = ('id', int(record['room_id']))
+        except (TypeError, ValueError) as e:
+            raise ValueError(f'Invalid numeric value: {e}')
+    elif record.get('room_number') not in (None, ''):
+        room = ('number', str(record['room_number']).strip())
+    status = str(record.get('status') or 'active').strip().lower()
+    if status not in MEMBER_STATUSES:
+        raise ValueError(f"status must be one of {', '.join(MEMBER_STATUSES)}")
+    # The room reference is resolved to an id by _check_members
+    return (str(record['name']).strip(), str(record['email']).strip(), str(record['phone']).strip(),
+            room, _date(record.get('join_date'), 'join_date'), _date(record.get('leave_date'), 'leave_date'),
+            status, record.get('emergency_contact', ''))
+
+
+def _load_rooms(cursor, state, refs):
+    """Cache id, number and free beds for the rooms ``refs`` point at."""
+    ids = [value for kind, value in refs if kind == 'id' and value not in state['free']]
+    numbers = [value for kind, value in refs if kind == 'number' and value not in state['numbers']]
+    if not ids and not numbers:
+        return
+    # Free beds from the members themselves: current_occupancy is only
+    # brought up to date at the end of the import
+    cursor.execute(
+        """
+        SELECT r.id, r.room_number,
+               r.capacity - (SELECT COUNT(*) FROM member m WHERE m.room_id = r.id AND m.status = 'active')
+        FROM room r
+        WHERE r.id IN (SELECT value FROM json_each(?))
+           OR r.room_number IN (SELECT value FROM json_each(?))
+        """,
+        (dumps(ids), dumps(numbers)),
+    )
+    for room_id, number, free in cursor.fetchall():
+        state['free'][room_id] = free
+        state['numbers'][number] = room_id
+
+
+def _check_members(cursor, candidates, state):
+    _load_rooms(cursor, state, {row[3] for _, row in candidates if row[3] is not None})
+    taken = _existing(cursor, 'member', 'email', {row[1] for _, row in candidates})
+    for line, row in candidates:
+        name, email, phone, room, join_date, leave_date, status, emergency_contact = row
+        room_id = None
+        if room is not None:
+            room_id = room[1] if room[0] == 'id' else state['numbers'].get(room[1])
+        if email in taken:
+            yield line, row, 'Email already exists'
+        elif room is not None and room_id not in state['free']:
+            yield line, row, 'Room not found'
+        elif status == 'active' and room_id is not None and state['free'][room_id] <= 0:
+            yield line, row, 'Room is full'
+        else:
+            taken.add(email)
+            if status == 'active' and room_id is not None:
+                state['free'][room_id] -= 1
+            yield line, (name, email, phone, room_id, join_date, leave_date, status, emergency_contact), None
+
+
+KINDS = {
+    'rooms': (_prepare_room, _check_rooms, ROOM_SQL),
+    'members': (_prepare_member, _check_members, MEMBER_SQL),
+}
+
+
+def recompute_occupancy(conn):
+    """Set every room's ``current_occupancy`` from its active members.
+
+    One aggregate UPDATE over ``idx_member_room_id``; only rooms whose count
+    changed are written, so unchanged rooms fire no triggers. Returns the
+    number of rooms updated.
+    """
+    return conn.execute(
+        """
+        UPDATE room SET current_occupancy = counts.occupancy
+        FROM (
+            SELECT r.id, COUNT(m.id) AS occupancy
+            FROM room r LEFT JOIN member m ON m.room_id = r.id AND m.status = 'active'
+            GROUP BY r.id
+        ) AS counts
+        WHERE counts.id = room.id AND room.current_occupancy IS NOT counts.occupancy
+        """
+    ).rowcount
+
+
+@contextmanager
+def relaxed(conn, offline=False):
+    """Trade durability for speed for the duration of an import."""
+    synchronous = conn.execute('PRAGMA synchronous').fetchone()[0]
+    journal_mode = conn.execute('PRAGMA journal_mode').fetchone()[0]
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.execute(f'PRAGMA cache_size = -{CACHE_KIB}')
+    if offline:
+        # Leaving WAL needs the only connection; fails while the API runs
+        if conn.execute('PRAGMA journal_mode = MEMORY').fetchone()[0] != 'memory':
+            raise DataImportError('Could not switch the journal off WAL; is the API still running?')
+    try:
+        yield
+    finally:
+        if offline:
+            conn.execute(f'PRAGMA journal_mode = {journal_mode}')
+        conn.execute(f'PRAGMA synchronous = {int(synchronous)}')
+
+
+def import_file(conn, kind, path, fmt=None, batch_size=BATCH_SIZE, commit_every=COMMIT_EVERY,
+                rejects=None, offline=False):
+    """Import ``path`` into ``kind`` ('rooms' or 'members'). Returns a report.
+
+    ``rejects`` is an open text file that receives one JSON line per
+    rejected record. ``conn`` must not be in a transaction.
+    """
+    if kind not in KINDS:
+        raise DataImportError(f"kind must be one of {', '.join(KINDS)}")
+    fmt = fmt or detect_format(path)
+    if fmt not in FORMATS:
+        raise DataImportError(f"format must be one of {', '.join(FORMATS)}")
+    prepare, check, sql = KINDS[kind]
+    cursor = tuple_cursor(conn)
+    state = {'free': {}, 'numbers': {}}
+    report = {'kind': kind, 'path': path, 'format': fmt, 'read': 0, 'imported': 0, 'rejected': 0,
+              'batches': 0, 'commits': 0}
+    reasons = {}
+
+    def reject(line, record, message):
+        report['rejected'] += 1
+        if message in reasons or len(reasons) < MAX_REASONS:
+            reasons[message] = reasons.get(message, 0) + 1
+        if rejects is not None:
+            rejects.write(dumps({'line': line, 'error': message, 'record': record}) + '\n')
+
+    start = time.perf_counter()
+    with relaxed(conn, offline):
+        uncommitted = 0
+        try:
+            for batch in _batches(read_records(path, fmt), batch_size):
+                report['read'] += len(batch)
+                candidates = []
+                for line, record, error in batch:
+                    if error is None:
+                        try:
+                            candidates.append((line, prepare(record)))
+                            continue
+                        except ValueError as e:
+                            error = str(e)
+                    reject(line, record, error)
+
+                if not conn.in_transaction:
+                    conn.execute('BEGIN IMMEDIATE')
+                rows = []
+                records = {line: record for line, record, _ in batch}
+                for line, row, error in check(cursor, candidates, state):
+                    if error is None:
+                        rows.append(row)
+                    else:
+                        reject(line, records[line], error)
+                cursor.executemany(sql, rows)
+                report['imported'] += len(rows)
+                report['batches'] += 1
+                uncommitted += len(rows)
+                if uncommitted >= commit_every:
+                    conn.commit()
+                    report['commits'] += 1
+                    uncommitted = 0
+
+            if not conn.in_transaction:
+                conn.execute('BEGIN IMMEDIATE')
+            occupancy_start = time.perf_counter()
+            report['rooms_recounted'] = recompute_occupancy(conn)
+            report['occupancy_seconds'] = round(time.perf_counter() - occupancy_start, 3)
+            conn.commit()
+            report['commits'] += 1
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+
+    seconds = time.perf_counter() - start
+    report['seconds'] = round(seconds, 3)
+    report['rows_per_second'] = round(report['imported'] / seconds) if seconds else None
+    report['reasons'] = dict(sorted(reasons.items(), key=lambda item: -item[1]))
+    return report
+
+
+def main():
+    from migrations import migrate
+
+    parser = argparse.ArgumentParser(description='Import rooms or members from a CSV or NDJSON file.')
+    parser.add_argument('kind', choices=sorted(KINDS))
+    parser.add_argument('path')
+    parser.add_argument('--db', default=os.environ.get(
+        'HOSTEL_DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'simple_hostel.db')))
+    parser.add_argument('--format', choices=FORMATS, help='Input format (default: from the file extension)')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Records validated and inserted together')
+    parser.add_argument('--commit-every', type=int, default=COMMIT_EVERY, help='Rows per transaction')
+    parser.add_argument('--rejects', help='Write rejected records with their reasons to this NDJSON file')
+    parser.add_argument('--offline', action='store_true',
+                        help='Also keep the journal in memory; only with the API stopped')
+    args = parser.parse_args()
+
+    migrate(args.db)
+    conn = sqlite3.connect(args.db, timeout=30)
+    rejects = open(args.rejects, 'w', encoding='utf-8') if args.rejects else None
+    try:
+        report = import_file(conn, args.kind, args.path, args.format, args.batch_size, args.commit_every,
+                             rejects, args.offline)
+        conn.execute('PRAGMA optimize')
+    except (DataImportError, OSError) as e:
+        parser.exit(1, f'import_data.py: error: {e}\n')
+    finally:
+        if rejects is not None:
+            rejects.close()
+        conn.close()
+
+    print(f"Imported {report['imported']} of {report['read']} {args.kind} in {report['seconds']}s "
+          f"({report['rows_per_second']} rows/s, {report['commits']} commits)")
+    print(f"Occupancy recomputed for {report['rooms_recounted']} rooms in {report['occupancy_seconds']}s")
+    if report['rejected']:
+        print(f"Rejected {report['rejected']} records"
+              + (f" (details in {args.rejects})" if args.rejects else '') + ':')
+        for reason, count in report['reasons'].items():
+            print(f"  {count:>8}  {reason}")
+
+
+if __name__ == '__main__':
+    main()
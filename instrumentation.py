@@ -0,0 +1,276 @@
+"""Request instrumentation: timing, SQL accounting, profiling and logging.
+
+``init_app`` registers request hooks that record, per route, the request
+count, a latency histogram, the number of SQL statements and the time spent
+inside SQLite (via ``InstrumentedConnection``), serialization time and
+response size. ``render_prometheus`` turns that into Prometheus text format.
+
+Setting ``HOSTEL_PROFILE=1`` profiles a sample of requests with cProfile and
+writes a ``.pstats`` dump for every sampled request slower than
+``HOSTEL_SLOW_MS``.
+
+Logging goes through a ``QueueHandler``: request threads only enqueue the
+record and a background listener thread does the actual I/O.
+"""
+import atexit
+import cProfile
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, request
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_local = threading.local()
+
+
+def setup_logging(level=None):
+    """Route the ``hostel`` loggers through a non-blocking queue listener."""
+    level = level or os.environ.get('HOSTEL_LOG_LEVEL', 'INFO')
+    root = logging.getLogger('hostel')
+    if getattr(root, '_queue_listener', None) is not None:
+        return root
+    log_queue = queue.SimpleQueue()
+    stream = logging.StreamHandler()
+    stream.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level.upper())
+    root.propagate = False
+    root._queue_listener = listener
+    return root
+
+
+class _RequestStats:
+    __slots__ = ('statements', 'sql_seconds', 'serialize_seconds')
+
+    def __init__(self):
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.serialize_seconds = 0.0
+
+
+def _current():
+    return getattr(_local, 'stats', None)
+
+
+@contextmanager
+def _sql_timer(statements=1):
+    stats = _current()
+    if stats is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.sql_seconds += time.perf_counter() - start
+        stats.statements += statements
+
+
+@contextmanager
+def serializing():
+    """Attribute the enclosed block to serialization time for this request."""
+    stats = _current()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if stats is not None:
+            stats.serialize_seconds += time.perf_counter() - start
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that counts statements and time spent stepping through SQLite."""
+
+    def execute(self, sql, parameters=()):
+        with _sql_timer():
+            return super().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        with _sql_timer():
+            return super().executemany(sql, seq_of_parameters)
+
+    def fetchone(self):
+        with _sql_timer(0):
+            return super().fetchone()
+
+    def fetchmany(self, size=None):
+        with _sql_timer(0):
+            return super().fetchmany(self.arraysize if size is None else size)
+
+    def fetchall(self):
+        with _sql_timer(0):
+            return super().fetchall()
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose cursors are InstrumentedCursor."""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+class _RouteMetrics:
+    __slots__ = ('requests', 'errors', 'duration_sum', 'buckets', 'statements',
+                 'sql_seconds', 'serialize_seconds', 'response_bytes')
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.duration_sum = 0.0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.response_bytes = 0
+
+
+class Metrics:
+    """Per-route counters, safe to update from many request threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+        self.profiles_written = 0
+
+    def observe(self, route, method, status, duration, stats, size):
+        with self._lock:
+            metrics = self._routes.get((route, method))
+            if metrics is None:
+                metrics = self._routes[(route, method)] = _RouteMetrics()
+            metrics.requests += 1
+            if status >= 500:
+                metrics.errors += 1
+            metrics.duration_sum += duration
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    metrics.buckets[i] += 1
+            metrics.statements += stats.statements
+            metrics.sql_seconds += stats.sql_seconds
+            metrics.serialize_seconds += stats.serialize_seconds
+            metrics.response_bytes += size
+
+    def profile_written(self):
+        with self._lock:
+            self.profiles_written += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {key: {name: getattr(value, name) if name != 'buckets' else list(value.buckets)
+                          for name in _RouteMetrics.__slots__}
+                    for key, value in self._routes.items()}
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels.items()) + '}'
+
+
+def render_prometheus(metrics, extra=None):
+    """Render route metrics as Prometheus text.
+
+    ``extra`` maps further metric names to ``(type, help, value)`` tuples,
+    e.g. connection pool and cache counters.
+    """
+    snapshot = metrics.snapshot()
+    lines = []
+
+    def family(name, kind, help_text, samples):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        lines.extend(samples)
+
+    def per_route(name, field):
+        return [f'{name}{_labels(route=route, method=method)} {values[field]}'
+                for (route, method), values in sorted(snapshot.items())]
+
+    for name, field, kind, help_text in (
+        ('hostel_http_requests_total', 'requests', 'counter', 'Requests handled.'),
+        ('hostel_http_errors_total', 'errors', 'counter', 'Requests that ended with a 5xx status.'),
+        ('hostel_sql_statements_total', 'statements', 'counter', 'SQL statements executed.'),
+        ('hostel_sql_seconds_total', 'sql_seconds', 'counter', 'Time spent inside SQLite.'),
+        ('hostel_serialize_seconds_total', 'serialize_seconds', 'counter', 'Time spent encoding responses.'),
+        ('hostel_response_bytes_total', 'response_bytes', 'counter', 'Response payload bytes.'),
+    ):
+        family(name, kind, help_text, per_route(name, field))
+
+    histogram = []
+    for (route, method), values in sorted(snapshot.items()):
+        for bound, count in zip(DURATION_BUCKETS, values['buckets']):
+            histogram.append(f'hostel_http_request_duration_seconds_bucket'
+                             f'{_labels(route=route, method=method, le=bound)} {count}')
+        histogram.append(f'hostel_http_request_duration_seconds_bucket'
+                         f'{_labels(route=route, method=method, le="+Inf")} {values["requests"]}')
+        histogram.append(f'hostel_http_request_duration_seconds_sum'
+                         f'{_labels(route=route, method=method)} {values["duration_sum"]}')
+        histogram.append(f'hostel_http_request_duration_seconds_count'
+                         f'{_labels(route=route, method=method)} {values["requests"]}')
+    family('hostel_http_request_duration_seconds', 'histogram', 'Request latency.', histogram)
+
+    family('hostel_profiles_written_total', 'counter', 'Slow-request profiles dumped.',
+           [f'hostel_profiles_written_total {metrics.profiles_written}'])
+
+    for name, (kind, help_text, value) in sorted((extra or {}).items()):
+        family(name, kind, help_text, [f'{name} {value}'])
+    return '\n'.join(lines) + '\n'
+
+
+def init_app(app, metrics, logger):
+    """Register the timing, accounting and profiling hooks on ``app``."""
+    profile = os.environ.get('HOSTEL_PROFILE', '0') == '1'
+    sample_rate = float(os.environ.get('HOSTEL_PROFILE_SAMPLE', 0.1))
+    slow_seconds = float(os.environ.get('HOSTEL_SLOW_MS', 200)) / 1000
+    profile_dir = os.environ.get('HOSTEL_PROFILE_DIR', 'profiles')
+
+    @app.before_request
+    def start_timer():
+        _local.stats = _RequestStats()
+        g.request_started = time.perf_counter()
+        g.profiler = None
+        if profile and random.random() < sample_rate:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another thread's profiler is active (Python 3.12+)
+                return
+            g.profiler = profiler
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop('request_started', None)
+        stats = getattr(_local, 'stats', None)
+        if started is None or stats is None:
+            return response
+        duration = time.perf_counter() - started
+        size = 0 if response.is_streamed else (response.calculate_content_length() or 0)
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.observe(route, request.method, response.status_code, duration, stats, size)
+        _local.stats = None
+
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            if duration >= slow_seconds:
+                os.makedirs(profile_dir, exist_ok=True)
+                name = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.endpoint}-{int(duration * 1000)}ms.pstats"
+                profiler.dump_stats(os.path.join(profile_dir, name))
+                metrics.profile_written()
+                logger.warning("Slow request %s %s took %d ms; profile saved as %s",
+                               request.method, request.path, int(duration * 1000), name)
+        return response
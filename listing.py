@@ -0,0 +1,268 @@
+"""Query building for the paginated, filterable list endpoints.
+
+Every list endpoint is described by a ``ListSpec``: which columns can be
+projected, which request arguments map to filters and which indexed columns
+may be used for sorting. ``build_list_query`` turns the request arguments
+into a single parameterised SELECT using keyset pagination, so fetching page
+N costs the same as fetching page 1.
+"""
+import archive
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+class ListingError(ValueError):
+    """Raised for invalid list arguments; reported to the client as a 400."""
+
+
+class ListSpec:
+    """Describes one listable resource.
+
+    ``columns`` maps public field names to SQL expressions, ``filters`` maps
+    request arguments to ``(expression, operator)`` pairs and ``sorts`` lists
+    the fields that are backed by an index and may be used with ``sort=``.
+    ``archived_from_clause`` is used instead of ``from_clause`` for
+    ``include_archived=1``, on resources that have an archive table.
+    """
+
+    def __init__(self, table, from_clause, columns, filters, sorts, default_sort, key='id',
+                 archived_from_clause=None):
+        self.table = table
+        self.from_clause = from_clause
+        self.archived_from_clause = archived_from_clause
+        self.columns = columns
+        self.filters = filters
+        self.sorts = sorts
+        self.default_sort = default_sort
+        self.key = key
+
+
+ROOMS = ListSpec(
+    table='room',
+    from_clause='room',
+    columns={
+        'id': 'id',
+        'room_number': 'room_number',
+        'capacity': 'capacity',
+        'current_occupancy': 'current_occupancy',
+        'room_type': 'room_type',
+        'price_per_month': 'price_per_month',
+        'status': 'status',
+    },
+    filters={
+        'status': ('status', '='),
+        'room_type': ('room_type', '='),
+    },
+    sorts=('id', 'room_number', 'room_type'),
+    default_sort='id',
+)
+
+MEMBERS = ListSpec(
+    table='member',
+    from_clause='member m LEFT JOIN room r ON m.room_id = r.id',
+    archived_from_clause=f"{archive.source('member', True)} m LEFT JOIN room r ON m.room_id = r.id",
+    columns={
+        'id': 'm.id',
+        'name': 'm.name',
+        'email': 'm.email',
+        'phone': 'm.phone',
+        'room_id': 'm.room_id',
+        'join_date': 'm.join_date',
+        'leave_date': 'm.leave_date',
+        'status': 'm.status',
+        'emergency_contact': 'm.emergency_contact',
+        'room_number': 'r.room_number',
+    },
+    filters={
+        'status': ('m.status', '='),
+        'room_id': ('m.room_id', '='),
+        'room_type': ('r.room_type', '='),
+        'start_date': ('m.join_date', '>='),
+        'end_date': ('m.join_date', '<='),
+    },
+    sorts=('id', 'join_date', 'room_id'),
+    default_sort='id',
+)
+
+PAYMENTS = ListSpec(
+    table='payment',
+    from_clause='payment',
+    archived_from_clause=f"{archive.source('payment', True)} AS payment",
+    columns={
+        'id': 'id',
+        'member_id': 'member_id',
+        'amount': 'amount',
+        'payment_type': 'payment_type',
+        'payment_date': 'payment_date',
+        'due_date': 'due_date',
+        'status': 'status',
+        'description': 'description',
+        'billing_period': 'billing_period',
+    },
+    filters={
+        'status': ('status', '='),
+        'member_id': ('member_id', '='),
+        'payment_type': ('payment_type', '='),
+        'billing_period': ('billing_period', '='),
+        'start_date': ('payment_date', '>='),
+        'end_date': ('payment_date', '<='),
+    },
+    sorts=('id', 'payment_date', 'member_id'),
+    default_sort='-payment_date',
+)
+
+
+class ListQuery:
+    """A built SELECT plus what is needed to shape its result."""
+
+    def __init__(self, sql, params, limit, paginated, columns, cursor_sql=None, after_id=None):
+        self.sql = sql
+        self.params = params
+        self.limit = limit
+        self.paginated = paginated
+        self.columns = columns
+        self.cursor_sql = cursor_sql
+        self.after_id = after_id
+
+    def check_cursor(self, cursor):
+        """Raise ListingError if the ``after_id`` row is gone.
+
+        Sorted on anything but the key, the page resumes from the cursor
+        row's sort value, which is unknown once the row has been deleted or
+        archived; carrying on would restart the listing.
+        """
+        if self.cursor_sql is None:
+            return
+        if cursor.execute(self.cursor_sql, (self.after_id,)).fetchone() is None:
+            raise ListingError(f'after_id {self.after_id} no longer exists; start again from the first page')
+
+    def payload(self, rows):
+        """Shape fetched rows into the response body.
+
+        Paginated requests get an envelope with ``next_after_id``; plain
+        requests keep returning a bare list so existing clients still work.
+        """
+        if not self.paginated:
+            return rows
+        has_more = len(rows) > self.limit
+        rows = rows[:self.limit]
+        return {
+            'items': rows,
+            'limit': self.limit,
+            'next_after_id': rows[-1]['id'] if has_more else None,
+        }
+
+
+def _parse_int(args, name, minimum=None):
+    value = args.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        value = int(value)
+    except ValueError:
+        raise ListingError(f'{name} must be an integer')
+    if minimum is not None and value < minimum:
+        raise ListingError(f'{name} must be at least {minimum}')
+    return value
+
+
+def _parse_fields(spec, args):
+    fields = args.get('fields')
+    if not fields:
+        return list(spec.columns)
+    names = [name.strip() for name in fields.split(',') if name.strip()]
+    unknown = [name for name in names if name not in spec.columns]
+    if unknown:
+        raise ListingError(f'Unknown field(s): {", ".join(unknown)}')
+    # The key is always returned because it is the pagination cursor
+    if spec.key not in names:
+        names.insert(0, spec.key)
+    return names
+
+
+def _parse_sort(spec, args):
+    sort = args.get('sort') or spec.default_sort
+    descending = sort.startswith('-')
+    name = sort.lstrip('-')
+    if name not in spec.sorts:
+        raise ListingError(f'Cannot sort by {name}; allowed: {", ".join(spec.sorts)}')
+    return name, descending
+
+
+def build_list_query(spec, args):
+    """Build a ListQuery for ``spec`` from request arguments.
+
+    Supported arguments: ``after_id`` and ``limit`` for keyset pagination,
+    ``sort`` (prefix with ``-`` for descending), ``fields`` for projection and
+    the filters declared on the spec, and ``include_archived`` where the
+    resource has an archive.
+    """
+    after_id = _parse_int(args, 'after_id')
+    limit = _parse_int(args, 'limit', minimum=1)
+    paginated = after_id is not None or limit is not None
+    if paginated:
+        limit = min(limit or DEFAULT_LIMIT, MAX_LIMIT)
+
+    from_clause = spec.from_clause
+    table = spec.table
+    if archive.requested(args):
+        if spec.archived_from_clause is None:
+            raise ListingError(f'{spec.table} has no archive; include_archived is not supported')
+        from_clause = spec.archived_from_clause
+        table = archive.source(spec.table, True)
+
+    fields = _parse_fields(spec, args)
+    sort_name, descending = _parse_sort(spec, args)
+    key_expr = spec.columns[spec.key]
+    sort_expr = spec.columns[sort_name]
+
+    where = []
+    params = []
+    for arg, (expr, op) in spec.filters.items():
+        value = args.get(arg)
+        if value is not None and value != '':
+            where.append(f'{expr} {op} ?')
+            params.append(value)
+
+    cursor_sql = None
+    if after_id is not None:
+        op = '<' if descending else '>'
+        if sort_name == spec.key:
+            where.append(f'{key_expr} {op} ?')
+            params.append(after_id)
+        else:
+            # Resume after the cursor row using (sort value, id) row values.
+            # A row value comparison with NULL is never true, and SQLite
+            # sorts NULLs first ascending and last descending, so rows with
+            # a NULL sort value need their own branches.
+            column = sort_expr.split('.')[-1]
+            cursor = f'(SELECT {column} FROM {table} WHERE {spec.key} = ?)'
+            cursor_sql = f'SELECT 1 FROM {table} WHERE {spec.key} = ?'
+            if descending:
+                nulls_after = f'({cursor} IS NOT NULL AND {sort_expr} IS NULL)'
+            else:
+                nulls_after = f'({cursor} IS NULL AND {sort_expr} IS NOT NULL)'
+            where.append(
+                f'(({sort_expr}, {key_expr}) {op} ({cursor}, ?)'
+                f' OR {nulls_after}'
+                f' OR ({cursor} IS NULL AND {sort_expr} IS NULL AND {key_expr} {op} ?))'
+            )
+            params.extend([after_id] * 5)
+
+    direction = 'DESC' if descending else 'ASC'
+    order_by = f'{key_expr} {direction}'
+    if sort_name != spec.key:
+        order_by = f'{sort_expr} {direction}, {order_by}'
+
+    select = ', '.join(f'{spec.columns[name]} AS {name}' for name in fields)
+    sql = f'SELECT {select} FROM {from_clause}'
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where)
+    sql += f' ORDER BY {order_by}'
+    if paginated:
+        # One extra row tells us whether another page exists
+        sql += ' LIMIT ?'
+        params.append(limit + 1)
+
+    return ListQuery(sql, params, limit, paginated, fields, cursor_sql, after_id)
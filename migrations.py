@@ -0,0 +1,529 @@
+"""Versioned schema migrations for the hostel database.
+
+The applied version is stored in ``PRAGMA user_version``. ``migrate`` runs
+every migration newer than that version, each in its own transaction, and is
+safe to call from several processes at start-up: the version is re-read under
+a write lock before anything is applied.
+"""
+import logging
+import sqlite3
+
+logger = logging.getLogger('hostel.migrations')
+
+# (version, description, statements). Append new migrations; never edit or
+# reorder ones that have shipped.
+MIGRATIONS = [
+    (1, 'base tables', [
+        '''
+        CREATE TABLE IF NOT EXISTS admin (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS room (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            room_number TEXT UNIQUE NOT NULL,
+            capacity INTEGER NOT NULL,
+            current_occupancy INTEGER DEFAULT 0,
+            room_type TEXT NOT NULL,
+            price_per_month REAL NOT NULL,
+            status TEXT DEFAULT 'available'
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS member (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            phone TEXT NOT NULL,
+            room_id INTEGER,
+            join_date TEXT DEFAULT CURRENT_TIMESTAMP,
+            leave_date TEXT,
+            status TEXT DEFAULT 'active',
+            emergency_contact TEXT,
+            FOREIGN KEY (room_id) REFERENCES room(id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS payment (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            member_id INTEGER,
+            amount REAL,
+            payment_type TEXT,
+            payment_date TEXT,
+            due_date TEXT,
+            status TEXT,
+            description TEXT,
+            FOREIGN KEY (member_id) REFERENCES member (id)
+        )
+        ''',
+    ]),
+    (2, 'indexes for joins, filters and sorts', [
+        'CREATE INDEX IF NOT EXISTS idx_room_room_type ON room (room_type)',
+        'CREATE INDEX IF NOT EXISTS idx_member_room_id ON member (room_id)',
+        'CREATE INDEX IF NOT EXISTS idx_member_join_date ON member (join_date)',
+        'CREATE INDEX IF NOT EXISTS idx_member_status ON member (status)',
+        'CREATE INDEX IF NOT EXISTS idx_payment_member_id ON payment (member_id, payment_date)',
+        'CREATE INDEX IF NOT EXISTS idx_payment_payment_date ON payment (payment_date)',
+        'CREATE INDEX IF NOT EXISTS idx_payment_status_due_date ON payment (status, due_date)',
+    ]),
+    (3, 'aggregate tables for dashboard stats', [
+        '''
+        CREATE TABLE stats_room_type (
+            room_type TEXT PRIMARY KEY,
+            rooms INTEGER NOT NULL DEFAULT 0,
+            capacity INTEGER NOT NULL DEFAULT 0,
+            occupancy INTEGER NOT NULL DEFAULT 0
+        )
+        ''',
+        '''
+        CREATE TABLE stats_member (
+            status TEXT PRIMARY KEY,
+            members INTEGER NOT NULL DEFAULT 0
+        )
+        ''',
+        '''
+        CREATE TABLE stats_payment (
+            month TEXT NOT NULL,
+            payment_type TEXT NOT NULL,
+            status TEXT NOT NULL,
+            payments INTEGER NOT NULL DEFAULT 0,
+            amount REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (month, payment_type, status)
+        )
+        ''',
+        '''
+        INSERT INTO stats_room_type (room_type, rooms, capacity, occupancy)
+        SELECT room_type, COUNT(*), TOTAL(capacity), TOTAL(current_occupancy)
+        FROM room GROUP BY room_type
+        ''',
+        '''
+        INSERT INTO stats_member (status, members)
+        SELECT COALESCE(status, ''), COUNT(*) FROM member GROUP BY COALESCE(status, '')
+        ''',
+        '''
+        INSERT INTO stats_payment (month, payment_type, status, payments, amount)
+        SELECT COALESCE(substr(payment_date, 1, 7), ''), COALESCE(payment_type, ''),
+               COALESCE(status, ''), COUNT(*), TOTAL(amount)
+        FROM payment GROUP BY 1, 2, 3
+        ''',
+        '''
+        CREATE TRIGGER trg_stats_room_insert AFTER INSERT ON room BEGIN
+            INSERT INTO stats_room_type (room_type, rooms, capacity, occupancy)
+            VALUES (NEW.room_type, 1, NEW.capacity, COALESCE(NEW.current_occupancy, 0))
+            ON CONFLICT (room_type) DO UPDATE SET
+                rooms = rooms + 1,
+                capacity = capacity + excluded.capacity,
+                occupancy = occupancy + excluded.occupancy;
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_stats_room_delete AFTER DELETE ON room BEGIN
+            UPDATE stats_room_type SET
+                rooms = rooms - 1,
+                capacity = capacity - OLD.capacity,
+                occupancy = occupancy - COALESCE(OLD.current_occupancy, 0)
+            WHERE room_type = OLD.room_type;
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_stats_room_update
+        AFTER UPDATE OF capacity, current_occupancy ON room
+        WHEN OLD.room_type = NEW.room_type BEGIN
+            UPDATE stats_room_type SET
+                capacity = capacity + NEW.capacity - OLD.capacity,
+                occupancy = occupancy + COALESCE(NEW.current_occupancy, 0)
+                                      - COALESCE(OLD.current_occupancy, 0)
+            WHERE room_type = NEW.room_type;
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_stats_room_retype
+        AFTER UPDATE OF room_type ON room
+        WHEN OLD.room_type <> NEW.room_type BEGIN
+            UPDATE stats_room_type SET
+                rooms = rooms - 1,
+                capacity = capacity - OLD.capacity,
+                occupancy = occupancy - COALESCE(OLD.current_occupancy, 0)
+            WHERE room_type = OLD.room_type;
+            INSERT INTO stats_room_type (room_type, rooms, capacity, occupancy)
+            VALUES (NEW.room_type, 1, NEW.capacity, COALESCE(NEW.current_occupancy, 0))
+            ON CONFLICT (room_type) DO UPDATE SET
+                rooms = rooms + 1,
+                capacity = capacity + excluded.capacity,
+                occupancy = occupancy + excluded.occupancy;
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_stats_member_insert AFTER INSERT ON member BEGIN
+            INSERT INTO stats_member (status, members) VALUES (COALESCE(NEW.status, ''), 1)
+            ON CONFLICT (status) DO UPDATE SET members = members + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_stats_member_delete AFTER DELETE ON member BEGIN
+            UPDATE stats_member SET members = members - 1
+            WHERE status = COALESCE(OLD.status, '');
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_stats_member_update AFTER UPDATE OF status ON member BEGIN
+            UPDATE stats_member SET members = members - 1
+            WHERE status = COALESCE(OLD.status, '');
+            INSERT INTO stats_member (status, members) VALUES (COALESCE(NEW.status, ''), 1)
+            ON CONFLICT (status) DO UPDATE SET members = members + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_stats_payment_insert AFTER INSERT ON payment BEGIN
+            INSERT INTO stats_payment (month, payment_type, status, payments, amount)
+            VALUES (COALESCE(substr(NEW.payment_date, 1, 7), ''), COALESCE(NEW.payment_type, ''),
+                    COALESCE(NEW.status, ''), 1, COALESCE(NEW.amount, 0))
+            ON CONFLICT (month, payment_type, status) DO UPDATE SET
+                payments = payments + 1,
+                amount = amount + excluded.amount;
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_stats_payment_delete AFTER DELETE ON payment BEGIN
+            UPDATE stats_payment SET
+                payments = payments - 1,
+                amount = amount - COALESCE(OLD.amount, 0)
+            WHERE month = COALESCE(substr(OLD.payment_date, 1, 7), '')
+              AND payment_type = COALESCE(OLD.payment_type, '')
+              AND status = COALESCE(OLD.status, '');
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_stats_payment_update
+        AFTER UPDATE OF amount, payment_date, payment_type, status ON payment BEGIN
+            UPDATE stats_payment SET
+                payments = payments - 1,
+                amount = amount - COALESCE(OLD.amount, 0)
+            WHERE month = COALESCE(substr(OLD.payment_date, 1, 7), '')
+              AND payment_type = COALESCE(OLD.payment_type, '')
+              AND status = COALESCE(OLD.status, '');
+            INSERT INTO stats_payment (month, payment_type, status, payments, amount)
+            VALUES (COALESCE(substr(NEW.payment_date, 1, 7), ''), COALESCE(NEW.payment_type, ''),
+                    COALESCE(NEW.status, ''), 1, COALESCE(NEW.amount, 0))
+            ON CONFLICT (month, payment_type, status) DO UPDATE SET
+                payments = payments + 1,
+                amount = amount + excluded.amount;
+        END
+        ''',
+    ]),
+    (4, 'full-text search index over members', [
+        # External-content FTS5 table: the text lives only in member, the
+        # index is kept in step by the triggers below. The prefix indexes
+        # make short type-ahead queries cheap.
+        '''
+        CREATE VIRTUAL TABLE member_fts USING fts5(
+            name, email, phone, emergency_contact,
+            content='member', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3 4'
+        )
+        ''',
+        "INSERT INTO member_fts (member_fts) VALUES ('rebuild')",
+        '''
+        CREATE TRIGGER trg_member_fts_insert AFTER INSERT ON member BEGIN
+            INSERT INTO member_fts (rowid, name, email, phone, emergency_contact)
+            VALUES (NEW.id, NEW.name, NEW.email, NEW.phone, NEW.emergency_contact);
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_member_fts_delete AFTER DELETE ON member BEGIN
+            INSERT INTO member_fts (member_fts, rowid, name, email, phone, emergency_contact)
+            VALUES ('delete', OLD.id, OLD.name, OLD.email, OLD.phone, OLD.emergency_contact);
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_member_fts_update
+        AFTER UPDATE OF name, email, phone, emergency_contact ON member BEGIN
+            INSERT INTO member_fts (member_fts, rowid, name, email, phone, emergency_contact)
+            VALUES ('delete', OLD.id, OLD.name, OLD.email, OLD.phone, OLD.emergency_contact);
+            INSERT INTO member_fts (rowid, name, email, phone, emergency_contact)
+            VALUES (NEW.id, NEW.name, NEW.email, NEW.phone, NEW.emergency_contact);
+        END
+        ''',
+    ]),
+    (5, 'table change counters for cache validators', [
+        # One row per table, bumped by every write (including bulk imports
+        # and other processes), so ETags and Last-Modified can be derived
+        # without reading the data itself
+        '''
+        CREATE TABLE table_version (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0,
+            modified_at INTEGER NOT NULL
+        ) WITHOUT ROWID
+        ''',
+        """
+        INSERT INTO table_version (name, version, modified_at)
+        VALUES ('room', 0, CAST(strftime('%s', 'now') AS INTEGER)),
+               ('member', 0, CAST(strftime('%s', 'now') AS INTEGER)),
+               ('payment', 0, CAST(strftime('%s', 'now') AS INTEGER))
+        """,
+        '''
+        CREATE TRIGGER trg_version_room_insert AFTER INSERT ON room BEGIN
+            UPDATE table_version SET version = version + 1, modified_at = CAST(strftime('%s', 'now') AS INTEGER)
+            WHERE name = 'room';
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_version_room_update AFTER UPDATE ON room BEGIN
+            UPDATE table_version SET version = version + 1, modified_at = CAST(strftime('%s', 'now') AS INTEGER)
+            WHERE name = 'room';
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_version_room_delete AFTER DELETE ON room BEGIN
+            UPDATE table_version SET version = version + 1, modified_at = CAST(strftime('%s', 'now') AS INTEGER)
+            WHERE name = 'room';
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_version_member_insert AFTER INSERT ON member BEGIN
+            UPDATE table_version SET version = version + 1, modified_at = CAST(strftime('%s', 'now') AS INTEGER)
+            WHERE name = 'member';
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_version_member_update AFTER UPDATE ON member BEGIN
+            UPDATE table_version SET version = version + 1, modified_at = CAST(strftime('%s', 'now') AS INTEGER)
+            WHERE name = 'member';
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_version_member_delete AFTER DELETE ON member BEGIN
+            UPDATE table_version SET version = version + 1, modified_at = CAST(strftime('%s', 'now') AS INTEGER)
+            WHERE name = 'member';
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_version_payment_insert AFTER INSERT ON payment BEGIN
+            UPDATE table_version SET version = version + 1, modified_at = CAST(strftime('%s', 'now') AS INTEGER)
+            WHERE name = 'payment';
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_version_payment_update AFTER UPDATE ON payment BEGIN
+            UPDATE table_version SET version = version + 1, modified_at = CAST(strftime('%s', 'now') AS INTEGER)
+            WHERE name = 'payment';
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_version_payment_delete AFTER DELETE ON payment BEGIN
+            UPDATE table_version SET version = version + 1, modified_at = CAST(strftime('%s', 'now') AS INTEGER)
+            WHERE name = 'payment';
+        END
+        ''',
+    ]),
+    (6, 'change log for incremental sync', [
+        # Every write to room, member and payment appends (table, row id,
+        # operation) under a monotonically increasing sequence number, so a
+        # client can ask for what changed since the last number it saw.
+        # AUTOINCREMENT keeps numbers from being reused after pruning.
+        '''
+        CREATE TABLE change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            op TEXT NOT NULL,
+            changed_at INTEGER NOT NULL
+        )
+        ''',
+        '''
+        CREATE TRIGGER trg_change_room_insert AFTER INSERT ON room BEGIN
+            INSERT INTO change_log (table_name, row_id, op, changed_at)
+            VALUES ('room', NEW.id, 'insert', CAST(strftime('%s', 'now') AS INTEGER));
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_change_room_update AFTER UPDATE ON room BEGIN
+            INSERT INTO change_log (table_name, row_id, op, changed_at)
+            VALUES ('room', NEW.id, 'update', CAST(strftime('%s', 'now') AS INTEGER));
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_change_room_delete AFTER DELETE ON room BEGIN
+            INSERT INTO change_log (table_name, row_id, op, changed_at)
+            VALUES ('room', OLD.id, 'delete', CAST(strftime('%s', 'now') AS INTEGER));
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_change_member_insert AFTER INSERT ON member BEGIN
+            INSERT INTO change_log (table_name, row_id, op, changed_at)
+            VALUES ('member', NEW.id, 'insert', CAST(strftime('%s', 'now') AS INTEGER));
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_change_member_update AFTER UPDATE ON member BEGIN
+            INSERT INTO change_log (table_name, row_id, op, changed_at)
+            VALUES ('member', NEW.id, 'update', CAST(strftime('%s', 'now') AS INTEGER));
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_change_member_delete AFTER DELETE ON member BEGIN
+            INSERT INTO change_log (table_name, row_id, op, changed_at)
+            VALUES ('member', OLD.id, 'delete', CAST(strftime('%s', 'now') AS INTEGER));
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_change_payment_insert AFTER INSERT ON payment BEGIN
+            INSERT INTO change_log (table_name, row_id, op, changed_at)
+            VALUES ('payment', NEW.id, 'insert', CAST(strftime('%s', 'now') AS INTEGER));
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_change_payment_update AFTER UPDATE ON payment BEGIN
+            INSERT INTO change_log (table_name, row_id, op, changed_at)
+            VALUES ('payment', NEW.id, 'update', CAST(strftime('%s', 'now') AS INTEGER));
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_change_payment_delete AFTER DELETE ON payment BEGIN
+            INSERT INTO change_log (table_name, row_id, op, changed_at)
+            VALUES ('payment', OLD.id, 'delete', CAST(strftime('%s', 'now') AS INTEGER));
+        END
+        ''',
+        # Keep the newest 100000 entries, trimmed every 1000 appends; a
+        # client whose cursor falls before the oldest entry has to resync
+        '''
+        CREATE TRIGGER trg_change_log_prune AFTER INSERT ON change_log
+        WHEN NEW.seq % 1000 = 0 BEGIN
+            DELETE FROM change_log WHERE seq <= NEW.seq - 100000;
+        END
+        ''',
+    ]),
+    (7, 'archive tables for departed members and settled payments', [
+        # Same columns as the hot tables (ids are kept, so they never clash)
+        # plus when the row was moved. See archive.py.
+        '''
+        CREATE TABLE member_archive (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            email TEXT NOT NULL,
+            phone TEXT NOT NULL,
+            room_id INTEGER,
+            join_date TEXT,
+            leave_date TEXT,
+            status TEXT,
+            emergency_contact TEXT,
+            archived_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE payment_archive (
+            id INTEGER PRIMARY KEY,
+            member_id INTEGER,
+            amount REAL,
+            payment_type TEXT,
+            payment_date TEXT,
+            due_date TEXT,
+            status TEXT,
+            description TEXT,
+            archived_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        'CREATE INDEX idx_member_archive_join_date ON member_archive (join_date)',
+        'CREATE INDEX idx_payment_archive_member_id ON payment_archive (member_id, payment_date)',
+        'CREATE INDEX idx_payment_archive_payment_date ON payment_archive (payment_date)',
+        # Archived rows still count in the dashboard totals: moving a row
+        # out of member / payment subtracts it from the stats tables and
+        # these add it back, so an archive run leaves them unchanged
+        '''
+        CREATE TRIGGER trg_stats_member_archive_insert AFTER INSERT ON member_archive BEGIN
+            INSERT INTO stats_member (status, members) VALUES (COALESCE(NEW.status, ''), 1)
+            ON CONFLICT (status) DO UPDATE SET members = members + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_stats_member_archive_delete AFTER DELETE ON member_archive BEGIN
+            UPDATE stats_member SET members = members - 1
+            WHERE status = COALESCE(OLD.status, '');
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_stats_payment_archive_insert AFTER INSERT ON payment_archive BEGIN
+            INSERT INTO stats_payment (month, payment_type, status, payments, amount)
+            VALUES (COALESCE(substr(NEW.payment_date, 1, 7), ''), COALESCE(NEW.payment_type, ''),
+                    COALESCE(NEW.status, ''), 1, COALESCE(NEW.amount, 0))
+            ON CONFLICT (month, payment_type, status) DO UPDATE SET
+                payments = payments + 1,
+                amount = amount + excluded.amount;
+        END
+        ''',
+        '''
+        CREATE TRIGGER trg_stats_payment_archive_delete AFTER DELETE ON payment_archive BEGIN
+            UPDATE stats_payment SET
+                payments = payments - 1,
+                amount = amount - COALESCE(OLD.amount, 0)
+            WHERE month = COALESCE(substr(OLD.payment_date, 1, 7), '')
+              AND payment_type = COALESCE(OLD.payment_type, '')
+              AND status = COALESCE(OLD.status, '');
+        END
+        ''',
+    ]),
+    (8, 'billing period on payments', [
+        # Set on charges made by a billing run (billing.py). The unique index
+        # makes a run idempotent: a member is charged at most once per period
+        # and payment type, however often the run is repeated.
+        'ALTER TABLE payment ADD COLUMN billing_period TEXT',
+        'ALTER TABLE payment_archive ADD COLUMN billing_period TEXT',
+        '''
+        CREATE UNIQUE INDEX idx_payment_billing_period
+        ON payment (billing_period, payment_type, member_id)
+        WHERE billing_period IS NOT NULL
+        ''',
+    ]),
+    (9, 'index for the room status filter', [
+        # The status filter of GET /api/rooms (listing.ROOMS)
+        'CREATE INDEX IF NOT EXISTS idx_room_status ON room (status)',
+    ]),
+]
+
+
+def current_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(db_path):
+    """Bring the database at ``db_path`` up to the latest schema version.
+
+    Returns the list of versions that were applied by this call.
+    """
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    applied = []
+    try:
+        for version, description, statements in MIGRATIONS:
+            if version <= current_version(conn):
+                continue
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                # Another process may have applied it while we waited
+                if version <= current_version(conn):
+                    conn.execute('ROLLBACK')
+                    continue
+                for statement in statements:
+                    conn.execute(statement)
+                conn.execute(f'PRAGMA user_version = {int(version)}')
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            logger.info("Applied schema migration %s: %s", version, description)
+            applied.append(version)
+        if applied:
+            # Refresh planner statistics for the new indexes
+            conn.execute('PRAGMA optimize')
+    finally:
+        conn.close()
+    return applied
+
+
+def latest_version():
+    return MIGRATIONS[-1][0]
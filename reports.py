@@ -0,0 +1,189 @@
+"""SQL-side aggregation for the reports and dashboard endpoints.
+
+Everything is computed with GROUP BY and window functions over the indexed
+payment_date / (status, due_date) / member_id columns, so the report only
+ships aggregates and a bounded list of recent payments back to Python. The
+dashboard totals are read from the trigger-maintained ``stats_*`` tables.
+"""
+from datetime import date
+
+import archive
+
+# Statuses that still expect money from the member
+UNPAID_STATUSES = ('pending', 'due', 'overdue')
+
+GROUPINGS = {
+    'day': 'substr(payment_date, 1, 10)',
+    'month': 'substr(payment_date, 1, 7)',
+    'year': 'substr(payment_date, 1, 4)',
+    'payment_type': 'payment_type',
+    'status': 'status',
+}
+
+DEFAULT_RECENT_LIMIT = 100
+MAX_RECENT_LIMIT = 1000
+
+
+class ReportError(ValueError):
+    """Raised for invalid report arguments; reported to the client as a 400."""
+
+
+def _date_conditions(column, start_date, end_date):
+    conditions = []
+    params = []
+    if start_date:
+        conditions.append(f'{column} >= ?')
+        params.append(start_date)
+    if end_date:
+        # Inclusive of the whole end day even if dates carry a time part
+        conditions.append(f"{column} < date(?, '+1 day')")
+        params.append(end_date)
+    return conditions, params
+
+
+def _where(conditions):
+    return (' WHERE ' + ' AND '.join(conditions)) if conditions else ''
+
+
+def payments_report(conn, start_date=None, end_date=None, group_by='month',
+                    limit=DEFAULT_RECENT_LIMIT, today=None, include_archived=False):
+    """Build the payments report for the given date range.
+
+    Returns totals, a breakdown by status, overdue counts, buckets grouped by
+    ``group_by`` with a running total, and the top ``limit`` member balances
+    and most recent payments. Archived payments and members are included
+    only with ``include_archived``.
+    """
+    if group_by not in GROUPINGS:
+        raise ReportError(f'group_by must be one of: {", ".join(GROUPINGS)}')
+    limit = max(0, min(int(limit), MAX_RECENT_LIMIT))
+    today = today or date.today().isoformat()
+    conditions, params = _date_conditions('payment_date', start_date, end_date)
+    where = _where(conditions)
+    unpaid = ', '.join('?' for _ in UNPAID_STATUSES)
+    payment = archive.source('payment', include_archived)
+    member = archive.source('member', include_archived)
+    cursor = conn.cursor()
+
+    cursor.execute(f"""
+    SELECT COUNT(*) AS payment_count,
+           TOTAL(amount) AS total_amount,
+           TOTAL(CASE WHEN status = 'completed' THEN amount END) AS paid_amount,
+           TOTAL(CASE WHEN status IN ({unpaid}) THEN amount END) AS outstanding_amount
+    FROM {payment} AS payment{where}
+    """, (*UNPAID_STATUSES, *params))
+    totals = cursor.fetchone()
+
+    cursor.execute(f"""
+    SELECT COALESCE(status, '') AS status, COUNT(*) AS payments, TOTAL(amount) AS amount
+    FROM {payment} AS payment{where}
+    GROUP BY 1 ORDER BY 1
+    """, params)
+    by_status = cursor.fetchall()
+
+    # Overdue: unpaid and past the due date. Served by idx_payment_status_due_date.
+    cursor.execute(f"""
+    SELECT COUNT(*) AS payments, TOTAL(amount) AS amount,
+           COUNT(DISTINCT member_id) AS members
+    FROM {payment} AS payment
+    {_where([f'status IN ({unpaid})', 'due_date < ?'] + conditions)}
+    """, (*UNPAID_STATUSES, today, *params))
+    overdue = cursor.fetchone()
+
+    bucket = GROUPINGS[group_by]
+    cursor.execute(f"""
+    SELECT {bucket} AS bucket,
+           COUNT(*) AS payments,
+           TOTAL(amount) AS amount,
+           SUM(TOTAL(amount)) OVER (ORDER BY {bucket}) AS running_amount
+    FROM {payment} AS payment{where}
+    GROUP BY 1 ORDER BY 1
+    """, params)
+    buckets = cursor.fetchall()
+
+    cursor.execute(f"""
+    SELECT p.member_id, m.name,
+           COUNT(*) AS payments,
+           TOTAL(CASE WHEN p.status = 'completed' THEN p.amount END) AS paid,
+           TOTAL(CASE WHEN p.status IN ({unpaid}) THEN p.amount END) AS balance,
+           SUM(CASE WHEN p.status IN ({unpaid}) AND p.due_date < ? THEN 1 ELSE 0 END) AS overdue,
+           MAX(p.payment_date) AS last_payment_date,
+           RANK() OVER (ORDER BY TOTAL(CASE WHEN p.status IN ({unpaid}) THEN p.amount END) DESC) AS balance_rank
+    FROM {payment} p
+    LEFT JOIN {member} m ON m.id = p.member_id
+    {_where(_date_conditions('p.payment_date', start_date, end_date)[0])}
+    GROUP BY p.member_id
+    ORDER BY balance_rank, p.member_id LIMIT ?
+    """, (*UNPAID_STATUSES, *UNPAID_STATUSES, today, *UNPAID_STATUSES, *params, limit))
+    members = cursor.fetchall()
+
+    cursor.execute(f"""
+    SELECT * FROM {payment} AS payment{where}
+    ORDER BY payment_date DESC, id DESC LIMIT ?
+    """, (*params, limit))
+    recent = cursor.fetchall()
+
+    return {
+        'start_date': start_date,
+        'end_date': end_date,
+        'group_by': group_by,
+        'payment_count': totals['payment_count'],
+        'total_amount': totals['total_amount'],
+        'paid_amount': totals['paid_amount'],
+        'outstanding_amount': totals['outstanding_amount'],
+        'by_status': by_status,
+        'overdue': overdue,
+        'buckets': buckets,
+        'members': members,
+        'payments': recent,
+    }
+
+
+def occupancy_report(conn):
+    """Occupancy per room, with the rate computed in SQL."""
+    cursor = conn.cursor()
+    cursor.execute("""
+    SELECT room_number, capacity, current_occupancy,
+           CASE WHEN capacity > 0 THEN current_occupancy * 100.0 / capacity ELSE 0 END AS occupancy_rate
+    FROM room
+    """)
+    return cursor.fetchall()
+
+
+def dashboard_stats(conn):
+    """Dashboard totals, occupancy by room type and revenue by month."""
+    cursor = conn.cursor()
+    cursor.execute("""
+    SELECT room_type, rooms, capacity, occupancy,
+           CASE WHEN capacity > 0 THEN occupancy * 100.0 / capacity ELSE 0 END AS occupancy_rate
+    FROM stats_room_type WHERE rooms > 0 ORDER BY room_type
+    """)
+    by_room_type = cursor.fetchall()
+
+    cursor.execute("SELECT status, members FROM stats_member WHERE members > 0 ORDER BY status")
+    members_by_status = {row['status']: row['members'] for row in cursor.fetchall()}
+
+    cursor.execute("""
+    SELECT month, payment_type, SUM(payments) AS payments, SUM(amount) AS amount
+    FROM stats_payment WHERE status = 'completed' AND payments > 0
+    GROUP BY month, payment_type ORDER BY month DESC, payment_type
+    """)
+    revenue_by_month = cursor.fetchall()
+
+    cursor.execute("SELECT TOTAL(payments) AS payments FROM stats_payment")
+    total_payments = int(cursor.fetchone()['payments'])
+
+    total_capacity = sum(row['capacity'] for row in by_room_type)
+    total_occupancy = sum(row['occupancy'] for row in by_room_type)
+    return {
+        'total_rooms': sum(row['rooms'] for row in by_room_type),
+        'total_capacity': total_capacity,
+        'total_occupancy': total_occupancy,
+        'occupancy_rate': total_occupancy * 100.0 / total_capacity if total_capacity else 0,
+        'total_members': sum(members_by_status.values()),
+        'members_by_status': members_by_status,
+        'total_payments': total_payments,
+        'total_revenue': sum(row['amount'] for row in revenue_by_month),
+        'occupancy_by_room_type': by_room_type,
+        'revenue_by_month': revenue_by_month,
+    }
@@ -0,0 +1,91 @@
+"""Full-text and prefix search over members.
+
+Backed by the ``member_fts`` FTS5 index (migration 4) over name, email,
+phone and emergency contact, which triggers on ``member`` keep current.
+Every word of the query is matched as a prefix, so ``jo sm`` finds
+"John Smith" while the user is still typing.
+
+FTS5's bm25 ranking walks every row that matches each term, so a common
+prefix costs as much to rank as there are residents matching it. Instead
+the index returns the newest ``RANK_WINDOW`` matches (a walk that stops
+early) and those are scored here: a term found in the name counts more
+than one found in the email, phone or emergency contact, and a whole-word
+hit more than a prefix hit. The best ``limit`` rows are returned.
+"""
+import re
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+MAX_TERMS = 8
+RANK_WINDOW = 250
+# Shorter terms are matched as whole words; a one-letter prefix matches
+# nearly everyone and would only make the index do more work
+MIN_PREFIX = 2
+
+# Searched columns with their weights; emergency contacts are searchable but
+# not returned
+WEIGHTS = (('name', 10.0), ('email', 5.0), ('phone', 2.0), ('emergency_contact', 1.0))
+COLUMNS = ('id', 'name', 'email', 'phone', 'room_id', 'room_number', 'join_date', 'status')
+
+_TERM = re.compile(r'\w+', re.UNICODE)
+
+
+class SearchError(ValueError):
+    """Raised for an unusable search request; reported to the client as a 400."""
+
+
+def terms(q):
+    return [term.lower() for term in _TERM.findall(q or '')][:MAX_TERMS]
+
+
+def match_expression(query_terms):
+    """Turn query terms into an FTS5 query of quoted (prefix) terms.
+
+    Punctuation separates terms (as the unicode61 tokenizer does), so
+    ``john.doe@ex`` becomes ``"john"* "doe"* "ex"*`` and no user input is
+    ever interpreted as FTS5 syntax.
+    """
+    return ' '.join(f'"{term}"*' if len(term) >= MIN_PREFIX else f'"{term}"'
+                    for term in query_terms)
+
+
+def score(row, query_terms):
+    """Column-weighted relevance of ``row`` for ``query_terms``."""
+    total = 0.0
+    words = {column: _TERM.findall((row[column] or '').lower()) for column, _ in WEIGHTS}
+    for term in query_terms:
+        for column, weight in WEIGHTS:
+            column_words = words[column]
+            if term in column_words:
+                total += weight * 2
+                break
+            if any(word.startswith(term) for word in column_words):
+                total += weight
+                break
+    return total
+
+
+def search_members(conn, q, limit=DEFAULT_LIMIT):
+    """Return up to ``limit`` members matching ``q``, best match first."""
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise SearchError('limit must be an integer')
+    limit = max(1, min(limit, MAX_LIMIT))
+    query_terms = terms(q)
+    if not query_terms:
+        raise SearchError('q must contain at least one letter or digit')
+
+    cursor = conn.cursor()
+    # Limit inside the FTS5 table first (newest matches), then join only those
+    cursor.execute("""
+    SELECT m.id, m.name, m.email, m.phone, m.room_id, r.room_number, m.join_date, m.status,
+           m.emergency_contact
+    FROM (SELECT rowid FROM member_fts WHERE member_fts MATCH ? ORDER BY rowid DESC LIMIT ?) AS hit
+    JOIN member m ON m.id = hit.rowid
+    LEFT JOIN room r ON r.id = m.room_id
+    """, (match_expression(query_terms), RANK_WINDOW))
+    rows = cursor.fetchall()
+
+    rows.sort(key=lambda row: (-score(row, query_terms), -row['id']))
+    return [{column: row[column] for column in COLUMNS} for row in rows[:limit]]
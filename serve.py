@@ -0,0 +1,37 @@
+"""Start the API with a production server.
+
+On Linux and macOS this execs gunicorn with gunicorn.conf.py (multi-process,
+multi-threaded). Gunicorn does not run on Windows, so there the app is served
+by waitress with ``HOSTEL_THREADS`` threads in a single process.
+
+Environment: HOSTEL_BIND, HOSTEL_WORKERS, HOSTEL_THREADS and the HOSTEL_*
+settings read by auth_api.py.
+"""
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def main():
+    os.chdir(HERE)
+    if sys.platform != 'win32':
+        try:
+            import gunicorn  # noqa: F401
+        except ImportError:
+            sys.exit("gunicorn is not installed. Run: pip install -r requirements.txt")
+        os.execvp(sys.executable, [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'])
+
+    try:
+        from waitress import serve
+    except ImportError:
+        sys.exit("waitress is not installed. Run: pip install -r requirements.txt")
+    from wsgi import app, warm_up
+
+    host, _, port = os.environ.get('HOSTEL_BIND', '0.0.0.0:5001').rpartition(':')
+    warm_up()
+    serve(app, host=host or '0.0.0.0', port=int(port), threads=int(os.environ.get('HOSTEL_THREADS', 8)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""Streaming encoders for full-table exports.
+
+Rows are pulled from an open cursor with ``fetchmany`` and encoded one batch
+at a time, so memory stays bounded by the batch size rather than the table
+size and the first bytes go out as soon as the first batch is read.
+"""
+from serialize import column_names, dumps
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+BATCH_SIZE = 500
+
+
+def wants_ndjson(request):
+    """True if the client asked for newline-delimited JSON."""
+    if request.args.get('format') == 'ndjson':
+        return True
+    # Only an explicit Accept entry counts; */* must keep returning JSON
+    return any(mimetype == NDJSON_MIMETYPE and quality > 0
+               for mimetype, quality in request.accept_mimetypes)
+
+
+def wants_stream(request):
+    """True if the response should be streamed instead of built in memory."""
+    return request.args.get('stream') in ('1', 'true') or wants_ndjson(request)
+
+
+def iter_rows(cursor, limit=None, batch_size=BATCH_SIZE):
+    """Yield lists of rows from ``cursor``, stopping after ``limit`` rows."""
+    remaining = limit
+    while True:
+        size = batch_size if remaining is None else min(batch_size, remaining)
+        if size <= 0:
+            return
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return
+        yield rows
+        if remaining is not None:
+            remaining -= len(rows)
+
+
+def iter_ndjson(cursor, limit=None, batch_size=BATCH_SIZE):
+    """Encode tuple rows as one JSON document per line."""
+    names = column_names(cursor)
+    for rows in iter_rows(cursor, limit, batch_size):
+        yield ''.join(dumps(dict(zip(names, row))) + '\n' for row in rows)
+
+
+def iter_json_array(cursor, limit=None, batch_size=BATCH_SIZE):
+    """Encode tuple rows as a single JSON array, emitted incrementally."""
+    names = column_names(cursor)
+    yield '['
+    first = True
+    for rows in iter_rows(cursor, limit, batch_size):
+        chunk = ','.join(dumps(dict(zip(names, row))) for row in rows)
+        yield chunk if first else ',' + chunk
+        first = False
+    yield ']\n'
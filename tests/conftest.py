@@ -0,0 +1,26 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from migrations import migrate  # noqa: E402
+from serialize import dict_factory  # noqa: E402
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """A freshly migrated, empty database."""
+    path = str(tmp_path / 'hostel.db')
+    migrate(path)
+    return path
+
+
+@pytest.fixture
+def conn(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = dict_factory
+    yield conn
+    conn.close()
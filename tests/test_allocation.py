@@ -0,0 +1,85 @@
+import sqlite3
+import threading
+
+import pytest
+
+import allocation
+from serialize import dict_factory
+from write_queue import WriteQueue
+
+
+def add_room(conn, number, capacity, room_type='Dorm', price=200):
+    room_id = conn.execute(
+        "INSERT INTO room (room_number, capacity, room_type, price_per_month) VALUES (?, ?, ?, ?)",
+        (number, capacity, room_type, price),
+    ).lastrowid
+    conn.commit()
+    return room_id
+
+
+def member(n):
+    return (f'Member {n}', f'member{n}@example.com', '555', '')
+
+
+@pytest.fixture(autouse=True)
+def fresh_index():
+    allocation.free_rooms.invalidate()
+    yield
+    allocation.free_rooms.invalidate()
+
+
+def test_two_check_ins_race_for_the_last_bed(conn, db_path):
+    room_id = add_room(conn, '101', 1)
+    start = threading.Barrier(2)
+    outcomes = []
+
+    def check_in(n):
+        own = sqlite3.connect(db_path, timeout=5)
+        own.row_factory = dict_factory
+        start.wait()
+        try:
+            outcomes.append(allocation.check_in(own, member(n), room_id=room_id))
+        except allocation.AllocationError as e:
+            outcomes.append(str(e))
+        finally:
+            own.close()
+
+    threads = [threading.Thread(target=check_in, args=(n,)) for n in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(map(str, outcomes))[-1] == 'Room is full'
+    assert sum(isinstance(outcome, tuple) for outcome in outcomes) == 1
+    row = conn.execute("SELECT current_occupancy, (SELECT COUNT(*) FROM member) AS members FROM room").fetchone()
+    assert (row['current_occupancy'], row['members']) == (1, 1)
+
+
+def test_auto_assignment_fills_beds_until_full(conn):
+    add_room(conn, '101', 2, price=100)
+    add_room(conn, '102', 1, price=300)
+    rooms = [allocation.check_in(conn, member(n), room_type='Dorm')[1] for n in range(3)]
+    assert rooms == [1, 1, 2]
+    with pytest.raises(allocation.AllocationError):
+        allocation.check_in(conn, member(3), room_type='Dorm')
+
+
+def test_failed_batch_leaves_the_index_alone(db_path, conn):
+    room_id = add_room(conn, '101', 2)
+    queue = WriteQueue(db_path, row_factory=dict_factory)
+
+    def check_in_then_abort(conn):
+        allocation.check_in(conn, member(1), room_type='Dorm')
+        # Ends the batch's transaction, so the whole batch fails
+        conn.execute('ROLLBACK')
+
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            queue.run(check_in_then_abort)
+        assert allocation.free_rooms._entries[room_id][1][1] == 2
+
+        assert queue.run(allocation.check_in, member(2), room_type='Dorm')[1] == room_id
+        assert allocation.free_rooms._entries[room_id][1][1] == 1
+    finally:
+        queue.close()
@@ -0,0 +1,75 @@
+import csv
+import os
+from datetime import date
+
+import archive
+import backup
+import changes
+
+TODAY = date(2026, 10, 18)
+
+
+def seed(conn):
+    conn.execute("INSERT INTO room (room_number, capacity, room_type, price_per_month) VALUES ('101', 4, 'Dorm', 200)")
+    conn.executemany(
+        "INSERT INTO member (name, email, phone, room_id, status, leave_date) VALUES (?, ?, '555', 1, ?, ?)",
+        [('Gone', 'gone@example.com', 'left', '2024-01-01'),
+         ('Here', 'here@example.com', 'active', None)],
+    )
+    conn.executemany(
+        "INSERT INTO payment (member_id, amount, payment_type, payment_date, status) VALUES (?, 100, 'rent', ?, ?)",
+        [(1, '2023-01-01', 'completed'), (2, '2023-01-01', 'completed'),
+         (2, '2023-02-01', 'due'), (2, '2026-10-01', 'completed')],
+    )
+    conn.commit()
+
+
+def read_csv(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+
+def test_archive_moves_only_eligible_rows(conn):
+    seed(conn)
+    report = archive.archive(conn, pause=0, today=TODAY)
+    assert report['payment']['archived'] == 2
+    assert report['member']['archived'] == 1
+
+    hot = {row['id'] for row in conn.execute("SELECT id FROM payment")}
+    assert hot == {3, 4}
+    assert [row['id'] for row in conn.execute("SELECT id FROM member_archive")] == [1]
+    everything = conn.execute(f"SELECT COUNT(*) AS n FROM {archive.source('payment', True)}").fetchone()
+    assert everything['n'] == 4
+
+
+def test_change_feed_reports_archive_moves(conn):
+    seed(conn)
+    since = changes.head(conn)
+    archive.archive(conn, pause=0, today=TODAY)
+    batch = changes.changes_since(conn, since)
+    ops = {(change['table'], change['id']): (change['op'], change['data']) for change in batch['changes']}
+    assert ops == {
+        ('payment', 1): ('archive', None),
+        ('payment', 2): ('archive', None),
+        ('member', 1): ('archive', None),
+    }
+
+
+def test_export_keeps_archived_rows(conn, db_path, tmp_path):
+    seed(conn)
+    first = backup.export(db_path, str(tmp_path / 'full'), incremental='changes')
+    archive.archive(conn, pause=0, today=TODAY)
+
+    summary = backup.export(db_path, str(tmp_path / 'after'))
+    files = {item['table']: item['file'] for item in summary}
+    assert [row['id'] for row in read_csv(files['payment'])] == ['1', '2', '3', '4']
+    assert [row['id'] for row in read_csv(files['member'])] == ['1', '2']
+
+    # The incremental run after the archive sees moves, not deletes
+    state = os.path.join(tmp_path, 'full', backup.STATE_FILE)
+    summary = backup.export(db_path, str(tmp_path / 'full'), incremental='changes', state_path=state)
+    files = {item['table']: item for item in summary}
+    assert first and files['payment']['mode'] == 'changes'
+    rows = read_csv(files['payment']['file'])
+    assert [(row['id'], row['_op'], row['amount']) for row in rows] == [('1', 'archive', '100.0'),
+                                                                        ('2', 'archive', '100.0')]
@@ -0,0 +1,79 @@
+import hashlib
+import importlib
+import sqlite3
+
+import pytest
+
+import auth
+
+
+@pytest.fixture(scope='module')
+def api(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('api') / 'hostel.db')
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv('HOSTEL_DB_PATH', path)
+        auth_api = importlib.import_module('auth_api')
+    conn = sqlite3.connect(auth_api.DB_PATH)
+    with conn:
+        conn.execute("INSERT INTO admin (username, password_hash, email) VALUES (?, ?, ?)",
+                     ('warden', auth.hash_password('s3cret'), 'warden@example.com'))
+    conn.close()
+    return auth_api
+
+
+@pytest.fixture
+def client(api, monkeypatch):
+    monkeypatch.setitem(api.app.config, 'AUTH_REQUIRED', True)
+    return api.app.test_client()
+
+
+def login(client, password='s3cret'):
+    return client.post('/api/login', json={'username': 'warden', 'password': password})
+
+
+def test_hash_round_trip():
+    stored = auth.hash_password('s3cret')
+    assert not stored.startswith('sha256$')
+    assert auth.verify_password(stored, 's3cret')
+    assert not auth.verify_password(stored, 'wrong')
+
+
+def test_legacy_sha256_hash_still_verifies():
+    digest = hashlib.sha256(('s3cret' + 'abcd').encode()).hexdigest()
+    stored = f'sha256$abcd${digest}'
+    assert auth.verify_password(stored, 's3cret')
+    assert not auth.verify_password(stored, 'wrong')
+
+
+def test_wrong_password_gets_401(client):
+    assert login(client, 'wrong').status_code == 401
+
+
+def test_revoked_token_gets_401(client):
+    token = login(client).get_json()['token']
+    headers = {'Authorization': f'Bearer {token}'}
+    assert client.get('/api/rooms', headers=headers).status_code == 200
+
+    assert client.post('/api/logout', headers=headers).status_code == 200
+    assert client.get('/api/rooms', headers=headers).status_code == 401
+
+
+def test_missing_token_gets_401(client):
+    assert client.get('/api/rooms').status_code == 401
+
+
+def test_expired_token_is_rejected(monkeypatch):
+    sessions = auth.SessionStore('secret', ttl=60)
+    token = sessions.issue(1, 'warden')
+    assert sessions.validate(token).username == 'warden'
+
+    # Still cached as validated, but past its expiry
+    now = auth.time.time()
+    monkeypatch.setattr(auth.time, 'time', lambda: now + 61)
+    assert sessions.validate(token) is None
+    assert sessions.revoke(token) is False
+
+
+def test_token_signed_with_another_secret_is_rejected():
+    token = auth.SessionStore('other').issue(1, 'warden')
+    assert auth.SessionStore('secret').validate(token) is None
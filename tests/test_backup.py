@@ -0,0 +1,65 @@
+import csv
+import os
+import sqlite3
+
+import backup
+
+
+def add_rooms(conn, numbers):
+    with conn:
+        conn.executemany(
+            "INSERT INTO room (room_number, capacity, room_type, price_per_month) VALUES (?, 2, 'double', 500)",
+            [(number,) for number in numbers],
+        )
+
+
+def read_csv(path):
+    with open(path, newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def test_online_backup_is_a_complete_copy(conn, db_path, tmp_path):
+    add_rooms(conn, [str(number) for number in range(100, 300)])
+    dest = str(tmp_path / 'copy' / 'hostel.db')
+
+    # Small steps, so the copy takes several rounds
+    stats = backup.backup(db_path, dest, pages=2, sleep=0)
+    assert stats['steps'] > 1
+    assert not os.path.exists(dest + '.partial')
+    copy = sqlite3.connect(dest)
+    try:
+        assert copy.execute('SELECT COUNT(*) FROM room').fetchone()[0] == 200
+    finally:
+        copy.close()
+
+
+def test_incremental_id_export_only_writes_new_rows(conn, db_path, tmp_path):
+    out = str(tmp_path / 'out')
+    add_rooms(conn, ['101', '102'])
+    first = backup.export(db_path, out, tables=('room',), incremental='id')
+    assert [(entry['mode'], entry['rows']) for entry in first] == [('full', 2)]
+
+    add_rooms(conn, ['103'])
+    second = backup.export(db_path, out, tables=('room',), incremental='id')
+    assert [(entry['mode'], entry['rows']) for entry in second] == [('id', 1)]
+    assert [row['room_number'] for row in read_csv(second[0]['file'])] == ['103']
+
+    third = backup.export(db_path, out, tables=('room',), incremental='id')
+    assert third[0]['rows'] == 0 and third[0]['file'] is None
+
+
+def test_incremental_change_export_includes_updates_and_deletes(conn, db_path, tmp_path):
+    out = str(tmp_path / 'out')
+    add_rooms(conn, ['101', '102'])
+    backup.export(db_path, out, tables=('room',), incremental='changes')
+
+    with conn:
+        conn.execute("UPDATE room SET price_per_month = 600 WHERE room_number = '101'")
+        conn.execute("DELETE FROM room WHERE room_number = '102'")
+    summary = backup.export(db_path, out, tables=('room',), incremental='changes')
+    assert [(entry['mode'], entry['rows']) for entry in summary] == [('changes', 2)]
+    rows = {row['id']: row for row in read_csv(summary[0]['file'])}
+    assert [row['_op'] for row in rows.values()] == ['update', 'delete']
+    updated, deleted = rows.values()
+    assert float(updated['price_per_month']) == 600
+    assert deleted['room_number'] == ''
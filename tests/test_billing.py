@@ -0,0 +1,35 @@
+import billing
+
+
+def add_members(conn, join_dates):
+    conn.execute("INSERT INTO room (room_number, capacity, room_type, price_per_month) VALUES ('101', 10, 'Dorm', 250)")
+    conn.executemany(
+        "INSERT INTO member (name, email, phone, room_id, join_date) VALUES (?, ?, '555', 1, ?)",
+        [(f'Member {i}', f'member{i}@example.com', joined) for i, joined in enumerate(join_dates)],
+    )
+    conn.commit()
+
+
+def test_run_is_idempotent(conn):
+    add_members(conn, ['2026-01-01 09:00:00'] * 5)
+
+    first = billing.run_billing(conn, '2026-10', chunk_size=2, pause=0)
+    assert (first['members'], first['billed'], first['already_billed']) == (5, 5, 0)
+    assert first['period_total'] == {'payments': 5, 'amount': 1250.0}
+
+    again = billing.run_billing(conn, '2026-10', chunk_size=2, pause=0)
+    assert (again['billed'], again['already_billed']) == (0, 5)
+    assert again['period_total'] == first['period_total']
+
+
+def test_members_who_join_on_the_last_day_are_billed(conn):
+    add_members(conn, ['2026-10-30', '2026-10-31 10:00:00', '2026-10-31 23:59:59', '2026-11-01 00:00:00'])
+
+    dry = billing.run_billing(conn, '2026-10', dry_run=True)
+    assert dry['billed'] == 3
+
+    report = billing.run_billing(conn, '2026-10', pause=0)
+    assert report['billed'] == 3
+    billed = {row['member_id'] for row in conn.execute(
+        "SELECT member_id FROM payment WHERE billing_period = '2026-10'")}
+    assert billed == {1, 2, 3}
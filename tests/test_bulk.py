@@ -0,0 +1,30 @@
+import bulk
+
+
+def test_null_fields_fail_only_their_row(conn):
+    rooms = bulk.insert_rooms(conn, [
+        {'room_number': '101', 'capacity': 2, 'room_type': 'Single', 'price_per_month': 100},
+        {'room_number': '102', 'capacity': 2, 'room_type': None, 'price_per_month': 100},
+        {'room_number': '  ', 'capacity': 2, 'room_type': 'Single', 'price_per_month': 100},
+    ])
+    assert [result['status'] for result in rooms] == ['created', 'error', 'error']
+    assert rooms[1]['message'] == 'Missing required field: room_type'
+    assert rooms[2]['message'] == 'Missing required field: room_number'
+    room_id = rooms[0]['id']
+
+    members = bulk.insert_members(conn, [
+        {'name': 'Ann', 'email': 'ann@example.com', 'phone': '555', 'room_id': room_id},
+        {'name': None, 'email': 'bob@example.com', 'phone': '555', 'room_id': room_id},
+    ])
+    assert [result['status'] for result in members] == ['created', 'error']
+    assert members[1]['message'] == 'Missing required field: name'
+
+    payments = bulk.insert_payments(conn, [
+        {'member_id': members[0]['id'], 'amount': 100, 'payment_type': None},
+        {'member_id': members[0]['id'], 'amount': 100, 'payment_type': 'rent'},
+    ])
+    assert [result['status'] for result in payments] == ['error', 'created']
+
+    assert conn.execute("SELECT COUNT(*) AS n FROM room").fetchone()['n'] == 1
+    assert conn.execute("SELECT current_occupancy FROM room").fetchone()['current_occupancy'] == 1
+    assert conn.execute("SELECT COUNT(*) AS n FROM member").fetchone()['n'] == 1
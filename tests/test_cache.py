@@ -0,0 +1,76 @@
+import json
+import sqlite3
+
+import pytest
+from flask import Flask
+
+from cache import ReadCache, cached, invalidates, table_versions
+
+
+@pytest.fixture
+def app(db_path):
+    def versions(tables):
+        conn = sqlite3.connect(db_path)
+        try:
+            return table_versions(conn, tables)
+        finally:
+            conn.close()
+
+    read_cache = ReadCache(versions=versions)
+    app = Flask(__name__)
+    app.read_cache = read_cache
+
+    @app.route('/rooms')
+    @cached(read_cache, 'room')
+    def rooms():
+        conn = sqlite3.connect(db_path)
+        try:
+            numbers = [row[0] for row in conn.execute('SELECT room_number FROM room ORDER BY id')]
+        finally:
+            conn.close()
+        # Padded past the compression threshold
+        return app.response_class(json.dumps({'rooms': numbers, 'pad': 'x' * 4096}),
+                                  mimetype='application/json')
+
+    @app.route('/rooms', methods=['POST'])
+    @invalidates(read_cache, 'room')
+    def add_room():
+        conn = sqlite3.connect(db_path)
+        with conn:
+            conn.execute("INSERT INTO room (room_number, capacity, room_type, price_per_month)"
+                         " VALUES ('101', 2, 'double', 500)")
+        conn.close()
+        return '', 201
+
+    return app
+
+
+def test_matching_if_none_match_gets_304(app):
+    client = app.test_client()
+    first = client.get('/rooms')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+
+    again = client.get('/rooms', headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.data == b''
+    assert again.headers['X-Cache'] == 'NOT-MODIFIED'
+
+    client.post('/rooms')
+    changed = client.get('/rooms', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert json.loads(changed.data)['rooms'] == ['101']
+
+
+def test_miss_keeps_its_compressed_body(app):
+    client = app.test_client()
+    miss = client.get('/rooms', headers={'Accept-Encoding': 'gzip'})
+    assert miss.headers['X-Cache'] == 'MISS'
+    assert miss.headers['Content-Encoding'] == 'gzip'
+
+    hit = client.get('/rooms', headers={'Accept-Encoding': 'gzip'})
+    assert hit.headers['X-Cache'] == 'HIT'
+    assert hit.data == miss.data
+    # Compressed once, on the miss
+    assert app.read_cache.stats()['compressions'] == 1
@@ -0,0 +1,61 @@
+import pytest
+
+from changes import ResyncRequired, changes_since, head
+
+
+def add_room(conn, number):
+    with conn:
+        return conn.execute(
+            "INSERT INTO room (room_number, capacity, room_type, price_per_month) VALUES (?, 2, 'double', 500)",
+            (number,),
+        ).lastrowid
+
+
+def test_changes_are_coalesced_per_row(conn):
+    first = add_room(conn, '101')
+    second = add_room(conn, '102')
+    since = head(conn)
+    with conn:
+        for price in (510, 520, 530):
+            conn.execute("UPDATE room SET price_per_month = ? WHERE id = ?", (price, first))
+        conn.execute("DELETE FROM room WHERE id = ?", (second,))
+
+    feed = changes_since(conn, since, tables=('room',))
+    assert [(change['id'], change['op']) for change in feed['changes']] == [(first, 'update'), (second, 'delete')]
+    assert feed['changes'][0]['data']['price_per_month'] == 530
+    assert feed['changes'][1]['data'] is None
+    assert feed['next_since'] == head(conn)
+    assert changes_since(conn, feed['next_since'])['changes'] == []
+
+
+def test_paging_follows_next_since(conn):
+    ids = [add_room(conn, str(number)) for number in range(100, 105)]
+    seen = []
+    since = 0
+    while True:
+        feed = changes_since(conn, since, limit=2)
+        seen.extend(change['id'] for change in feed['changes'])
+        since = feed['next_since']
+        if not feed['has_more']:
+            break
+    assert seen == ids
+
+
+def test_cursor_ahead_of_the_log_needs_resync(conn):
+    add_room(conn, '101')
+    with pytest.raises(ResyncRequired):
+        changes_since(conn, head(conn) + 1)
+
+
+def test_trimmed_cursor_needs_resync(conn):
+    for number in range(100, 105):
+        add_room(conn, str(number))
+    newest = head(conn)
+    # As if the log had been trimmed to its newest two entries
+    with conn:
+        conn.execute("DELETE FROM change_log WHERE seq <= ?", (newest - 2,))
+
+    with pytest.raises(ResyncRequired):
+        changes_since(conn, 0)
+    # The last cursor before the retained entries still works
+    assert len(changes_since(conn, newest - 2)['changes']) == 2
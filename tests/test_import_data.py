@@ -0,0 +1,69 @@
+import io
+import json
+import sqlite3
+
+import pytest
+
+from import_data import import_file
+
+
+@pytest.fixture
+def conn(db_path):
+    # Plain tuples, as main() connects
+    conn = sqlite3.connect(db_path)
+    yield conn
+    conn.close()
+
+
+def write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text)
+    return str(path)
+
+
+def test_rooms_csv_rejects_bad_and_duplicate_rows(conn, tmp_path):
+    path = write(tmp_path, 'rooms.csv', '\n'.join([
+        'room_number,capacity,room_type,price_per_month',
+        '101,2,double,500',
+        '102,0,double,500',
+        '103,1,single,300',
+        '101,2,double,500',
+        '104,,single,300',
+    ]) + '\n')
+    rejects = io.StringIO()
+
+    # Batches of two, so the duplicate of 101 is caught against committed rows
+    report = import_file(conn, 'rooms', path, batch_size=2, commit_every=1, rejects=rejects)
+    assert (report['read'], report['imported'], report['rejected']) == (5, 2, 3)
+    assert [row[0] for row in conn.execute('SELECT room_number FROM room ORDER BY id')] == ['101', '103']
+    rejected = [json.loads(line) for line in rejects.getvalue().splitlines()]
+    assert {entry['line']: entry['error'] for entry in rejected} == {
+        3: 'Capacity must be greater than 0',
+        5: 'Room number already exists',
+        6: 'Missing required field: capacity',
+    }
+
+    # Running the file again only finds duplicates
+    again = import_file(conn, 'rooms', path)
+    assert again['imported'] == 0
+
+
+def test_members_ndjson_fills_rooms_and_recounts_occupancy(conn, tmp_path):
+    with conn:
+        conn.execute("INSERT INTO room (room_number, capacity, room_type, price_per_month) VALUES ('201', 2, 'double', 500)")
+    records = [
+        {'name': 'A', 'email': 'a@example.com', 'phone': '1', 'room_number': '201'},
+        {'name': 'B', 'email': 'b@example.com', 'phone': '2', 'room_number': '201'},
+        {'name': 'C', 'email': 'c@example.com', 'phone': '3', 'room_number': '201'},
+        {'name': 'D', 'email': 'd@example.com', 'phone': '4', 'room_number': '999'},
+        {'name': 'E', 'email': 'e@example.com', 'phone': '5', 'room_number': '201', 'status': 'left'},
+    ]
+    lines = [json.dumps(record) for record in records] + ['not json']
+    path = write(tmp_path, 'members.ndjson', '\n'.join(lines) + '\n')
+
+    report = import_file(conn, 'members', path, batch_size=2)
+    assert (report['imported'], report['rejected']) == (3, 3)
+    assert report['reasons']['Room is full'] == 1
+    assert report['reasons']['Room not found'] == 1
+    occupancy = conn.execute("SELECT current_occupancy FROM room WHERE room_number = '201'").fetchone()[0]
+    assert occupancy == 2
@@ -0,0 +1,55 @@
+import pytest
+
+from listing import PAYMENTS, ListingError, build_list_query
+
+
+def fetch_all_pages(conn, spec, limit, **args):
+    ids = []
+    after_id = None
+    while True:
+        page_args = dict(args, limit=str(limit))
+        if after_id is not None:
+            page_args['after_id'] = str(after_id)
+        query = build_list_query(spec, page_args)
+        page = query.payload(conn.execute(query.sql, query.params).fetchall())
+        ids.extend(row['id'] for row in page['items'])
+        after_id = page['next_after_id']
+        if after_id is None:
+            return ids
+
+
+@pytest.mark.parametrize('sort', ['payment_date', '-payment_date'])
+@pytest.mark.parametrize('limit', [1, 2, 3])
+def test_pages_cover_null_sort_values(conn, sort, limit):
+    dates = ['2026-01-05', None, '2026-01-05', None, '2026-02-01', None, '2025-12-31']
+    conn.executemany(
+        "INSERT INTO payment (member_id, amount, payment_type, payment_date) VALUES (1, 10, 'rent', ?)",
+        [(date,) for date in dates],
+    )
+    conn.commit()
+
+    query = build_list_query(PAYMENTS, {'sort': sort})
+    expected = [row['id'] for row in conn.execute(query.sql, query.params)]
+    assert len(expected) == len(dates)
+    assert fetch_all_pages(conn, PAYMENTS, limit, sort=sort) == expected
+
+
+def test_missing_cursor_row_is_rejected(conn):
+    conn.executemany(
+        "INSERT INTO payment (member_id, amount, payment_type, payment_date) VALUES (1, 10, 'rent', ?)",
+        [('2026-01-0%d' % day,) for day in range(1, 6)],
+    )
+    conn.execute("DELETE FROM payment WHERE id = 3")
+    conn.commit()
+
+    query = build_list_query(PAYMENTS, {'limit': '2', 'after_id': '3'})
+    with pytest.raises(ListingError, match='after_id 3 no longer exists'):
+        query.check_cursor(conn.cursor())
+
+    # Sorted by the key itself the cursor needs no row
+    query = build_list_query(PAYMENTS, {'limit': '2', 'after_id': '3', 'sort': 'id'})
+    query.check_cursor(conn.cursor())
+    assert [row['id'] for row in conn.execute(query.sql, query.params)] == [4, 5]
+
+    query = build_list_query(PAYMENTS, {'limit': '2', 'after_id': '4', 'include_archived': '1'})
+    query.check_cursor(conn.cursor())
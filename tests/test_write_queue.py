@@ -0,0 +1,56 @@
+import sqlite3
+import threading
+
+import pytest
+
+from db_pool import DEFAULT_PRAGMAS
+from write_queue import WriteQueue
+
+# Give up on the lock quickly so the test exercises the retries
+PRAGMAS = tuple((name, 20 if name == 'busy_timeout' else value) for name, value in DEFAULT_PRAGMAS)
+
+
+def insert_room(conn, number):
+    return conn.execute(
+        "INSERT INTO room (room_number, capacity, room_type, price_per_month) VALUES (?, 2, 'Single', 100)",
+        (number,),
+    ).lastrowid
+
+
+def hold_write_lock(queue, db_path):
+    # Let the writer open its connection (and switch to WAL) first
+    queue.run(insert_room, 'warm-up')
+    other = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+    other.execute('BEGIN IMMEDIATE')
+    return other
+
+
+def test_batch_waits_out_another_writer(db_path):
+    queue = WriteQueue(db_path, pragmas=PRAGMAS, retries=8, base_delay=0.01)
+    other = hold_write_lock(queue, db_path)
+    release = threading.Timer(0.2, other.commit)
+    release.start()
+    try:
+        futures = [queue.submit(insert_room, str(number)) for number in range(3)]
+        assert all(future.result(timeout=10) for future in futures)
+    finally:
+        release.join()
+        other.close()
+        queue.close()
+    stats = queue.stats()
+    assert stats['busy_retries'] > 0
+    assert stats['committed'] == 4 and stats['failed'] == 0
+
+
+def test_batch_fails_once_retries_run_out(db_path):
+    queue = WriteQueue(db_path, pragmas=PRAGMAS, retries=2, base_delay=0.001)
+    other = hold_write_lock(queue, db_path)
+    try:
+        with pytest.raises(sqlite3.OperationalError, match='locked'):
+            queue.run(insert_room, '101')
+    finally:
+        other.close()
+    # The writer recovers once the lock is free
+    assert queue.run(insert_room, '101')
+    queue.close()
+    assert queue.stats()['busy_retries'] == 2
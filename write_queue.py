@@ -0,0 +1,230 @@
+"""Group commit for single-row mutations.
+
+SQLite has one writer at a time. When every request commits its own
+transaction, a burst of writes turns into threads queueing on the write
+lock (and, past ``busy_timeout``, ``database is locked`` errors), each paying
+for its own BEGIN IMMEDIATE / COMMIT.
+
+``WriteQueue`` gives the writes of a process to one writer thread that owns
+a single connection. Request threads submit a mutation and wait on its
+future; the writer takes whatever has queued up (at most ``max_batch``
+mutations), runs them in one transaction and commits once. Each mutation
+runs in its own savepoint, so one that raises is undone and reported to its
+caller without affecting the rest of the batch. Futures resolve only after
+the commit. A batch that finds the database busy (another process's writer,
+billing, an import) is retried with the same jittered exponential backoff as
+``allocation.run_write`` before its mutations fail.
+
+Batches form by themselves under load: whatever arrives while one batch
+commits makes up the next. ``max_delay`` (default 0) additionally holds a
+batch open for that long waiting for more; with request threads that each
+wait for their own write this mostly adds latency, so leave it at 0 unless
+a benchmark says otherwise (benchmarks/bench_write_queue.py).
+
+A mutation is ``work(conn, *args, **kwargs)`` and must not commit. Code
+built on ``allocation.run_write`` (check-ins, the bulk inserts) works as is:
+inside the batch's transaction ``run_write`` uses a savepoint, and
+``allocation.after_commit`` callbacks run once the batch has committed,
+before the futures resolve.
+"""
+import logging
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+from allocation import BUSY_BASE_DELAY, BUSY_RETRIES, commit_hooks, is_busy, run_commit_hooks
+from db_pool import DEFAULT_PRAGMAS, ConnectionPool
+
+MAX_BATCH = int(os.environ.get('HOSTEL_WRITE_BATCH', 64))
+# Longest a batch is held open for more mutations to join it
+MAX_DELAY = float(os.environ.get('HOSTEL_WRITE_DELAY_MS', 0)) / 1000
+
+logger = logging.getLogger('hostel.writes')
+
+
+class WriteQueue:
+    """A writer thread that group-commits submitted mutations."""
+
+    def __init__(self, db_path, max_batch=MAX_BATCH, max_delay=MAX_DELAY, row_factory=None,
+                 pragmas=DEFAULT_PRAGMAS, retries=BUSY_RETRIES, base_delay=BUSY_BASE_DELAY):
+        self.max_batch = max(1, max_batch)
+        self.max_delay = max(0.0, max_delay)
+        self.retries = retries
+        self.base_delay = base_delay
+        # A pool of one, for the shared pragmas; the writer keeps it checked out
+        self._pool = ConnectionPool(db_path, max_size=1, timeout=30.0, row_factory=row_factory,
+                                    pragmas=pragmas)
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+        self._submitted = 0
+        self._committed = 0
+        self._failed = 0
+        self._batches = 0
+        self._busy_retries = 0
+        self._largest_batch = 0
+        self._max_depth = 0
+        self._wait_total = 0.0
+        self._commit_total = 0.0
+
+    def _start(self):
+        # Started on first use, and again in a forked worker, where the
+        # parent's thread does not exist
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='hostel-writer', daemon=True)
+                self._thread.start()
+
+    def submit(self, work, *args, **kwargs):
+        """Queue ``work(conn, *args, **kwargs)``; returns a Future for its result."""
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            self._start()
+        future = Future()
+        self._queue.put((future, work, args, kwargs, time.perf_counter()))
+        with self._lock:
+            self._submitted += 1
+            self._max_depth = max(self._max_depth, self._queue.qsize())
+        return future
+
+    def run(self, work, *args, **kwargs):
+        """Submit ``work`` and wait for it; returns its result or raises its error."""
+        return self.submit(work, *args, **kwargs).result()
+
+    def _next_batch(self):
+        """Up to ``max_batch`` queued mutations, and whether to stop after them."""
+        first = self._queue.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        deadline = time.perf_counter() + self.max_delay
+        while len(batch) < self.max_batch:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        conn = None
+        while True:
+            batch, stop = self._next_batch()
+            if batch and conn is None:
+                try:
+                    conn = self._pool.acquire()
+                except Exception as e:
+                    for future, *_ in batch:
+                        if future.set_running_or_notify_cancel():
+                            future.set_exception(e)
+                    batch = []
+            if batch:
+                self._commit(conn, batch)
+            if stop:
+                if conn is not None:
+                    self._pool.release(conn)
+                self._pool.close_all()
+                return
+
+    def close(self, timeout=None):
+        """Commit what is already queued, then stop the writer thread."""
+        with self._lock:
+            thread = self._thread if self._pid == os.getpid() else None
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def _transaction(self, conn, live):
+        """Run ``live`` in one transaction.
+
+        Returns ``(future, ok, value)`` per mutation and the batch's
+        ``after_commit`` callbacks.
+        """
+        outcomes = []
+        with commit_hooks() as pending:
+            conn.execute('BEGIN IMMEDIATE')
+            for future, work, args, kwargs, _ in live:
+                conn.execute('SAVEPOINT mutation')
+                try:
+                    outcomes.append((future, True, work(conn, *args, **kwargs)))
+                except Exception as e:
+                    conn.execute('ROLLBACK TO mutation')
+                    outcomes.append((future, False, e))
+                conn.execute('RELEASE mutation')
+            conn.commit()
+        return outcomes, pending
+
+    def _commit(self, conn, batch):
+        started = time.perf_counter()
+        live = [item for item in batch if item[0].set_running_or_notify_cancel()]
+        for attempt in range(self.retries + 1):
+            try:
+                outcomes, pending = self._transaction(conn, live)
+                run_commit_hooks(pending)
+                break
+            except Exception as e:
+                if conn.in_transaction:
+                    conn.rollback()
+                if isinstance(e, sqlite3.OperationalError) and is_busy(e) and attempt < self.retries:
+                    with self._lock:
+                        self._busy_retries += 1
+                    time.sleep(self.base_delay * (2 ** attempt) * (0.5 + random.random()))
+                    continue
+                # The transaction itself failed (lock timeout after the
+                # retries, I/O error, a mutation that aborted it): nothing in
+                # the batch was written
+                logger.error("Write batch of %d failed: %s", len(live), e)
+                outcomes = [(item[0], False, e) for item in live]
+                break
+
+        with self._lock:
+            self._batches += 1
+            self._largest_batch = max(self._largest_batch, len(batch))
+            self._commit_total += time.perf_counter() - started
+            self._wait_total += sum(started - item[4] for item in live)
+            for _, ok, _ in outcomes:
+                if ok:
+                    self._committed += 1
+                else:
+                    self._failed += 1
+        for future, ok, value in outcomes:
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def stats(self):
+        with self._lock:
+            batches = self._batches
+            done = self._committed + self._failed
+            return {
+                'queue_depth': self._queue.qsize(),
+                'max_queue_depth': self._max_depth,
+                'submitted': self._submitted,
+                'committed': self._committed,
+                'failed': self._failed,
+                'batches': batches,
+                'busy_retries': self._busy_retries,
+                'avg_batch_size': round(done / batches, 2) if batches else 0,
+                'largest_batch': self._largest_batch,
+                'queue_wait_seconds_total': round(self._wait_total, 6),
+                'commit_seconds_total': round(self._commit_total, 6),
+                'max_batch': self.max_batch,
+                'max_delay_ms': self.max_delay * 1000,
+            }